@@ -1,40 +1,36 @@
 # 如果主方法不能正确抓取网页，这里提供一个备选的抓取方法
 # 请注意：这个方法使用了Selenium，需要安装Chrome WebDriver
+#
+# BrowserPool只启动一个无头Chrome，在其中打开多个标签页并行加载页面：
+# 页面加载策略为none，driver.get立即返回，随后轮流检查各标签页是否已出现论文标题，
+# 出现后立即取出HTML并在该标签页加载下一个URL，不再固定等待5秒。
 
 from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from bs4 import BeautifulSoup
-import pandas as pd
 import time
 
-def fetch_papers_with_selenium(url):
-    """使用Selenium抓取可能需要JavaScript渲染的页面"""
-    options = Options()
-    options.add_argument('--headless')
-    
-    driver = webdriver.Chrome(options=options)
-    driver.get(url)
-    
-    # 等待页面加载
-    time.sleep(5)
-    
-    # 获取页面内容
-    html = driver.page_source
-    driver.quit()
-    
+PAPER_SELECTOR = 'h2[id], h3[id]'  # 论文标题，出现即表示页面已渲染出论文列表
+DEFAULT_TABS = 4
+PAGE_TIMEOUT = 30  # 单个页面最长等待秒数
+POLL_INTERVAL = 0.2  # 每个标签页每次检查的等待秒数
+
+def parse_rendered_html(html):
+    """从渲染后的页面中提取论文标题、作者和摘要"""
     soup = BeautifulSoup(html, 'html.parser')
-    
+
     papers_data = []
     # 根据实际页面结构调整选择器
     paper_sections = soup.find_all(['h2', 'h3'], {'id': True})
-    
+
     for section in paper_sections:
         paper_info = {}
         paper_info['title'] = section.text.strip()
-        
+
         current = section.next_sibling
         while current and not (current.name in ['h2', 'h3'] and current.get('id')):
             if 'Authors' in getattr(current, 'text', ''):
@@ -42,7 +38,103 @@ def fetch_papers_with_selenium(url):
             elif paper_info.get('authors') and not paper_info.get('abstract'):
                 paper_info['abstract'] = current.text.strip()
             current = current.next_sibling
-        
+
         papers_data.append(paper_info)
-    
-    return papers_data 
\ No newline at end of file
+
+    return papers_data
+
+class BrowserPool:
+    """复用同一个无头Chrome的多个标签页并行加载页面，可作为上下文管理器使用"""
+
+    def __init__(self, tabs=DEFAULT_TABS, page_timeout=PAGE_TIMEOUT, selector=PAPER_SELECTOR):
+        options = Options()
+        options.add_argument('--headless')
+        # 不等待页面加载完成，由我们自己等待论文标题出现
+        options.page_load_strategy = 'none'
+        start = time.time()
+        self.driver = webdriver.Chrome(options=options)
+        print(f"启动浏览器用时 {time.time() - start:.1f} 秒")
+        self.page_timeout = page_timeout
+        self.selector = selector
+        self.handles = [self.driver.current_window_handle]
+        for _ in range(max(1, tabs) - 1):
+            self.driver.switch_to.new_window('tab')
+            self.handles.append(self.driver.current_window_handle)
+        self.timings = {}  # URL -> 加载耗时（秒）
+
+    def _ready(self):
+        """当前标签页是否已出现论文标题，最多等待POLL_INTERVAL秒"""
+        try:
+            # 仍停留在空白页说明新页面还没开始加载
+            if self.driver.current_url == 'about:blank':
+                time.sleep(POLL_INTERVAL)
+                return False
+            WebDriverWait(self.driver, POLL_INTERVAL).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, self.selector))
+            )
+            return True
+        except TimeoutException:
+            return False
+
+    def fetch_pages(self, urls):
+        """并行加载所有页面，返回 {URL: HTML}，超时仍未出现论文的页面返回已加载的内容"""
+        pending = list(urls)
+        active = {}  # 标签页 -> (URL, 开始时间)
+        pages = {}
+        while pending or active:
+            # 空闲的标签页开始加载下一个URL
+            for handle in self.handles:
+                if handle not in active and pending:
+                    url = pending.pop(0)
+                    self.driver.switch_to.window(handle)
+                    # 先切到空白页清掉上一个页面：加载策略为none时get立即返回，
+                    # 否则新页面开始渲染前仍能找到旧页面的论文标题，旧HTML会被当作新URL的内容
+                    self.driver.get('about:blank')
+                    self.driver.get(url)
+                    active[handle] = (url, time.time())
+            for handle, (url, started) in list(active.items()):
+                self.driver.switch_to.window(handle)
+                ready = self._ready()
+                elapsed = time.time() - started
+                if not ready and elapsed < self.page_timeout:
+                    continue
+                try:
+                    pages[url] = self.driver.page_source
+                except WebDriverException as e:
+                    print(f"读取页面 {url} 失败: {e}")
+                    pages[url] = ''
+                self.timings[url] = elapsed
+                status = "已渲染" if ready else f"等待{self.page_timeout}秒后仍未出现论文"
+                print(f"Selenium加载 {url} 用时 {elapsed:.1f} 秒（{status}）")
+                del active[handle]
+        return pages
+
+    def fetch_papers(self, urls):
+        """加载并解析所有页面，返回与urls顺序一致的论文列表"""
+        start = time.time()
+        pages = self.fetch_pages(urls)
+        results = [parse_rendered_html(pages[url]) if pages.get(url) else [] for url in urls]
+        if urls:
+            print(f"Selenium共加载 {len(urls)} 个页面，用时 {time.time() - start:.1f} 秒"
+                  f"（单页平均 {sum(self.timings.get(url, 0) for url in urls) / len(urls):.1f} 秒，{len(self.handles)} 个标签页并行）")
+        return results
+
+    def close(self):
+        self.driver.quit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def fetch_all_with_selenium(urls, tabs=DEFAULT_TABS, page_timeout=PAGE_TIMEOUT):
+    """用一个浏览器池抓取多个页面，返回与urls顺序一致的论文列表"""
+    with BrowserPool(tabs=min(max(1, tabs), max(1, len(urls))), page_timeout=page_timeout) as pool:
+        return pool.fetch_papers(list(urls))
+
+def fetch_papers_with_selenium(url, pool=None):
+    """使用Selenium抓取可能需要JavaScript渲染的页面，提供pool时复用其中的浏览器"""
+    if pool is not None:
+        return pool.fetch_papers([url])[0]
+    return fetch_all_with_selenium([url], tabs=1)[0]
\ No newline at end of file
@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+import time
+
+# DeepSeek客户端的调用指标：每次HTTP请求的延迟、令牌用量（提示/补全/服务端缓存命中）、重试和错误分类。
+# 每次请求追加一行到JSONL追踪文件，汇总指标以Prometheus textfile格式写出
+# （可由node_exporter的textfile collector采集），运行结束时打印摘要，用于调整并发数和max_tokens。
+
+LATENCY_BUCKETS = (0.5, 1, 2, 4, 8, 16, 32, 64, 128)  # 延迟直方图的桶上限（秒）
+PROMETHEUS_INTERVAL = 30  # 运行中每隔多少秒刷新一次Prometheus文件
+METRIC_PREFIX = 'deepdigest_deepseek'
+
+
+def percentile(values, q):
+    """values的第q百分位数（最近秩法），values为空时返回0"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+class ApiMetrics:
+    """线程安全的API调用指标收集器"""
+
+    def __init__(self, trace_file=None, prometheus_file=None):
+        self.trace_file = trace_file
+        self.prometheus_file = prometheus_file
+        self.latencies = []
+        self.bucket_counts = [0] * len(LATENCY_BUCKETS)
+        self.outcomes = {}  # 'ok'或错误分类 -> 请求次数（含熔断拒绝等未发出的调用）
+        self.tokens = {'prompt': 0, 'completion': 0, 'cached': 0}
+        self.completion_tokens = []  # 每次成功请求的补全令牌数，用于估计合适的max_tokens
+        self.truncated = 0  # finish_reason为length的次数，说明max_tokens不够
+        self.retries = 0
+        self.cache_hits = 0  # 本地响应缓存命中，没有发出请求
+        self._started = time.monotonic()
+        self._last_export = time.monotonic()
+        self._lock = threading.Lock()
+        self._trace = None
+        if trace_file:
+            directory = os.path.dirname(trace_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._trace = open(trace_file, 'a', encoding='utf-8')
+
+    def observe_request(self, latency, outcome, status=None, usage=None, finish_reason=None,
+                        max_tokens=None, attempt=0):
+        """记录一次HTTP请求，outcome为'ok'或错误分类"""
+        usage = usage or {}
+        prompt = usage.get('prompt_tokens') or 0
+        completion = usage.get('completion_tokens') or 0
+        # DeepSeek在usage中返回上下文硬盘缓存命中的提示令牌数
+        cached = usage.get('prompt_cache_hit_tokens') or 0
+        with self._lock:
+            self.latencies.append(latency)
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    self.bucket_counts[i] += 1
+                    break
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            self.tokens['prompt'] += prompt
+            self.tokens['completion'] += completion
+            self.tokens['cached'] += cached
+            if outcome == 'ok':
+                self.completion_tokens.append(completion)
+            if finish_reason == 'length':
+                self.truncated += 1
+            if self._trace is not None:
+                self._trace.write(json.dumps({
+                    'ts': time.time(), 'attempt': attempt, 'outcome': outcome, 'status': status,
+                    'latency': round(latency, 4), 'prompt_tokens': prompt, 'completion_tokens': completion,
+                    'cached_tokens': cached, 'finish_reason': finish_reason, 'max_tokens': max_tokens
+                }) + '\n')
+                self._trace.flush()
+            export = self.prometheus_file and time.monotonic() - self._last_export >= PROMETHEUS_INTERVAL
+            if export:
+                self._last_export = time.monotonic()
+        if export:
+            self.write_prometheus()
+
+    def observe_rejected(self, outcome, attempt=0):
+        """记录一次未发出HTTP请求就被拒绝的调用（如熔断打开），只计入结果分类，不计入延迟"""
+        with self._lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            if self._trace is not None:
+                self._trace.write(json.dumps({'ts': time.time(), 'attempt': attempt, 'outcome': outcome}) + '\n')
+                self._trace.flush()
+
+    def observe_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def observe_cache_hit(self):
+        with self._lock:
+            self.cache_hits += 1
+
+    def prometheus_text(self):
+        """按Prometheus文本格式输出所有指标"""
+        p = METRIC_PREFIX
+        with self._lock:
+            lines = [
+                f'# HELP {p}_request_duration_seconds DeepSeek HTTP请求延迟',
+                f'# TYPE {p}_request_duration_seconds histogram',
+            ]
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, self.bucket_counts):
+                cumulative += count
+                lines.append(f'{p}_request_duration_seconds_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{p}_request_duration_seconds_bucket{{le="+Inf"}} {len(self.latencies)}')
+            lines.append(f'{p}_request_duration_seconds_sum {sum(self.latencies):.4f}')
+            lines.append(f'{p}_request_duration_seconds_count {len(self.latencies)}')
+            lines += [f'# HELP {p}_requests_total DeepSeek请求数，按结果分类（circuit_open为熔断时未发出的请求）',
+                      f'# TYPE {p}_requests_total counter']
+            lines += [f'{p}_requests_total{{outcome="{outcome}"}} {count}' for outcome, count in sorted(self.outcomes.items())]
+            lines += [f'# HELP {p}_tokens_total 令牌用量，cached为服务端缓存命中的提示令牌',
+                      f'# TYPE {p}_tokens_total counter']
+            lines += [f'{p}_tokens_total{{type="{kind}"}} {count}' for kind, count in self.tokens.items()]
+            lines += [f'# TYPE {p}_retries_total counter', f'{p}_retries_total {self.retries}',
+                      f'# TYPE {p}_truncated_total counter', f'{p}_truncated_total {self.truncated}',
+                      f'# TYPE {p}_local_cache_hits_total counter', f'{p}_local_cache_hits_total {self.cache_hits}']
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path=None):
+        """原子地写出Prometheus textfile，采集器不会读到写了一半的文件"""
+        path = path or self.prometheus_file
+        if not path:
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        text = self.prometheus_text()
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def summary(self, price_input=None, price_output=None, price_cached=None):
+        """运行结束时的摘要，给出单价时附带估计费用"""
+        with self._lock:
+            requests = len(self.latencies)
+            elapsed = time.monotonic() - self._started
+            lines = [f"API调用统计: {requests} 个HTTP请求, {self.retries} 次重试, 本地缓存命中 {self.cache_hits} 次, "
+                     f"用时 {elapsed:.1f} 秒"]
+            if requests:
+                lines.append(f"  延迟: p50 {percentile(self.latencies, 50):.2f} 秒, p90 {percentile(self.latencies, 90):.2f} 秒, "
+                             f"p99 {percentile(self.latencies, 99):.2f} 秒, 最大 {max(self.latencies):.2f} 秒")
+            if self.outcomes:
+                lines.append("  结果: " + ", ".join(f"{outcome} {count}" for outcome, count in sorted(self.outcomes.items())))
+            lines.append(f"  令牌: 提示 {self.tokens['prompt']}（服务端缓存命中 {self.tokens['cached']}）, "
+                         f"补全 {self.tokens['completion']}")
+            if self.completion_tokens:
+                lines.append(f"  每次补全令牌: 平均 {sum(self.completion_tokens) / len(self.completion_tokens):.0f}, "
+                             f"p99 {percentile(self.completion_tokens, 99)}, 最大 {max(self.completion_tokens)}, "
+                             f"因max_tokens截断 {self.truncated} 次")
+            if price_input is not None and price_output is not None:
+                cached_price = price_cached if price_cached is not None else price_input
+                cost = ((self.tokens['prompt'] - self.tokens['cached']) * price_input
+                        + self.tokens['cached'] * cached_price + self.tokens['completion'] * price_output) / 1_000_000
+                lines.append(f"  估计费用: ${cost:.4f}")
+        return '\n'.join(lines)
+
+    def close(self):
+        if self.prometheus_file:
+            self.write_prometheus()
+        with self._lock:
+            if self._trace is not None:
+                self._trace.close()
+                self._trace = None
@@ -0,0 +1,204 @@
+import re
+import time
+import difflib
+import requests
+import xml.etree.ElementTree as ET
+
+from retry_policy import RETRYABLE_STATUS, RetryPolicy, parse_retry_after
+from step2_clean_papers import normalize_title
+
+# arXiv导出API，使用说明建议两次请求之间间隔3秒
+ARXIV_API_URL = "http://export.arxiv.org/api/query"
+API_DELAY = 3
+API_MAX_BACKOFF = 120  # 没有速率控制器时重试前最长的退避秒数（服务端的Retry-After更长时以它为准）
+API_BATCH_SIZE = 20  # 每个请求用OR合并的标题数，过多会使查询URL过长
+API_PAGE_SIZE = 100
+API_MAX_PAGES = 3
+FUZZY_CUTOFF = 0.95  # 模糊匹配的最低相似度，只用于精确匹配失败的标题
+
+ATOM_NS = '{http://www.w3.org/2005/Atom}'
+OPENSEARCH_NS = '{http://a9.com/-/spec/opensearch/1.1/}'
+
+NOT_FOUND = "未找到arXiv链接"
+
+# 上一次请求的时间，跨多次批量调用保持请求间隔
+_last_request_time = 0.0
+
+
+def build_title_query(titles):
+    """把多个标题合并成一个 ti:"..." OR ti:"..." 查询"""
+    phrases = []
+    for title in titles:
+        # 引号和括号会破坏查询语法，替换为空格
+        phrase = re.sub(r'["()]', ' ', title)
+        phrase = re.sub(r'\s+', ' ', phrase).strip()
+        if phrase:
+            phrases.append(f'ti:"{phrase}"')
+    return ' OR '.join(phrases)
+
+
+def abs_link(entry_id):
+    """把条目id（如 http://arxiv.org/abs/2305.12345v2）转换成不带版本号的abs链接"""
+    arxiv_id = entry_id.rsplit('/abs/', 1)[-1]
+    arxiv_id = re.sub(r'v\d+$', '', arxiv_id)
+    return f"https://arxiv.org/abs/{arxiv_id}"
+
+
+def iter_feed(stream):
+    """流式解析Atom结果，依次产出 ('total', 结果总数) 和 ('entry', (abs链接, 标题))
+
+    每个entry解析完立即清理，内存占用与结果数量无关。
+    """
+    for _, elem in ET.iterparse(stream, events=('end',)):
+        if elem.tag == OPENSEARCH_NS + 'totalResults':
+            yield 'total', int(elem.text or 0)
+        elif elem.tag == ATOM_NS + 'entry':
+            entry_id = elem.findtext(ATOM_NS + 'id') or ''
+            title = elem.findtext(ATOM_NS + 'title') or ''
+            elem.clear()
+            if '/abs/' in entry_id:
+                yield 'entry', (abs_link(entry_id), re.sub(r'\s+', ' ', title).strip())
+
+
+def fetch_feed(session, query, start=0, max_results=API_PAGE_SIZE, api_url=ARXIV_API_URL, timeout=30):
+    """请求一页查询结果，返回 (结果总数, [(abs链接, 标题), ...])"""
+    params = {'search_query': query, 'start': start, 'max_results': max_results}
+    response = session.get(api_url, params=params, timeout=timeout, stream=True)
+    try:
+        response.raise_for_status()
+        # 让底层流自动解压gzip，直接交给XML解析器
+        response.raw.decode_content = True
+        total = 0
+        entries = []
+        for kind, value in iter_feed(response.raw):
+            if kind == 'total':
+                total = value
+            else:
+                entries.append(value)
+        return total, entries
+    finally:
+        response.close()
+
+
+def match_entries(titles, entries, fuzzy_cutoff=0, taken_links=()):
+    """把搜索结果对应到请求的标题上：先精确匹配归一化标题，fuzzy_cutoff大于0时再做模糊匹配
+
+    模糊匹配只在尚未被占用（精确匹配或taken_links中）的结果中进行。
+    """
+    matched = {}
+    by_norm = {}
+    for link, entry_title in entries:
+        by_norm.setdefault(normalize_title(entry_title), link)
+    for title in titles:
+        link = by_norm.get(normalize_title(title))
+        if link:
+            matched[title] = link
+    if fuzzy_cutoff:
+        used = set(matched.values()) | set(taken_links)
+        candidates = [norm for norm, link in by_norm.items() if link not in used]
+        for title in titles:
+            if title in matched:
+                continue
+            close = difflib.get_close_matches(normalize_title(title), candidates, n=1, cutoff=fuzzy_cutoff)
+            if close:
+                matched[title] = by_norm[close[0]]
+                candidates.remove(close[0])
+    return matched
+
+
+def fetch_feed_paced(session, query, start, page_size, api_url, controller=None, delay=API_DELAY,
+                     retry_count=3, log=print):
+    """按速率控制器（或固定间隔）发送一页查询，遇到429/503或网络错误时重试
+
+    没有速率控制器时重试前按指数退避等待（以delay为基数，遵守Retry-After），有控制器时由它决定等待时间。
+    """
+    global _last_request_time
+    retry_policy = RetryPolicy(max_retries=retry_count - 1, base_delay=delay, max_delay=API_MAX_BACKOFF)
+    for attempt in range(retry_count):
+        if controller is not None:
+            controller.wait()
+        else:
+            wait = _last_request_time + delay - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            _last_request_time = time.monotonic()
+        request_start = time.monotonic()
+        retry_after = None
+        try:
+            result = fetch_feed(session, query, start, page_size, api_url)
+        except requests.exceptions.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            retry_after = parse_retry_after(e.response.headers.get('Retry-After')) if e.response is not None else None
+            if controller is not None:
+                controller.on_response(status, time.monotonic() - request_start, retry_after)
+            if status not in RETRYABLE_STATUS or attempt == retry_count - 1:
+                raise
+            message = f"arXiv API返回状态码 {status}"
+        except requests.exceptions.RequestException:
+            if controller is not None:
+                controller.on_response(None, time.monotonic() - request_start)
+            if attempt == retry_count - 1:
+                raise
+            message = "arXiv API请求出错"
+        else:
+            if controller is not None:
+                controller.on_response(200, time.monotonic() - request_start)
+            return result
+        if controller is not None:
+            log(f"{message}，稍后重试")
+            continue
+        # 第一次重试的等待也要长于正常的请求间隔
+        backoff = retry_policy.backoff(attempt + 1, retry_after)
+        log(f"{message}，{backoff:.1f}秒后重试")
+        time.sleep(backoff)
+
+
+def search_arxiv_bulk(titles, session=None, api_url=ARXIV_API_URL, batch_size=API_BATCH_SIZE,
+                      page_size=API_PAGE_SIZE, max_pages=API_MAX_PAGES, delay=API_DELAY, log=print,
+                      controller=None):
+    """通过arXiv导出API批量查找论文链接，返回 {标题: 链接或未找到/错误信息}
+
+    提供controller（AIMDRateController）时由它控制请求节奏，否则两次请求之间至少间隔delay秒。
+    """
+    session = session or requests.Session()
+    results = {}
+    unique_titles = list(dict.fromkeys(t for t in titles if isinstance(t, str) and t.strip()))
+    for title in titles:
+        if not isinstance(title, str) or not title.strip():
+            results[title] = "标题为空"
+
+    for i in range(0, len(unique_titles), batch_size):
+        batch = unique_titles[i:i + batch_size]
+        query = build_title_query(batch)
+        pending = set(batch)
+        batch_entries = []
+        start = 0
+        for page in range(max_pages):
+            try:
+                total, entries = fetch_feed_paced(
+                    session, query, start, page_size, api_url, controller, delay, log=log
+                )
+            except (requests.exceptions.RequestException, ET.ParseError) as e:
+                log(f"arXiv API请求出错: {e}")
+                for title in pending:
+                    results[title] = "搜索arXiv时网络错误"
+                pending = set()
+                break
+            batch_entries.extend(entries)
+            for title, link in match_entries(list(pending), entries).items():
+                results[title] = link
+                pending.discard(title)
+            start += len(entries)
+            # 全部找到或结果已经翻完就不再翻页
+            if not pending or not entries or start >= total:
+                break
+        # 翻页结束后，对仍未找到的标题在本批全部结果中做模糊匹配
+        if pending and batch_entries:
+            taken = [results[title] for title in batch if title not in pending]
+            for title, link in match_entries(list(pending), batch_entries, FUZZY_CUTOFF, taken).items():
+                results[title] = link
+                pending.discard(title)
+        for title in pending:
+            results[title] = NOT_FOUND
+        log(f"arXiv API批量查询 {len(batch)} 个标题，找到 {sum(1 for t in batch if results[t].startswith('https://'))} 个链接")
+    return results
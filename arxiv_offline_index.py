@@ -0,0 +1,312 @@
+# 离线arXiv标题索引：从arXiv元数据JSONL快照（每行一个包含id和title的JSON对象）构建，
+# 查找时不访问网络。
+#
+# 构建：python arxiv_offline_index.py build --snapshot arxiv-metadata-oai-snapshot.json --index_dir data/arxiv_index
+# 增量：python arxiv_offline_index.py update --snapshot newer-snapshot.json --index_dir data/arxiv_index
+# 查询：python arxiv_offline_index.py lookup --index_dir data/arxiv_index --titles "Attention Is All You Need"
+#
+# 索引由若干段组成，每次build/update写入一个新段，段内数组以.npy格式保存并以内存映射方式加载：
+#   exact_keys/exact_rows  归一化标题64位哈希（已排序）及对应行号，用于精确匹配
+#   band_keys/band_rows    字符n-gram MinHash签名的LSH分带哈希（已排序），用于模糊匹配的候选召回
+#   ids                    arXiv编号（定长字节串）
+#   titles.bin/title_offsets  归一化标题（UTF-8拼接），用于校验模糊匹配的候选
+
+import argparse
+import hashlib
+import json
+import os
+import time
+import zlib
+import numpy as np
+
+from arxiv_api import NOT_FOUND
+from step2_clean_papers import normalize_title, NORMALIZE_VERSION
+
+NGRAM = 3
+NUM_PERM = 32
+BANDS = 8
+ROWS_PER_BAND = NUM_PERM // BANDS
+MIN_JACCARD = 0.8  # 模糊匹配候选与查询标题n-gram集合的最低Jaccard相似度
+MAX_CANDIDATES_PER_BAND = 64  # 过于常见的分带哈希只取前若干个候选，避免退化
+MAX_VERIFIED_CANDIDATES = 8  # 每个段只对命中分带最多的若干个候选计算Jaccard
+ID_DTYPE = 'S32'
+
+# 固定种子生成MinHash的哈希函数参数，构建和查询必须一致
+_rng = np.random.RandomState(20240501)
+_PERM_A = _rng.randint(1, 2 ** 31 - 1, size=NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, 2 ** 31 - 1, size=NUM_PERM).astype(np.uint64)
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+# 分带哈希的混合系数（uint64乘法溢出回绕即可）
+_BAND_MIX = _rng.randint(1, 2 ** 62, size=ROWS_PER_BAND, dtype=np.int64).astype(np.uint64) | np.uint64(1)
+_BAND_SALT = _rng.randint(1, 2 ** 62, size=BANDS, dtype=np.int64).astype(np.uint64)
+
+
+def title_key(norm_title):
+    """归一化标题的64位哈希"""
+    return int.from_bytes(hashlib.blake2b(norm_title.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def pair_key(key, arxiv_id):
+    """（标题哈希, arXiv编号）对的64位键，比保存元组省内存"""
+    return key ^ title_key(arxiv_id)
+
+
+def ngrams(norm_title):
+    """字符n-gram集合，标题短于n时整体作为一个n-gram"""
+    text = f" {norm_title} "
+    if len(text) <= NGRAM:
+        return {text}
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+def band_keys(norm_title):
+    """计算标题MinHash签名的各分带哈希"""
+    shingles = np.fromiter(
+        (zlib.crc32(gram.encode('utf-8')) for gram in ngrams(norm_title)), dtype=np.uint64
+    )
+    signature = ((_PERM_A[:, None] * shingles[None, :] + _PERM_B[:, None]) % _MERSENNE_PRIME).min(axis=1)
+    bands = signature.reshape(BANDS, ROWS_PER_BAND)
+    with np.errstate(over='ignore'):
+        return (bands * _BAND_MIX).sum(axis=1) ^ _BAND_SALT
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class IndexSegment:
+    """一个以内存映射方式加载的索引段"""
+
+    def __init__(self, path):
+        self.path = path
+        self.exact_keys = np.load(os.path.join(path, 'exact_keys.npy'), mmap_mode='r')
+        self.exact_rows = np.load(os.path.join(path, 'exact_rows.npy'), mmap_mode='r')
+        self.band_keys = np.load(os.path.join(path, 'band_keys.npy'), mmap_mode='r')
+        self.band_rows = np.load(os.path.join(path, 'band_rows.npy'), mmap_mode='r')
+        self.ids = np.load(os.path.join(path, 'ids.npy'), mmap_mode='r')
+        self.title_offsets = np.load(os.path.join(path, 'title_offsets.npy'), mmap_mode='r')
+        titles_path = os.path.join(path, 'titles.bin')
+        if os.path.getsize(titles_path):
+            self.titles = np.memmap(titles_path, dtype=np.uint8, mode='r')
+        else:
+            self.titles = np.zeros(0, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def arxiv_id(self, row):
+        return self.ids[row].decode('ascii')
+
+    def title(self, row):
+        start, end = self.title_offsets[row], self.title_offsets[row + 1]
+        return self.titles[start:end].tobytes().decode('utf-8')
+
+    def lookup_exact(self, keys):
+        """批量精确查找，返回每个哈希对应的行号，找不到为-1"""
+        pos = np.searchsorted(self.exact_keys, keys)
+        pos = np.minimum(pos, max(len(self.exact_keys) - 1, 0))
+        rows = np.full(len(keys), -1, dtype=np.int64)
+        if len(self.exact_keys):
+            hit = self.exact_keys[pos] == keys
+            rows[hit] = self.exact_rows[pos[hit]]
+        return rows
+
+    def candidates(self, keys, limit=MAX_VERIFIED_CANDIDATES):
+        """根据分带哈希召回候选行号，按命中的分带数从多到少取前limit个"""
+        left = np.searchsorted(self.band_keys, keys, side='left')
+        right = np.searchsorted(self.band_keys, keys, side='right')
+        hits = [self.band_rows[lo:min(hi, lo + MAX_CANDIDATES_PER_BAND)] for lo, hi in zip(left, right) if hi > lo]
+        if not hits:
+            return []
+        rows, counts = np.unique(np.concatenate(hits), return_counts=True)
+        order = np.argsort(-counts, kind='stable')[:limit]
+        return [int(r) for r in rows[order]]
+
+
+def write_segment(path, records):
+    """把 [(arXiv编号, 归一化标题)] 写成一个索引段"""
+    os.makedirs(path, exist_ok=True)
+    n = len(records)
+    ids = np.array([arxiv_id.encode('ascii', 'ignore') for arxiv_id, _ in records], dtype=ID_DTYPE)
+    exact = np.array([title_key(norm) for _, norm in records], dtype=np.uint64)
+    bands = np.empty((n, BANDS), dtype=np.uint64)
+    offsets = np.zeros(n + 1, dtype=np.uint64)
+    with open(os.path.join(path, 'titles.bin'), 'wb') as f:
+        for row, (_, norm) in enumerate(records):
+            bands[row] = band_keys(norm)
+            data = norm.encode('utf-8')
+            f.write(data)
+            offsets[row + 1] = offsets[row] + len(data)
+
+    order = np.argsort(exact, kind='stable')
+    np.save(os.path.join(path, 'exact_keys.npy'), exact[order])
+    np.save(os.path.join(path, 'exact_rows.npy'), order.astype(np.uint32))
+    flat_keys = bands.reshape(-1)
+    flat_rows = np.repeat(np.arange(n, dtype=np.uint32), BANDS)
+    order = np.argsort(flat_keys, kind='stable')
+    np.save(os.path.join(path, 'band_keys.npy'), flat_keys[order])
+    np.save(os.path.join(path, 'band_rows.npy'), flat_rows[order])
+    np.save(os.path.join(path, 'ids.npy'), ids)
+    np.save(os.path.join(path, 'title_offsets.npy'), offsets)
+
+
+def iter_snapshot(snapshot_file):
+    """逐行读取元数据快照，产出 (arXiv编号, 归一化标题)"""
+    with open(snapshot_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            arxiv_id = record.get('id')
+            norm = normalize_title(record.get('title'))
+            if arxiv_id and norm:
+                yield str(arxiv_id), norm
+
+
+class OfflineArxivIndex:
+    """由多个索引段组成的离线标题索引，新段优先"""
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        self.segments = []
+        manifest_file = os.path.join(index_dir, 'manifest.json')
+        if os.path.exists(manifest_file):
+            with open(manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('num_perm') != NUM_PERM or manifest.get('bands') != BANDS or manifest.get('ngram') != NGRAM:
+                raise ValueError(f"索引 {index_dir} 的MinHash参数与当前版本不一致，请重新构建")
+            # 没有记录归一化版本的索引由旧规则（不做NFKC、不折叠下划线）构建
+            if manifest.get('normalize_version', 1) != NORMALIZE_VERSION:
+                raise ValueError(f"索引 {index_dir} 使用的标题归一化规则与当前版本不一致，请重新构建")
+            # 查找时新段优先
+            self.segments = [IndexSegment(os.path.join(index_dir, name)) for name in reversed(manifest['segments'])]
+
+    def __len__(self):
+        return sum(len(segment) for segment in self.segments)
+
+    def add_snapshot(self, snapshot_file, log=print):
+        """把快照中索引里还没有的（编号, 标题）对写入一个新段，返回新增条数"""
+        records = []
+        existing = self._existing_pairs()
+        seen = set()
+        skipped = 0
+        for arxiv_id, norm in iter_snapshot(snapshot_file):
+            pair = pair_key(title_key(norm), arxiv_id)
+            if pair in existing:
+                skipped += 1
+                continue
+            if pair in seen:
+                continue
+            seen.add(pair)
+            records.append((arxiv_id, norm))
+            if len(records) % 100000 == 0:
+                log(f"已读取 {len(records)} 条新记录...")
+        log(f"快照中新增 {len(records)} 条，已存在 {skipped} 条")
+        if not records:
+            return 0
+
+        os.makedirs(self.index_dir, exist_ok=True)
+        names = [os.path.basename(segment.path) for segment in reversed(self.segments)]
+        name = f"seg_{len(names):03d}"
+        write_segment(os.path.join(self.index_dir, name), records)
+        names.append(name)
+        # 先写临时文件再替换，中途崩溃不会留下写了一半的清单
+        manifest_file = os.path.join(self.index_dir, 'manifest.json')
+        tmp_file = f"{manifest_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'segments': names, 'num_perm': NUM_PERM, 'bands': BANDS, 'ngram': NGRAM,
+                       'normalize_version': NORMALIZE_VERSION}, f, indent=2)
+        os.replace(tmp_file, manifest_file)
+        self.segments.insert(0, IndexSegment(os.path.join(self.index_dir, name)))
+        return len(records)
+
+    def _existing_pairs(self):
+        """索引中已有记录的（标题哈希, 编号）对键集合，每个快照只读取一遍各段"""
+        pairs = set()
+        for segment in self.segments:
+            rows = np.asarray(segment.exact_rows).tolist()
+            for key, row in zip(np.asarray(segment.exact_keys).tolist(), rows):
+                pairs.add(pair_key(key, segment.arxiv_id(row)))
+        return pairs
+
+    def lookup(self, titles, fuzzy=True):
+        """批量查找标题，返回与输入一一对应的arXiv编号列表，找不到为None"""
+        norms = [normalize_title(t) for t in titles]
+        keys = np.array([title_key(n) for n in norms], dtype=np.uint64)
+        found = [None] * len(titles)
+        missing = np.ones(len(titles), dtype=bool)
+        for segment in self.segments:
+            if not missing.any():
+                break
+            idx = np.nonzero(missing)[0]
+            rows = segment.lookup_exact(keys[idx])
+            for i, row in zip(idx, rows):
+                if row >= 0:
+                    found[i] = segment.arxiv_id(row)
+                    missing[i] = False
+
+        if fuzzy:
+            for i in np.nonzero(missing)[0]:
+                if norms[i]:
+                    found[i] = self._lookup_fuzzy(norms[i])
+        return found
+
+    def _lookup_fuzzy(self, norm):
+        """用MinHash分带召回候选，再用n-gram Jaccard相似度校验"""
+        query_bands = band_keys(norm)
+        query_grams = ngrams(norm)
+        best_id, best_score = None, MIN_JACCARD
+        for segment in self.segments:
+            for row in segment.candidates(query_bands):
+                score = jaccard(query_grams, ngrams(segment.title(row)))
+                if score >= best_score:
+                    best_id, best_score = segment.arxiv_id(row), score
+        return best_id
+
+    def lookup_links(self, titles):
+        """step4使用的接口：返回 {标题: abs链接或未找到}"""
+        results = {}
+        for title, arxiv_id in zip(titles, self.lookup(titles)):
+            results[title] = f"https://arxiv.org/abs/{arxiv_id}" if arxiv_id else NOT_FOUND
+        return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='离线arXiv标题索引')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for command, help_text in [('build', '从元数据快照构建新索引'), ('update', '用更新的快照增量更新索引')]:
+        sub = subparsers.add_parser(command, help=help_text)
+        sub.add_argument('--snapshot', type=str, required=True, help='arXiv元数据JSONL快照文件')
+        sub.add_argument('--index_dir', type=str, default='data/arxiv_index', help='索引目录')
+    lookup_parser = subparsers.add_parser('lookup', help='查询标题')
+    lookup_parser.add_argument('--index_dir', type=str, default='data/arxiv_index', help='索引目录')
+    lookup_parser.add_argument('--titles', nargs='+', required=True, help='要查询的论文标题')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build' and os.path.exists(os.path.join(args.index_dir, 'manifest.json')):
+        print(f"索引 {args.index_dir} 已存在，请使用update命令或换一个目录")
+        return
+
+    index = OfflineArxivIndex(args.index_dir)
+    if args.command in ('build', 'update'):
+        start = time.perf_counter()
+        added = index.add_snapshot(args.snapshot)
+        print(f"写入 {added} 条记录，耗时 {time.perf_counter() - start:.1f} 秒，索引共 {len(index)} 条")
+        return
+
+    start = time.perf_counter()
+    links = index.lookup_links(args.titles)
+    elapsed = time.perf_counter() - start
+    for title, link in links.items():
+        print(f"{title[:60]} -> {link}")
+    print(f"查询 {len(args.titles)} 个标题耗时 {elapsed * 1000:.1f} 毫秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# 会议页面解析基准测试：对比单遍事件解析器与原来基于BeautifulSoup多次全树扫描的实现
+#
+# 用法：
+#   python bench_parser.py --fixtures "fixtures/papers_cool/*.html"
+#   python bench_parser.py --synthetic 400     # 没有录制页面时生成一个含400篇论文的模拟页面
+#
+# 仓库中没有提交录制的页面，需要先用 --record 录制（需要联网），否则只能用 --synthetic 测量模拟页面。
+#
+# 录制页面：python bench_parser.py --record "https://papers.cool/venue/NeurIPS.2023?group=Oral&show=75" --out fixtures/papers_cool/neurips2023_oral.html
+
+import argparse
+import glob
+import os
+import re
+import time
+import requests
+from bs4 import BeautifulSoup
+
+from papers_cool_parser import parse_papers_html
+
+
+def legacy_parse(html):
+    """原fetch_papers_info中的解析逻辑（多次全树扫描），仅用于对比"""
+    soup = BeautifulSoup(html, 'html.parser')
+    papers_data = []
+    paper_blocks = soup.select('div[class^="#"]')
+    if not paper_blocks:
+        paper_blocks = soup.find_all('div', {'class': lambda x: x and (x.startswith('paper-') or 'paper' in x)})
+    if not paper_blocks:
+        headers = soup.find_all(['h2', 'h3'], {'id': lambda x: x and ('paper-' in x or '#' in x)})
+        for header in headers:
+            paper_info = {}
+            paper_info['title'] = header.text.strip()
+            authors_section = header.find_next('p')
+            if authors_section and 'Authors' in authors_section.text:
+                paper_info['authors'] = authors_section.text.replace('Authors:', '').strip()
+            abstract_section = authors_section.find_next('p') if authors_section else None
+            if abstract_section:
+                paper_info['abstract'] = abstract_section.text.strip()
+            papers_data.append(paper_info)
+    if not papers_data:
+        paper_entries = []
+        for element in soup.find_all(['h1', 'h2', 'h3']):
+            text = element.text.strip()
+            if re.search(r'#\d+', text) or 'paper' in text.lower():
+                paper_entries.append(element)
+        for entry in paper_entries:
+            paper_info = {}
+            paper_info['title'] = re.sub(r'^#\d+\s+', '', entry.text.strip())
+            next_elem = entry.find_next_sibling()
+            while next_elem and next_elem.name not in ['h1', 'h2', 'h3']:
+                if 'Authors' in next_elem.text or 'authors' in next_elem.text.lower():
+                    paper_info['authors'] = next_elem.text.replace('Authors:', '').strip()
+                elif 'abstract' not in paper_info and len(next_elem.text) > 100:
+                    paper_info['abstract'] = next_elem.text.strip()
+                next_elem = next_elem.find_next_sibling()
+            if 'title' in paper_info:
+                papers_data.append(paper_info)
+    return papers_data
+
+
+def synthetic_page(count):
+    """生成与papers.cool结构相同的模拟页面（不是录制数据，只用于没有fixture时测速）"""
+    blocks = []
+    for i in range(count):
+        blocks.append(
+            f'<div id="paper{i}" class="panel paper" keywords="audio,pretraining">'
+            f'<h2 class="title"><span class="index notranslate">#{i + 1}</span> '
+            f'<a class="title-link notranslate" href="/paper/{i}">Synthetic Paper Title Number {i}</a> '
+            f'<a class="title-pdf notranslate">[PDF<sup>{i % 30}</sup>]</a> <a class="title-copy">[Copy]</a> '
+            f'<a class="title-kimi">[Kimi<sup>{i % 20}</sup>]</a> <a class="title-rel">[REL]</a></h2>'
+            f'<p class="metainfo authors notranslate"><strong>Authors</strong>: '
+            + ', '.join(f'<a class="author notranslate" href="#">Author {i}-{j}</a>' for j in range(5)) +
+            '</p>'
+            f'<p class="summary notranslate">{"This paper studies a synthetic problem. " * 30}</p>'
+            '<p class="metainfo date"><span>Date</span>: 2023-12-01</p></div>'
+        )
+    return (
+        '<!DOCTYPE html><html><head><title>NeurIPS.2023 - Oral | Cool Papers</title></head><body>'
+        '<h1>Cool Papers - Immersive Paper Discovery</h1><div class="papers">'
+        + ''.join(blocks) + '</div></body></html>'
+    )
+
+
+def bench(name, parse, pages, repeat):
+    """对所有页面重复解析repeat次，返回 (每页平均秒数, 每秒论文数, 论文数)"""
+    start = time.perf_counter()
+    total = 0
+    for _ in range(repeat):
+        for html in pages:
+            total += len(parse(html))
+    elapsed = time.perf_counter() - start
+    per_page = elapsed / (repeat * len(pages))
+    papers_per_sec = total / elapsed if elapsed else 0.0
+    print(f"{name:<8} 每页 {per_page * 1000:8.1f} 毫秒  {papers_per_sec:10.0f} 篇/秒  共解析 {total // repeat} 篇/轮")
+    return per_page, papers_per_sec, total // repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='会议页面解析基准测试')
+    parser.add_argument('--fixtures', type=str, default='fixtures/papers_cool/*.html', help='录制的页面文件（glob）')
+    parser.add_argument('--synthetic', type=int, default=0, help='生成含指定论文数的模拟页面代替录制页面')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数')
+    parser.add_argument('--record', type=str, default='', help='录制指定URL的页面')
+    parser.add_argument('--out', type=str, default='', help='录制页面的保存路径')
+    args = parser.parse_args()
+
+    if args.record:
+        response = requests.get(args.record, timeout=60)
+        response.raise_for_status()
+        out = args.out or os.path.join('fixtures', 'papers_cool', 'page.html')
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        with open(out, 'w', encoding='utf-8') as f:
+            f.write(response.text)
+        print(f"已录制 {args.record} 到 {out}")
+        return
+
+    if args.synthetic:
+        pages = [synthetic_page(args.synthetic)]
+        print(f"使用模拟页面: {args.synthetic} 篇论文, {len(pages[0]) / 1024:.0f} KB")
+    else:
+        files = sorted(glob.glob(args.fixtures))
+        if not files:
+            print(f"未找到录制页面 {args.fixtures}，可使用 --record 录制或 --synthetic 生成模拟页面")
+            return
+        pages = []
+        for path in files:
+            with open(path, 'r', encoding='utf-8') as f:
+                pages.append(f.read())
+        print(f"使用 {len(pages)} 个录制页面, 共 {sum(len(p) for p in pages) / 1024:.0f} KB")
+
+    legacy_time, _, legacy_count = bench('原实现', legacy_parse, pages, args.repeat)
+    fast_time, _, fast_count = bench('单遍解析', parse_papers_html, pages, args.repeat)
+    print(f"加速比: {legacy_time / fast_time:.1f}x")
+    if legacy_count != fast_count:
+        print(f"注意: 两种实现解析出的论文数不同（原实现 {legacy_count} 篇，单遍解析 {fast_count} 篇）")
+
+
+if __name__ == "__main__":
+    main()
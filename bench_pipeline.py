@@ -0,0 +1,378 @@
+# 流水线基准测试：用录制的页面和本地替身服务器离线测量各阶段的吞吐量、峰值内存和延迟
+#
+# 阶段：
+#   fetch      第1步 fetch_papers_info：从本地服务器抓取并解析papers.cool页面（fixtures/papers_cool/*.html）
+#   arxiv      第4步 search_arxiv：逐篇请求arXiv搜索结果页（fixtures/arxiv_search/*.html）
+#   arxiv_api  第4步 search_arxiv_bulk：批量查询arXiv导出API替身（mock_arxiv_server.py，fixtures/arxiv/*.xml）
+#   analyze    第3步 call_deepseek_api：并发请求DeepSeek替身服务器（mock_deepseek_server.py）
+#
+# 仓库中没有提交任何录制文件（没有fixtures/目录），默认情况下fetch、arxiv和arxiv_api阶段都使用模拟数据：
+# 按真实页面结构生成的papers.cool页面、模拟的搜索结果页和按标题生成的Atom结果，analyze阶段始终使用替身服务器。
+# 模拟数据只能反映解析和客户端开销，不能代表真实页面的大小和结构，结果表的"数据"列标明了每个阶段实际使用的数据。
+# 需要真实数据时先用下面的命令录制（需要联网），录制文件放在fixtures/下。
+# 每个阶段在单独的子进程中运行，各阶段的峰值内存互不影响。
+#
+# 用法：
+#   python bench_pipeline.py                                      # 运行全部阶段
+#   python bench_pipeline.py --stages analyze --deepseek_latency 0.5 --error_rate 0.05 --rate_limit_rate 0.05
+#   python bench_pipeline.py --save data/bench_baseline.json       # 保存基线
+#   python bench_pipeline.py --compare data/bench_baseline.json    # 与基线对比，出现退化时以状态码1退出
+#   python bench_pipeline.py --record_arxiv "Title A" "Title B"    # 从arXiv录制搜索结果页
+#   python bench_parser.py --record <会议页面URL> --out fixtures/papers_cool/<名称>.html
+#   python mock_arxiv_server.py record --titles "Title A" "Title B" --out fixtures/arxiv/feed_1.xml
+
+import argparse
+import contextlib
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from xml.sax.saxutils import escape
+
+from memory_monitor import peak_rss_mb
+
+STAGES = ('fetch', 'arxiv', 'arxiv_api', 'analyze')
+RESULT_MARKER = 'BENCH_RESULT '  # 子进程输出结果行的前缀
+
+
+def search_key(query):
+    """arXiv搜索结果页录制文件名：与search_arxiv相同地截取标题前60个字符"""
+    return hashlib.sha1(query[:60].strip().encode('utf-8')).hexdigest()[:16]
+
+
+def fake_arxiv_id(title):
+    """模拟数据中标题对应的arXiv编号，同一标题总是相同"""
+    digest = int(hashlib.sha1(title.encode('utf-8')).hexdigest(), 16)
+    return f"23{digest % 12:02d}.{digest % 100000:05d}"
+
+
+def synthetic_search_page(title):
+    """与arXiv搜索结果页结构相同的模拟页面（不是录制数据）"""
+    arxiv_id = fake_arxiv_id(title)
+    filler = ''.join(f'<li class="arxiv-result"><p class="list-title is-inline-block">'
+                     f'<a href="https://arxiv.org/abs/{arxiv_id}v{i}">arXiv:{arxiv_id}v{i}</a></p>'
+                     f'<p class="title is-5 mathjax">{escape(title)}</p>'
+                     f'<p class="abstract mathjax">{"A synthetic abstract sentence. " * 40}</p></li>' for i in range(1, 4))
+    return ('<!DOCTYPE html><html><head><title>Search | arXiv e-print repository</title></head><body>'
+            f'<h1 class="title is-clearfix">Showing 1&ndash;3 of 3 results for title: {escape(title[:60])}</h1>'
+            f'<ol class="breathe-horizontal">{filler}</ol></body></html>')
+
+
+def synthetic_feed(titles):
+    """与arXiv导出API格式相同的模拟Atom文档，每个标题一个条目"""
+    entries = ''.join(
+        f'<entry><id>http://arxiv.org/abs/{fake_arxiv_id(title)}v1</id><title>{escape(title)}</title>'
+        f'<summary>{"A synthetic abstract sentence. " * 20}</summary></entry>'
+        for title in titles
+    )
+    return f'<?xml version="1.0" encoding="UTF-8"?><feed xmlns="http://www.w3.org/2005/Atom">{entries}</feed>'
+
+
+def load_papers_cool_pages(fixtures, synthetic_count):
+    """读取录制的papers.cool页面，没有时生成一个模拟页面，返回 {页面名: HTML}"""
+    pages = {}
+    for path in sorted(glob.glob(fixtures)):
+        with open(path, 'r', encoding='utf-8') as f:
+            pages[os.path.splitext(os.path.basename(path))[0]] = f.read()
+    if not pages:
+        from bench_parser import synthetic_page
+        pages['synthetic'] = synthetic_page(synthetic_count)
+    return pages
+
+
+def load_search_pages(fixtures_dir):
+    """读取录制的arXiv搜索结果页，返回 {录制键: HTML}"""
+    pages = {}
+    for path in glob.glob(os.path.join(fixtures_dir, '*.html')):
+        with open(path, 'r', encoding='utf-8') as f:
+            pages[os.path.splitext(os.path.basename(path))[0]] = f.read()
+    return pages
+
+
+def start_fixture_server(venue_pages, search_pages):
+    """在后台线程启动页面服务器：/venue/<页面名> 返回papers.cool页面，/search/ 返回arXiv搜索结果页
+
+    没有录制的搜索词返回模拟的搜索结果页。返回 (server, 根地址)。
+    """
+    class FixtureHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path.startswith('/venue/'):
+                html = venue_pages.get(url.path[len('/venue/'):])
+            elif url.path.startswith('/search/'):
+                query = parse_qs(url.query).get('query', [''])[0]
+                html = search_pages.get(search_key(query)) or synthetic_search_page(query)
+            else:
+                html = None
+            if html is None:
+                self.send_error(404)
+                return
+            data = html.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def bench_papers(args):
+    """各阶段共用的论文列表：从papers.cool页面中解析，最多args.papers篇"""
+    from papers_cool_parser import parse_papers_html
+    papers = []
+    for html in load_papers_cool_pages(args.papers_cool_fixtures, args.papers).values():
+        papers.extend(paper for paper in parse_papers_html(html) if paper.get('title'))
+    return papers[:args.papers]
+
+
+def run_fetch(args):
+    """第1步：通过HTTP抓取并解析每个页面，延迟单位为页面"""
+    from http_session import make_session
+    from step1_fetch_papers import fetch_papers_info
+    pages = load_papers_cool_pages(args.papers_cool_fixtures, args.papers)
+    server, base_url = start_fixture_server(pages, {})
+    session = make_session()
+    latencies, items, errors = [], 0, 0
+    try:
+        for _ in range(args.repeat):
+            for name in pages:
+                start = time.perf_counter()
+                papers = fetch_papers_info(f"{base_url}/venue/{name}", session=session)
+                latencies.append(time.perf_counter() - start)
+                items += len(papers)
+                errors += 0 if papers else 1
+    finally:
+        server.shutdown()
+    return {'items': items, 'latencies': latencies, 'latency_unit': '页面', 'errors': errors,
+            'fixtures': 'recorded' if 'synthetic' not in pages else 'synthetic'}
+
+
+def run_arxiv(args):
+    """第4步html方式：逐篇请求搜索结果页并提取链接，延迟单位为论文"""
+    from step4_search_arxiv import ARXIV_FAILURE_PREFIXES, search_arxiv
+    titles = [paper['title'] for paper in bench_papers(args)]
+    search_pages = load_search_pages(args.arxiv_search_fixtures)
+    server, base_url = start_fixture_server({}, search_pages)
+    latencies, errors = [], 0
+    try:
+        for title in titles:
+            start = time.perf_counter()
+            link = search_arxiv(title, retry_count=1, base_url=f"{base_url}/search/")
+            latencies.append(time.perf_counter() - start)
+            errors += 1 if link is None or link.startswith(ARXIV_FAILURE_PREFIXES) else 0
+    finally:
+        server.shutdown()
+    return {'items': len(titles), 'latencies': latencies, 'latency_unit': '篇', 'errors': errors,
+            'fixtures': 'recorded' if search_pages else 'synthetic'}
+
+
+def run_arxiv_api(args):
+    """第4步api方式：按批量大小查询导出API替身服务器，延迟单位为请求（一批标题）"""
+    from arxiv_api import search_arxiv_bulk
+    from mock_arxiv_server import start_server
+    titles = [paper['title'] for paper in bench_papers(args)]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        feeds_dir = args.arxiv_feed_fixtures
+        recorded = bool(glob.glob(os.path.join(feeds_dir, '*.xml')))
+        if not recorded:
+            feeds_dir = tmp_dir
+            with open(os.path.join(tmp_dir, 'synthetic.xml'), 'w', encoding='utf-8') as f:
+                f.write(synthetic_feed(titles))
+        server, api_url = start_server(feeds_dir)
+        latencies, errors = [], 0
+        try:
+            for i in range(0, len(titles), args.api_batch_size):
+                batch = titles[i:i + args.api_batch_size]
+                start = time.perf_counter()
+                links = search_arxiv_bulk(batch, api_url=api_url, batch_size=args.api_batch_size, delay=0)
+                latencies.append(time.perf_counter() - start)
+                errors += sum(1 for link in links.values() if not link.startswith('https://'))
+        finally:
+            server.shutdown()
+    return {'items': len(titles), 'latencies': latencies, 'latency_unit': '请求', 'errors': errors,
+            'fixtures': 'recorded' if recorded else 'synthetic'}
+
+
+def run_analyze(args):
+    """第3步：并发分析论文，请求发往DeepSeek替身服务器，延迟单位为HTTP请求（含失败和重试）"""
+    import asyncio
+    import step3_analyze_papers_with_deepseek as step3
+    from api_metrics import ApiMetrics
+    from mock_deepseek_server import start_server
+    from retry_policy import CircuitBreaker, RetryPolicy
+    server, api_url = start_server(
+        latency=args.deepseek_latency, jitter=args.deepseek_jitter, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after, seed=args.seed
+    )
+    # 与step3的main相同，通过模块级配置替换API地址、重试策略和指标收集器
+    step3.API_URL = api_url
+    step3.RETRY_POLICY = RetryPolicy(max_retries=args.max_retries, base_delay=args.retry_base_delay)
+    step3.CIRCUIT_BREAKER = CircuitBreaker(failure_threshold=0)
+    step3.METRICS = ApiMetrics()
+    papers = [{'title': paper['title'], 'clean_title': paper['title'], 'authors': paper.get('authors', ''),
+               'abstract': paper.get('abstract', '')} for paper in bench_papers(args)]
+    try:
+        analyses = asyncio.run(step3.analyze_papers_async(
+            'bench', papers, args.concurrency, None, None, args.batch_size
+        ))
+    finally:
+        server.shutdown()
+    return {'items': len(papers), 'latencies': step3.METRICS.latencies, 'latency_unit': '请求',
+            'errors': sum(1 for analysis in analyses if analysis is None),
+            'retries': step3.METRICS.retries, 'server': server.stats.snapshot(), 'fixtures': 'mock'}
+
+
+STAGE_RUNNERS = {'fetch': run_fetch, 'arxiv': run_arxiv, 'arxiv_api': run_arxiv_api, 'analyze': run_analyze}
+
+
+def run_stage(stage, args):
+    """在当前进程中运行一个阶段，返回结果字典；阶段本身的输出被丢弃"""
+    from api_metrics import percentile
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        result = STAGE_RUNNERS[stage](args)
+    seconds = time.perf_counter() - start
+    latencies = result.pop('latencies')
+    result.update({
+        'stage': stage,
+        'seconds': round(seconds, 3),
+        'papers_per_sec': round(result['items'] / seconds, 2) if seconds else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'peak_rss_mb': peak_rss_mb(),
+    })
+    return result
+
+
+def run_stage_subprocess(stage, argv):
+    """在新的Python进程中运行一个阶段，峰值内存只包含该阶段"""
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', stage] + argv,
+                               capture_output=True, text=True)
+    for line in reversed(completed.stdout.splitlines()):
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+    print(f"阶段 {stage} 运行失败（退出码 {completed.returncode}）:")
+    print('\n'.join(completed.stderr.splitlines()[-15:]))
+    return None
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """吞吐量下降、p99延迟或峰值内存上升超过tolerance时视为退化，返回退化描述列表"""
+    regressions = []
+    for result in results:
+        base = baseline.get(result['stage'])
+        if not base:
+            continue
+        if base['papers_per_sec'] and result['papers_per_sec'] < base['papers_per_sec'] * (1 - tolerance):
+            regressions.append(f"{result['stage']}: 吞吐量 {result['papers_per_sec']} 篇/秒，基线 {base['papers_per_sec']}")
+        if base['p99_ms'] and result['p99_ms'] > base['p99_ms'] * (1 + tolerance):
+            regressions.append(f"{result['stage']}: p99延迟 {result['p99_ms']} 毫秒，基线 {base['p99_ms']}")
+        if base.get('peak_rss_mb') and result.get('peak_rss_mb') and \
+                result['peak_rss_mb'] > base['peak_rss_mb'] * (1 + tolerance):
+            regressions.append(f"{result['stage']}: 峰值内存 {result['peak_rss_mb']:.0f} MB，基线 {base['peak_rss_mb']:.0f}")
+    return regressions
+
+
+def record_arxiv_search(titles, out_dir):
+    """从arXiv录制标题搜索结果页，文件名由搜索词决定"""
+    import requests
+    from urllib.parse import quote
+    from step4_search_arxiv import ARXIV_SEARCH_URL
+    os.makedirs(out_dir, exist_ok=True)
+    for title in titles:
+        query = title[:60].strip()
+        response = requests.get(f"{ARXIV_SEARCH_URL}?query={quote(query)}&searchtype=title", timeout=60)
+        response.raise_for_status()
+        out_file = os.path.join(out_dir, f"{search_key(query)}.html")
+        with open(out_file, 'w', encoding='utf-8') as f:
+            f.write(response.text)
+        print(f"已录制 {title[:50]} 的搜索结果页到 {out_file}")
+        time.sleep(3)  # 遵守arXiv的访问频率要求
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    parser = argparse.ArgumentParser(description='流水线各阶段的离线基准测试')
+    parser.add_argument('--stages', type=str, nargs='+', default=list(STAGES), choices=STAGES, help='要运行的阶段')
+    parser.add_argument('--papers', type=int, default=200, help='arxiv和analyze阶段使用的论文数，也是模拟页面的论文数')
+    parser.add_argument('--repeat', type=int, default=3, help='fetch阶段每个页面的抓取次数')
+    parser.add_argument('--papers_cool_fixtures', type=str, default='fixtures/papers_cool/*.html',
+                        help='录制的papers.cool页面（glob），可用bench_parser.py --record录制')
+    parser.add_argument('--arxiv_search_fixtures', type=str, default='fixtures/arxiv_search',
+                        help='录制的arXiv搜索结果页目录，可用--record_arxiv录制')
+    parser.add_argument('--arxiv_feed_fixtures', type=str, default='fixtures/arxiv',
+                        help='录制的arXiv导出API结果目录，可用mock_arxiv_server.py record录制')
+    parser.add_argument('--api_batch_size', type=int, default=20, help='arxiv_api阶段每个请求查询的标题数')
+    parser.add_argument('--concurrency', type=int, default=8, help='analyze阶段同时在途的请求数')
+    parser.add_argument('--batch_size', type=int, default=1, help='analyze阶段每个请求打包的论文数')
+    parser.add_argument('--deepseek_latency', type=float, default=0.2, help='DeepSeek替身服务器的平均延迟（秒）')
+    parser.add_argument('--deepseek_jitter', type=float, default=0.1, help='DeepSeek替身服务器延迟的波动范围（±秒）')
+    parser.add_argument('--error_rate', type=float, default=0.0, help='DeepSeek替身服务器返回500的概率')
+    parser.add_argument('--rate_limit_rate', type=float, default=0.0, help='DeepSeek替身服务器返回429的概率')
+    parser.add_argument('--retry_after', type=int, default=1, help='429响应中Retry-After头的秒数')
+    parser.add_argument('--max_retries', type=int, default=5, help='analyze阶段的最大重试次数')
+    parser.add_argument('--retry_base_delay', type=float, default=0.1, help='analyze阶段重试退避的初始秒数')
+    parser.add_argument('--seed', type=int, default=0, help='替身服务器的随机数种子')
+    parser.add_argument('--save', type=str, default='', help='把本次结果保存为基线JSON文件')
+    parser.add_argument('--compare', type=str, default='', help='与基线JSON文件对比')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='对比基线时允许的相对变化')
+    parser.add_argument('--record_arxiv', type=str, nargs='+', default=None, help='从arXiv录制这些标题的搜索结果页')
+    parser.add_argument('--child', type=str, default='', choices=('',) + STAGES, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(RESULT_MARKER + json.dumps(run_stage(args.child, args), ensure_ascii=False))
+        return
+    if args.record_arxiv:
+        record_arxiv_search(args.record_arxiv, args.arxiv_search_fixtures)
+        return
+
+    results = []
+    print(f"{'阶段':<12}{'数据':<11}{'篇/秒':>10}{'p50(毫秒)':>12}{'p99(毫秒)':>12}{'峰值内存(MB)':>14}{'失败':>6}")
+    for stage in args.stages:
+        result = run_stage_subprocess(stage, argv)
+        if result is None:
+            continue
+        results.append(result)
+        rss = f"{result['peak_rss_mb']:.0f}" if result['peak_rss_mb'] is not None else '-'
+        print(f"{stage:<12}{result['fixtures']:<11}{result['papers_per_sec']:>10.1f}{result['p50_ms']:>12.1f}"
+              f"{result['p99_ms']:>12.1f}{rss:>14}{result['errors']:>6}   （延迟单位: {result['latency_unit']}）")
+        if 'server' in result:
+            print(f"{'':<12}替身服务器: {result['server']}，客户端重试 {result['retries']} 次")
+    synthetic = [result['stage'] for result in results if result['fixtures'] == 'synthetic']
+    if synthetic:
+        print(f"\n注意: {', '.join(synthetic)} 阶段没有找到录制文件，使用的是模拟数据，结果不代表真实页面上的性能")
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or '.', exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({result['stage']: result for result in results}, f, ensure_ascii=False, indent=2)
+        print(f"\n基线已保存到 {args.save}")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n与基线 {args.compare} 相比出现退化（容差 {args.tolerance:.0%}）:")
+            for line in regressions:
+                print(f"  {line}")
+            raise SystemExit(1)
+        print(f"\n与基线 {args.compare} 相比没有超过 {args.tolerance:.0%} 的退化")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# 启动耗时基准测试：在新的Python进程中测量命令行入口和各模块的导入耗时
+#
+# 用法：
+#   python bench_startup.py                    # 测量 deepdigest.py --help、status 和各步骤模块的导入耗时
+#   python bench_startup.py --importtime analyze   # 列出导入某个子命令模块时最慢的依赖
+#
+# 目标：deepdigest.py --help 和 status 在定时任务主机上远低于1秒。
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from deepdigest import COMMANDS
+
+TARGET_SECONDS = 1.0
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))  # 子进程在仓库目录中运行，保证能导入各模块
+
+
+def run_seconds(args, repeat):
+    """在新进程中运行repeat次，返回 (每次的耗时（秒）, 是否都成功退出)"""
+    timings = []
+    ok = True
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable] + args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                cwd=REPO_DIR)
+        timings.append(time.perf_counter() - start)
+        ok = ok and result.returncode == 0
+    return timings, ok
+
+
+def show_importtime(module_name, top):
+    """用 -X importtime 列出导入模块时累计耗时最长的依赖"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, cwd=REPO_DIR)
+    rows = []
+    for line in result.stderr.splitlines():
+        # 格式: import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        rows.append((int(cumulative), name.strip()))
+    rows.sort(reverse=True)
+    print(f"导入 {module_name} 时累计耗时最长的模块:")
+    for cumulative, name in rows[:top]:
+        print(f"  {cumulative / 1000:>8.1f} 毫秒  {name}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='命令行入口和模块导入耗时基准测试')
+    parser.add_argument('--repeat', type=int, default=5, help='每项测量的重复次数，取中位数')
+    parser.add_argument('--importtime', type=str, default='', choices=[''] + list(COMMANDS),
+                        help='列出导入指定子命令模块时最慢的依赖')
+    parser.add_argument('--top', type=int, default=15, help='--importtime 列出的模块数')
+    args = parser.parse_args(argv)
+
+    if args.importtime:
+        show_importtime(COMMANDS[args.importtime][0], args.top)
+        return
+
+    cases = [
+        ('python -c pass（解释器本身）', ['-c', 'pass']),
+        ('deepdigest.py --help', ['deepdigest.py', '--help']),
+        ('deepdigest.py status', ['deepdigest.py', 'status']),
+    ]
+    cases += [(f'import {module}', ['-c', f'import {module}']) for module, _ in COMMANDS.values()]
+
+    print(f"{'测量项':<50}{'中位数(毫秒)':>12}{'最小(毫秒)':>12}")
+    for label, command in cases:
+        timings, ok = run_seconds(command, args.repeat)
+        median = statistics.median(timings)
+        mark = '  超过目标' if label.startswith('deepdigest') and median >= TARGET_SECONDS else ''
+        if not ok:
+            mark += '  运行失败（缺少依赖？）'
+        print(f"{label:<50}{median * 1000:>12.0f}{min(timings) * 1000:>12.0f}{mark}")
+
+
+if __name__ == "__main__":
+    main()
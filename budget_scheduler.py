@@ -0,0 +1,148 @@
+import re
+import threading
+import time
+
+# 预算感知的优先级调度：API额度有限时，先分析最可能相关的论文。
+# 优先级由廉价信号组成：关键词命中、向量预筛选相似度、会议分组（Oral先于Spotlight）。
+# 预算可以限制令牌数、费用或运行时间，任何一项用尽后不再发出新请求，
+# 已在途的请求正常完成，未分析的论文记录下来，之后可以用--resume继续。
+# 每次HTTP请求（包括重试）发出前按最坏情况预留（补全按max_tokens计），响应后按API返回的usage结算，
+# 所以实际用量不会超过预算。
+
+# DeepSeek-chat的价格（美元/百万令牌，未命中缓存），可通过命令行覆盖
+PRICE_INPUT_PER_M = 0.27
+PRICE_OUTPUT_PER_M = 1.10
+PRICE_CACHED_INPUT_PER_M = 0.07  # 命中DeepSeek服务端上下文缓存的输入令牌
+
+GROUP_PRIORITY = {'oral': 2.0, 'spotlight': 1.0}  # 其他分组（如Poster）为0
+KEYWORD_WEIGHT = 1.0
+PREFILTER_WEIGHT = 4.0  # 余弦相似度通常在0~0.6之间，放大后与关键词命中数相当
+GROUP_TAG_PATTERN = re.compile(r'\[(oral|spotlight)[^\]]*\]', re.IGNORECASE)
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def paper_group(paper):
+    """论文所在的分组：优先使用group列，否则从原始标题中的[Oral]、[Spotlight]标记识别"""
+    group = paper.get('group')
+    if isinstance(group, str) and group:
+        return group.lower()
+    match = GROUP_TAG_PATTERN.search(str(paper.get('title') or ''))
+    return match.group(1).lower() if match else ''
+
+
+def keyword_score(paper, keywords):
+    """关键词命中分数：每个关键词按其单词在标题和摘要中出现的比例计分，标题中的命中加倍"""
+    title = set(WORD_PATTERN.findall(str(paper.get('clean_title') or paper.get('title') or '').lower()))
+    abstract = paper.get('abstract')
+    words = title | set(WORD_PATTERN.findall(abstract.lower() if isinstance(abstract, str) else ''))
+    score = 0.0
+    for keyword in keywords:
+        terms = WORD_PATTERN.findall(keyword.lower())
+        if not terms:
+            continue
+        score += sum(term in words for term in terms) / len(terms)
+        score += sum(term in title for term in terms) / len(terms)
+    return score
+
+
+def paper_priority(paper, keywords, prefilter_score=None):
+    """论文的优先级，越大越先分析"""
+    priority = KEYWORD_WEIGHT * keyword_score(paper, keywords)
+    priority += GROUP_PRIORITY.get(paper_group(paper), 0.0)
+    if prefilter_score is not None:
+        priority += PREFILTER_WEIGHT * prefilter_score
+    return priority
+
+
+def order_by_priority(papers, keywords, prefilter_scores=None):
+    """按优先级从高到低排序（优先级相同时保持原顺序），返回 (排序后的论文, 对应的优先级)"""
+    scores = prefilter_scores or [None] * len(papers)
+    priorities = [paper_priority(paper, keywords, score) for paper, score in zip(papers, scores)]
+    order = sorted(range(len(papers)), key=lambda i: -priorities[i])
+    return [papers[i] for i in order], [priorities[i] for i in order]
+
+
+class Budget:
+    """线程安全的硬预算：每次HTTP请求发出前预留，响应后按实际用量结算，超出任一限制即停止"""
+
+    def __init__(self, max_tokens=0, max_cost=0.0, max_seconds=0.0,
+                 price_input=PRICE_INPUT_PER_M, price_output=PRICE_OUTPUT_PER_M,
+                 price_cached=PRICE_CACHED_INPUT_PER_M):
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.max_seconds = max_seconds
+        self.price_input = price_input
+        self.price_output = price_output
+        self.price_cached = price_cached
+        self.tokens = 0
+        self.cost = 0.0
+        self.requests = 0
+        self.exhausted = None  # 预算用尽的原因
+        self.outstanding = 0  # 已预留、尚未结算的在途请求数
+        self._started = time.monotonic()
+        self._cond = threading.Condition()
+
+    @property
+    def enabled(self):
+        return bool(self.max_tokens or self.max_cost or self.max_seconds)
+
+    def request_cost(self, prompt_tokens, completion_tokens, cached_tokens=0):
+        return ((prompt_tokens - cached_tokens) * self.price_input + cached_tokens * self.price_cached
+                + completion_tokens * self.price_output) / 1_000_000
+
+    def reserve(self, prompt_tokens, completion_tokens):
+        """为一次HTTP请求预留预算，返回预留记录 (令牌数, 费用)，请求结束后必须交给settle或release
+
+        剩余预算不够但还有在途请求时，等待它们结算（实际用量通常小于预留）后再判断；
+        没有在途请求仍然不够时返回None，此后所有请求都会被拒绝。
+        """
+        cost = self.request_cost(prompt_tokens, completion_tokens)
+        with self._cond:
+            while self.exhausted is None:
+                over = None
+                if self.max_seconds and time.monotonic() - self._started >= self.max_seconds:
+                    self.exhausted = f"运行时间达到 {self.max_seconds / 60:.1f} 分钟"
+                    break
+                if self.max_tokens and self.tokens + prompt_tokens + completion_tokens > self.max_tokens:
+                    over = f"令牌预算 {self.max_tokens} 用尽"
+                elif self.max_cost and self.cost + cost > self.max_cost:
+                    over = f"费用预算 ${self.max_cost:.2f} 用尽"
+                if over is None:
+                    self.tokens += prompt_tokens + completion_tokens
+                    self.cost += cost
+                    self.requests += 1
+                    self.outstanding += 1
+                    return prompt_tokens + completion_tokens, cost
+                if not self.outstanding:
+                    self.exhausted = over
+                    break
+                self._cond.wait(1.0)
+            self._cond.notify_all()
+            return None
+
+    def settle(self, reservation, usage=None):
+        """请求结束后结算：有usage时用实际用量替换预留的估计值，没有时保留估计值（如超时，可能已经计费）"""
+        reserved_tokens, reserved_cost = reservation
+        tokens, cost = reserved_tokens, reserved_cost
+        if usage is not None:
+            prompt = usage.get('prompt_tokens') or 0
+            completion = usage.get('completion_tokens') or 0
+            tokens = prompt + completion
+            cost = self.request_cost(prompt, completion, usage.get('prompt_cache_hit_tokens') or 0)
+        with self._cond:
+            self.tokens += tokens - reserved_tokens
+            self.cost += cost - reserved_cost
+            self.outstanding -= 1
+            self._cond.notify_all()
+
+    def release(self, reservation):
+        """退还没有计费的请求（HTTP错误响应、熔断拒绝）的预留"""
+        self.settle(reservation, {})
+
+    def summary(self):
+        elapsed = time.monotonic() - self._started
+        text = (f"预算使用: {self.requests} 个请求, 约 {self.tokens} 个令牌, 约 ${self.cost:.4f}, "
+                f"用时 {elapsed / 60:.1f} 分钟")
+        if self.exhausted:
+            text += f"（{self.exhausted}，已停止发出新请求）"
+        return text
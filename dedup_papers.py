@@ -0,0 +1,88 @@
+import argparse
+import math
+import os
+import pandas as pd
+from step2_clean_papers import clean_title, normalize_titles
+from table_io import read_table, write_table
+
+# 在第2步（清洗）和第3/4步（DeepSeek分析、arXiv搜索）之间去除重复论文。
+# 同一篇论文可能同时出现在Oral和Spotlight页面，或因重复抓取出现多次，
+# 去重后每篇论文只调用一次DeepSeek、只查一次arXiv。
+
+ARXIV_SECONDS_PER_LOOKUP = 12.5  # html方式下每次arXiv查询的平均耗时（秒），用于估算节省的时间
+
+
+def title_keys(titles):
+    """归一化标题的64位哈希键，用于快速分组比较；同时返回空标题掩码，空标题不参与去重"""
+    normalized = normalize_titles(titles)
+    keys = pd.util.hash_pandas_object(normalized, index=False)
+    return keys, normalized == ''
+
+
+def dedup_papers(df, title_column='clean_title'):
+    """按归一化标题去重，保留摘要最完整的一条，返回 (去重后的DataFrame, 被去掉的DataFrame)
+
+    保留行按原顺序输出；被去掉的行附带kept_index列，指向保留下来的那一行。
+    """
+    if title_column not in df.columns:
+        df = df.assign(**{title_column: df['title'].map(clean_title)})
+    keys, empty = title_keys(df[title_column])
+    abstract_length = df['abstract'].fillna('').astype(str).str.len() if 'abstract' in df.columns else 0
+    ranked = pd.DataFrame({'key': keys.values, 'empty': empty.values, 'length': abstract_length}, index=df.index)
+    # 同一键内摘要最长的排在最前，长度相同时保留先出现的
+    ranked = ranked.sort_values('length', ascending=False, kind='stable')
+    kept_mask = ~ranked['key'].duplicated(keep='first') | ranked['empty']
+    kept_by_key = ranked.loc[kept_mask & ~ranked['empty']].reset_index().set_index('key')['index']
+    kept = df.loc[ranked.index[kept_mask]].sort_index()
+    removed_index = ranked.index[~kept_mask].sort_values()
+    removed = df.loc[removed_index].copy()
+    removed['kept_index'] = ranked.loc[removed_index, 'key'].map(kept_by_key).values
+    return kept, removed
+
+
+def report_savings(total, removed, batch_size=1, log=print):
+    """打印去重节省的下游调用次数"""
+    kept = total - removed
+    llm_before = math.ceil(total / batch_size)
+    llm_after = math.ceil(kept / batch_size)
+    log(f"去重前 {total} 篇，去重后 {kept} 篇，去掉 {removed} 篇重复论文")
+    log(f"第3步节省 {llm_before - llm_after} 次DeepSeek请求（每个请求 {batch_size} 篇）")
+    log(f"第4步节省 {removed} 次arXiv查询（html方式约 {removed * ARXIV_SECONDS_PER_LOOKUP / 60:.1f} 分钟）")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='按归一化标题去除重复论文')
+    parser.add_argument('--input_file', type=str, default='data/neurips_papers_1_cleaned.csv',
+                        help='第2步输出的清洗后文件（CSV、Parquet或Arrow）')
+    parser.add_argument('--output_file', type=str, default='data/deduped_papers.csv',
+                        help='去重后的文件，作为第3/4步的输入，格式由扩展名决定')
+    parser.add_argument('--title_column', type=str, default='clean_title',
+                        help='用于去重的标题列，不存在时由title列清洗得到')
+    parser.add_argument('--report_file', type=str, default='data/duplicates.csv',
+                        help='被去掉的重复论文记录，为空时不写出')
+    parser.add_argument('--batch_size', type=int, default=1,
+                        help='第3步每个请求打包的论文数，用于估算节省的请求数')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.input_file):
+        print(f"错误: 未找到文件 {args.input_file}")
+        return
+
+    df = read_table(args.input_file)
+    print(f"读取了 {len(df)} 篇论文")
+    if 'title' not in df.columns and args.title_column not in df.columns:
+        print("错误: 未找到标题列。现有列:", df.columns.tolist())
+        return
+
+    kept, removed = dedup_papers(df, args.title_column)
+    report_savings(len(df), len(removed), max(1, args.batch_size))
+
+    write_table(kept, args.output_file)
+    print(f"去重后的数据已保存到 {args.output_file}")
+    if args.report_file and len(removed):
+        write_table(removed, args.report_file)
+        print(f"重复论文记录已保存到 {args.report_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# DeepDigest统一命令行入口：
+#   python deepdigest.py fetch    [参数]   抓取会议论文（step1_fetch_papers.py）
+#   python deepdigest.py clean    [参数]   清洗标题（step2_clean_papers.py）
+#   python deepdigest.py dedup    [参数]   去除重复论文（dedup_papers.py）
+#   python deepdigest.py analyze  [参数]   DeepSeek分析（step3_analyze_papers_with_deepseek.py）
+#   python deepdigest.py arxiv    [参数]   查找arXiv链接（step4_search_arxiv.py）
+#   python deepdigest.py run      [参数]   增量运行完整流水线（orchestrator.py）
+#   python deepdigest.py search   [参数]   已分析论文的语义搜索（embedding_store.py）
+#   python deepdigest.py status           查看流水线状态和数据文件
+#
+# 本文件只导入标准库，各子命令的模块（以及pandas、BeautifulSoup、torch等依赖）在执行该子命令时才导入，
+# 因此 --help 和 status 可以很快返回。子命令的参数与对应脚本相同，用 deepdigest.py <子命令> --help 查看。
+
+import argparse
+import glob
+import importlib
+import json
+import os
+import sys
+import time
+
+# 子命令 -> (模块名, 说明)
+COMMANDS = {
+    'fetch': ('step1_fetch_papers', '从papers.cool抓取会议论文'),
+    'clean': ('step2_clean_papers', '清洗论文标题'),
+    'dedup': ('dedup_papers', '按归一化标题去除重复论文'),
+    'analyze': ('step3_analyze_papers_with_deepseek', '使用DeepSeek分析论文'),
+    'arxiv': ('step4_search_arxiv', '在arXiv上查找论文链接'),
+    'run': ('orchestrator', '增量运行完整流水线'),
+    'search': ('embedding_store', '已分析论文的向量库与语义搜索'),
+}
+DATA_DIR = 'data'
+
+
+def count_lines(path):
+    """统计文件行数（日志、失败记录等JSONL文件）"""
+    with open(path, 'rb') as f:
+        return sum(1 for _ in f)
+
+
+def show_status(argv):
+    """显示增量运行状态库的统计和data目录中的文件，只使用标准库"""
+    parser = argparse.ArgumentParser(prog='deepdigest status', description='查看流水线状态和数据文件')
+    parser.add_argument('--state_file', type=str, default=os.path.join(DATA_DIR, 'pipeline_state.sqlite'),
+                        help='orchestrator.py的状态库文件')
+    parser.add_argument('--data_dir', type=str, default=DATA_DIR, help='数据目录')
+    parser.add_argument('--json', action='store_true', help='以JSON格式输出，便于监控脚本读取')
+    args = parser.parse_args(argv)
+
+    status = {'stages': {}, 'files': []}
+    if os.path.exists(args.state_file):
+        from pipeline_state import StateStore
+        state = StateStore(args.state_file)
+        try:
+            status['stages'] = state.summary()
+        finally:
+            state.close()
+    for path in sorted(glob.glob(os.path.join(args.data_dir, '*'))):
+        if not os.path.isfile(path):
+            continue
+        entry = {'path': path, 'bytes': os.path.getsize(path),
+                 'modified': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(os.path.getmtime(path)))}
+        if path.endswith('.jsonl'):
+            entry['lines'] = count_lines(path)
+        status['files'].append(entry)
+
+    if args.json:
+        print(json.dumps(status, ensure_ascii=False, indent=2))
+        return
+
+    if status['stages']:
+        from pipeline_state import STAGES
+        print("流水线状态:")
+        for stage in STAGES:
+            counts = status['stages'].get(stage, {})
+            detail = ', '.join(f"{name} {count}" for name, count in sorted(counts.items())) or '无记录'
+            print(f"  {stage:<8} {detail}")
+    else:
+        print(f"状态库 {args.state_file} 不存在或为空，尚未运行过 deepdigest.py run")
+    if status['files']:
+        print(f"\n{args.data_dir} 中的文件:")
+        for entry in status['files']:
+            lines = f", {entry['lines']} 条记录" if 'lines' in entry else ''
+            print(f"  {entry['path']:<50} {entry['bytes'] / 1024:>10.1f} KB  {entry['modified']}{lines}")
+    else:
+        print(f"\n{args.data_dir} 中还没有数据文件")
+
+
+def build_parser():
+    epilog = '\n'.join(f"  {name:<9}{description}" for name, (_, description) in COMMANDS.items())
+    epilog += f"\n  {'status':<9}查看流水线状态和数据文件\n\n用 deepdigest.py <子命令> --help 查看各子命令的参数"
+    parser = argparse.ArgumentParser(prog='deepdigest', description='DeepDigest论文收集与分析工具',
+                                     epilog='子命令:\n' + epilog, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=list(COMMANDS) + ['status'], help='要执行的子命令')
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # 子命令的参数原样交给对应模块解析，这里只看第一个参数
+    if argv and argv[0] == 'status':
+        return show_status(argv[1:])
+    if argv and argv[0] in COMMANDS:
+        module_name = COMMANDS[argv[0]][0]
+        # 让子命令的帮助信息显示为 "deepdigest <子命令>"
+        sys.argv = [f"deepdigest {argv[0]}"] + argv[1:]
+        module = importlib.import_module(module_name)
+        return module.main(argv[1:])
+    build_parser().parse_args(argv)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def make_cache_key(model, system_prompt, user_text, temperature, max_tokens):
+    """根据请求的全部决定性参数计算内容寻址的缓存键"""
+    payload = json.dumps(
+        [model, system_prompt, user_text, temperature, max_tokens],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """基于SQLite的DeepSeek响应缓存，支持按大小和时间淘汰，并统计命中率"""
+
+    def __init__(self, path='data/deepseek_cache.sqlite', max_bytes=0, max_age_days=0):
+        # max_bytes/max_age_days 为0表示不限制
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        # 分析线程池会并发访问缓存，用一个连接加锁串行化
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            ' key TEXT PRIMARY KEY,'
+            ' response TEXT NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' created_at REAL NOT NULL,'
+            ' accessed_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)')
+        self._conn.commit()
+        self.evict()
+
+    def get(self, key):
+        """查询缓存，未命中或已过期时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT response, created_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            now = time.time()
+            if row is None or (self.max_age and now - row[1] > self.max_age):
+                self.misses += 1
+                return None
+            self._conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def contains(self, key):
+        """判断缓存中是否有未过期的条目，不计入命中统计"""
+        with self._lock:
+            row = self._conn.execute('SELECT created_at FROM responses WHERE key = ?', (key,)).fetchone()
+        return row is not None and not (self.max_age and time.time() - row[0] > self.max_age)
+
+    def set(self, key, response):
+        """写入一条响应，超出容量时淘汰最久未访问的条目"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, response, size, created_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, response, len(response.encode('utf-8')), now, now)
+            )
+            self._conn.commit()
+        if self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """删除过期条目，并按最近访问时间淘汰直到总大小不超过max_bytes"""
+        removed = 0
+        with self._lock:
+            if self.max_age:
+                cursor = self._conn.execute(
+                    'DELETE FROM responses WHERE created_at < ?', (time.time() - self.max_age,)
+                )
+                removed += cursor.rowcount
+            if self.max_bytes:
+                total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+                if total > self.max_bytes:
+                    stale_keys = []
+                    for key, size in self._conn.execute('SELECT key, size FROM responses ORDER BY accessed_at'):
+                        if total <= self.max_bytes:
+                            break
+                        stale_keys.append((key,))
+                        total -= size
+                    self._conn.executemany('DELETE FROM responses WHERE key = ?', stale_keys)
+                    removed += len(stale_keys)
+            self._conn.commit()
+        return removed
+
+    def stats(self):
+        """返回缓存条目数、总大小和命中统计"""
+        with self._lock:
+            count, total = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses'
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'entries': count,
+            'bytes': total,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,178 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import numpy as np
+
+# 本地CPU向量预筛选：在调用DeepSeek之前，用小型句向量模型对标题+摘要编码，
+# 计算与研究方向关键词的余弦相似度，只把最相关的论文交给analyze_paper。
+# 向量按 (模型, 文本) 缓存在SQLite中，每篇论文只编码一次。
+# 需要transformers和torch（requirements.txt中已包含），只在启用预筛选时才导入。
+
+DEFAULT_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+DEFAULT_CACHE_FILE = 'data/embedding_cache.sqlite'
+# 研究方向关键词，与step3提示中的方向保持一致，可通过--keywords覆盖
+DEFAULT_KEYWORDS = [
+    'audio pretraining',
+    'self-supervised audio representation learning',
+    'speech and audio foundation models',
+    'data selection for pretraining',
+    'data filtering and curation for training data',
+]
+BATCH_SIZE = 32
+MAX_LENGTH = 256  # 标题+摘要截断到的令牌数
+
+
+def paper_text(paper):
+    """用于编码的论文文本：标题和摘要"""
+    title = paper.get('clean_title') or paper.get('title') or ''
+    abstract = paper.get('abstract') or ''
+    if not isinstance(abstract, str):
+        abstract = ''
+    return f"{title}. {abstract}".strip()
+
+
+class TextEncoder:
+    """基于transformers的句向量编码器：平均池化后L2归一化，在CPU上按批推理"""
+
+    def __init__(self, model_name=DEFAULT_MODEL, batch_size=BATCH_SIZE, max_length=MAX_LENGTH, threads=0):
+        try:
+            import torch
+            from transformers import AutoModel, AutoTokenizer
+        except ImportError:
+            raise ImportError("向量预筛选需要安装transformers和torch: pip install transformers torch")
+        self.torch = torch
+        if threads:
+            torch.set_num_threads(threads)
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name).eval()
+
+    def encode(self, texts):
+        """把文本列表编码为 (n, dim) 的float32矩阵，每行已归一化"""
+        torch = self.torch
+        vectors = []
+        with torch.inference_mode():
+            for start in range(0, len(texts), self.batch_size):
+                batch = texts[start:start + self.batch_size]
+                inputs = self.tokenizer(batch, padding=True, truncation=True,
+                                        max_length=self.max_length, return_tensors='pt')
+                hidden = self.model(**inputs).last_hidden_state
+                mask = inputs['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+                pooled = torch.nn.functional.normalize(pooled, p=2, dim=1)
+                vectors.append(pooled.cpu().numpy().astype(np.float32))
+        if not vectors:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.concatenate(vectors)
+
+
+class EmbeddingCache:
+    """按 (模型, 文本) 缓存向量的SQLite库"""
+
+    def __init__(self, path=DEFAULT_CACHE_FILE):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS embeddings ('
+            ' key TEXT PRIMARY KEY,'
+            ' vector BLOB NOT NULL)'
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model_name, text):
+        return hashlib.sha256(f"{model_name}\n{text}".encode('utf-8')).hexdigest()
+
+    def get_many(self, keys):
+        """批量查询，返回 {键: 向量}，只包含命中的键"""
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def set_many(self, items):
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)',
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items]
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def embed_texts(texts, encoder, cache=None, log=print):
+    """编码文本列表，已缓存的直接读取，只对未缓存的文本推理"""
+    keys = [EmbeddingCache.make_key(encoder.model_name, text) for text in texts]
+    found = cache.get_many(keys) if cache is not None else {}
+    missing = [i for i, key in enumerate(keys) if key not in found]
+    if missing:
+        log(f"编码 {len(missing)} 篇论文（{len(texts) - len(missing)} 篇使用缓存）...")
+        vectors = encoder.encode([texts[i] for i in missing])
+        new_items = [(keys[i], vector) for i, vector in zip(missing, vectors)]
+        if cache is not None:
+            cache.set_many(new_items)
+        found.update(new_items)
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.stack([found[key] for key in keys]).astype(np.float32)
+
+
+def score_papers(papers, keywords, encoder, cache=None, log=print):
+    """每篇论文与各关键词余弦相似度的最大值"""
+    paper_vectors = embed_texts([paper_text(paper) for paper in papers], encoder, cache, log)
+    keyword_vectors = encoder.encode(list(keywords))
+    if not len(paper_vectors):
+        return np.zeros(0, dtype=np.float32)
+    # 向量已归一化，点积就是余弦相似度
+    return (paper_vectors @ keyword_vectors.T).max(axis=1)
+
+
+def select_papers(scores, top_k=0, threshold=None):
+    """返回保留的论文下标（按原顺序）
+
+    只给threshold时保留相似度不低于阈值的论文，只给top_k时保留相似度最高的top_k篇，
+    两者都给时先按阈值筛选，再最多保留top_k篇。
+    """
+    candidates = np.arange(len(scores))
+    if threshold is not None:
+        candidates = candidates[scores >= threshold]
+    if top_k and len(candidates) > top_k:
+        order = np.argsort(-scores[candidates], kind='stable')[:top_k]
+        candidates = candidates[order]
+    return np.sort(candidates)
+
+
+def prefilter_papers(papers, keywords=DEFAULT_KEYWORDS, top_k=0, threshold=None, model_name=DEFAULT_MODEL,
+                     cache_file=DEFAULT_CACHE_FILE, log=print):
+    """预筛选论文，返回 (保留的论文列表, 被排除的 [(论文, 相似度)], 保留论文的相似度列表)"""
+    encoder = TextEncoder(model_name)
+    cache = EmbeddingCache(cache_file) if cache_file else None
+    try:
+        scores = score_papers(papers, keywords, encoder, cache, log)
+    finally:
+        if cache is not None:
+            cache.close()
+    keep = set(select_papers(scores, top_k, threshold).tolist())
+    kept = [paper for i, paper in enumerate(papers) if i in keep]
+    skipped = [(paper, float(scores[i])) for i, paper in enumerate(papers) if i not in keep]
+    kept_scores = [float(scores[i]) for i in range(len(papers)) if i in keep]
+    if len(scores):
+        log(f"预筛选: {len(papers)} 篇论文中保留 {len(kept)} 篇，节省 {len(skipped)} 次DeepSeek调用"
+            f"（相似度中位数 {float(np.median(scores)):.3f}，最高 {float(scores.max()):.3f}）")
+    return kept, skipped, kept_scores
@@ -0,0 +1,223 @@
+# 已分析论文的向量库与语义搜索
+#
+# 目录结构（默认data/embedding_store/）：
+#   vectors.npy   - (论文数, 维度) 的float16矩阵，以内存映射方式读取
+#   records.jsonl - ID表，每行一篇论文：id、标题、概述、相关性、arXiv链接、来源文件
+#   offsets.npy   - records.jsonl中每行的字节偏移，查询时只读取命中的几行
+#   manifest.json - 模型名、维度、论文数
+#
+# 用法：
+#   python embedding_store.py build --inputs "data/*_analyzed.csv"
+#   python embedding_store.py query "self-supervised audio pretraining" --top_k 10
+#   python embedding_store.py similar "BEATs: Audio Pre-Training with Acoustic Tokenizers"
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+import numpy as np
+
+from step2_clean_papers import normalize_title
+from embedding_prefilter import DEFAULT_MODEL, DEFAULT_CACHE_FILE, EmbeddingCache, TextEncoder, embed_texts, paper_text
+from table_io import read_table
+
+DEFAULT_STORE_DIR = 'data/embedding_store'
+RECORD_FIELDS = ['clean_title', 'title', 'overview', 'relevance', 'arxiv_link']
+SEARCH_BLOCK = 16384  # 每次转换为float32参与矩阵乘法的行数，限制临时内存
+
+
+def paper_id(title):
+    """论文ID：归一化标题的哈希，不同会议中的同一篇论文ID相同"""
+    return hashlib.sha1(normalize_title(title).encode('utf-8')).hexdigest()[:16]
+
+
+class EmbeddingStore:
+    """只读打开向量库：向量矩阵内存映射，ID表按需读取"""
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, 'manifest.json'), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self.vectors = np.load(os.path.join(store_dir, 'vectors.npy'), mmap_mode='r')
+        self.offsets = np.load(os.path.join(store_dir, 'offsets.npy'), mmap_mode='r')
+        self._records = open(os.path.join(store_dir, 'records.jsonl'), 'rb')
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def record(self, row):
+        """读取第row篇论文的记录"""
+        self._records.seek(int(self.offsets[row]))
+        return json.loads(self._records.readline())
+
+    def find(self, title):
+        """按标题查找论文所在的行，找不到时返回None"""
+        target = paper_id(title)
+        # ID表不常驻内存，顺序扫描一遍（只在similar命令中使用）
+        self._records.seek(0)
+        for row, line in enumerate(self._records):
+            if json.loads(line)['id'] == target:
+                return row
+        return None
+
+    def search(self, queries, top_k=10, exclude=None):
+        """批量top-k搜索：queries为 (q, dim) 的已归一化向量，返回每个查询的 [(行号, 相似度)]"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        k = min(top_k, len(self.vectors))
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        # 分块计算，内存映射的float16块转换为float32后与查询矩阵相乘
+        for start in range(0, len(self.vectors), SEARCH_BLOCK):
+            block = np.asarray(self.vectors[start:start + SEARCH_BLOCK], dtype=np.float32)
+            scores = queries @ block.T
+            if exclude is not None and start <= exclude < start + len(block):
+                scores[:, exclude - start] = -np.inf
+            kk = min(k, scores.shape[1])
+            part = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, part, axis=1)], axis=1)
+            best_rows = np.concatenate([best_rows, part + start], axis=1)
+            # 只保留目前为止的前k个
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        results = []
+        for scores, rows in zip(best_scores, best_rows):
+            order = np.argsort(-scores)
+            results.append([(int(rows[i]), float(scores[i])) for i in order if np.isfinite(scores[i])])
+        return results
+
+    def close(self):
+        self._records.close()
+
+
+def iter_analyzed_papers(inputs):
+    """读取所有已分析论文，按论文ID去重，后出现的文件覆盖先出现的"""
+    papers = {}
+    for pattern in inputs:
+        for path in sorted(glob.glob(pattern)):
+            df = read_table(path, columns=RECORD_FIELDS + ['authors', 'abstract'])
+            for row in df.to_dict('records'):
+                title = row.get('clean_title') if isinstance(row.get('clean_title'), str) else row.get('title')
+                if not isinstance(title, str) or not normalize_title(title):
+                    continue
+                row = {key: (value if isinstance(value, str) else '') for key, value in row.items()}
+                row['source'] = os.path.basename(path)
+                papers[paper_id(title)] = row
+            print(f"读取 {path}: {len(df)} 篇论文")
+    return papers
+
+
+def build_store(inputs, store_dir=DEFAULT_STORE_DIR, model_name=DEFAULT_MODEL, cache_file=DEFAULT_CACHE_FILE):
+    """从已分析论文文件构建向量库；向量来自预筛选共用的缓存，只编码新论文"""
+    papers = iter_analyzed_papers(inputs)
+    if not papers:
+        print("没有找到已分析的论文")
+        return 0
+    ids = list(papers)
+    encoder = TextEncoder(model_name)
+    cache = EmbeddingCache(cache_file) if cache_file else None
+    try:
+        vectors = embed_texts([paper_text(papers[pid]) for pid in ids], encoder, cache)
+    finally:
+        if cache is not None:
+            cache.close()
+
+    os.makedirs(store_dir, exist_ok=True)
+    # 先写临时文件再替换，查询进程不会读到写了一半的库
+    tmp_vectors = os.path.join(store_dir, 'vectors.tmp.npy')
+    matrix = np.lib.format.open_memmap(tmp_vectors, mode='w+', dtype=np.float16, shape=vectors.shape)
+    matrix[:] = vectors.astype(np.float16)
+    matrix.flush()
+    del matrix
+
+    offsets = np.zeros(len(ids), dtype=np.int64)
+    tmp_records = os.path.join(store_dir, 'records.tmp.jsonl')
+    with open(tmp_records, 'wb') as f:
+        for row, pid in enumerate(ids):
+            offsets[row] = f.tell()
+            record = {'id': pid}
+            record.update({key: papers[pid].get(key, '') for key in RECORD_FIELDS + ['source']})
+            f.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+    tmp_offsets = os.path.join(store_dir, 'offsets.tmp.npy')
+    np.save(tmp_offsets, offsets)
+
+    os.replace(tmp_vectors, os.path.join(store_dir, 'vectors.npy'))
+    os.replace(tmp_records, os.path.join(store_dir, 'records.jsonl'))
+    os.replace(tmp_offsets, os.path.join(store_dir, 'offsets.npy'))
+    with open(os.path.join(store_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump({'model': model_name, 'dim': int(vectors.shape[1]), 'count': len(ids),
+                   'built_at': time.strftime('%Y-%m-%d %H:%M:%S')}, f, ensure_ascii=False)
+    print(f"向量库已保存到 {store_dir}: {len(ids)} 篇论文, 维度 {vectors.shape[1]}")
+    return len(ids)
+
+
+def print_results(store, results):
+    for rank, (row, score) in enumerate(results, 1):
+        record = store.record(row)
+        print(f"{rank:>3}. [{score:.3f}] {record['clean_title'] or record['title']}")
+        if record.get('relevance'):
+            print(f"      相关性: {record['relevance'][:100]}")
+        if record.get('arxiv_link'):
+            print(f"      {record['arxiv_link']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='已分析论文的向量库与语义搜索')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help='从已分析的论文文件构建向量库')
+    build.add_argument('--inputs', type=str, nargs='+', default=['data/*_analyzed.*'],
+                       help='第3步输出的文件（可以是glob，支持CSV、Parquet、Arrow）')
+    build.add_argument('--model', type=str, default=DEFAULT_MODEL, help='句向量模型')
+    build.add_argument('--cache_file', type=str, default=DEFAULT_CACHE_FILE, help='向量缓存文件，与预筛选共用')
+
+    query = subparsers.add_parser('query', help='按文本语义搜索论文')
+    query.add_argument('text', type=str, nargs='+', help='查询文本，多个查询一起批量计算')
+    query.add_argument('--top_k', type=int, default=10, help='每个查询返回的论文数')
+
+    similar = subparsers.add_parser('similar', help='查找与库中某篇论文相似的论文')
+    similar.add_argument('title', type=str, help='论文标题')
+    similar.add_argument('--top_k', type=int, default=10, help='返回的论文数')
+
+    for sub in (build, query, similar):
+        sub.add_argument('--store_dir', type=str, default=DEFAULT_STORE_DIR, help='向量库目录')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        build_store(args.inputs, args.store_dir, args.model, args.cache_file)
+        return
+
+    if not os.path.exists(os.path.join(args.store_dir, 'manifest.json')):
+        print(f"错误: 向量库 {args.store_dir} 不存在，请先运行 python embedding_store.py build")
+        return
+    store = EmbeddingStore(args.store_dir)
+    try:
+        if args.command == 'query':
+            encoder = TextEncoder(store.manifest['model'])
+            queries = encoder.encode(args.text)
+            start = time.perf_counter()
+            results = store.search(queries, args.top_k)
+            elapsed = time.perf_counter() - start
+            for text, result in zip(args.text, results):
+                print(f"\n查询: {text}")
+                print_results(store, result)
+        else:
+            row = store.find(args.title)
+            if row is None:
+                print(f"向量库中没有找到论文: {args.title}")
+                return
+            start = time.perf_counter()
+            results = store.search(np.asarray(store.vectors[row], dtype=np.float32), args.top_k, exclude=row)
+            elapsed = time.perf_counter() - start
+            print(f"\n与 {store.record(row)['clean_title']} 相似的论文:")
+            print_results(store, results[0])
+        print(f"\n在 {len(store)} 篇论文中搜索用时 {elapsed * 1000:.1f} 毫秒")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
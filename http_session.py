@@ -0,0 +1,67 @@
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_TIMEOUT = (10, 60)  # (连接超时, 读取超时) 秒
+DEFAULT_POOL_SIZE = 20
+DEFAULT_PER_HOST = 4
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+
+def make_session(pool_size=DEFAULT_POOL_SIZE, max_retries=2):
+    """创建带连接池和keep-alive的会话，多个线程可以共用"""
+    session = requests.Session()
+    # 只对连接错误和网关类错误做少量重试，其余交给调用方处理
+    retry = Retry(total=max_retries, connect=max_retries, read=max_retries, backoff_factor=1,
+                  status_forcelist=(502, 503, 504), allowed_methods=frozenset(['GET', 'HEAD']))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['User-Agent'] = USER_AGENT
+    return session
+
+
+class HostLimiter:
+    """限制对同一主机的并发请求数，不同主机之间互不影响"""
+
+    def __init__(self, per_host=DEFAULT_PER_HOST):
+        self.per_host = per_host
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.per_host)
+            return self._semaphores[host]
+
+    @contextmanager
+    def slot(self, url):
+        """占用url所在主机的一个并发名额"""
+        semaphore = self._semaphore(url)
+        with semaphore:
+            yield
+
+
+def _get_text(session, url, timeout, cache, max_age):
+    if cache is not None:
+        return cache.get(session, url, timeout=timeout, max_age=max_age)
+    response = session.get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.text
+
+
+def fetch_text(session, url, limiter=None, timeout=DEFAULT_TIMEOUT, cache=None, max_age=0):
+    """通过共享会话获取页面文本，超出主机并发上限时排队等待
+
+    提供cache（page_cache.PageCache）时先用条件请求验证存档，未变化则直接使用存档内容。
+    """
+    if limiter is None:
+        return _get_text(session, url, timeout, cache, max_age)
+    with limiter.slot(url):
+        return _get_text(session, url, timeout, cache, max_age)
@@ -1,17 +1,28 @@
-import requests
 from bs4 import BeautifulSoup
 import pandas as pd
-import re
 import time
 import csv
 from urllib.parse import quote
 from tqdm import tqdm
 from concurrent.futures import ThreadPoolExecutor
+from papers_cool_parser import parse_papers_html
+from http_session import make_session
+from page_cache import PageCache, DEFAULT_CACHE_DIR
 
 # 配置
 MAX_WORKERS = 5  # 线程池大小
 CSV_FILE = "neurips_papers.csv"
 SKIP_TRANSLATION = True  # 设置为True跳过翻译
+USE_PAGE_CACHE = True  # 缓存抓取的页面，再次运行时用条件请求验证
+ARXIV_CACHE_MAX_AGE = 7 * 24 * 3600  # arXiv搜索结果页在此时间内直接使用缓存（秒）
+
+def get_page(session, url, cache=None, max_age=0):
+    """获取页面文本，提供cache时先验证存档"""
+    if cache is not None:
+        return cache.get(session, url, timeout=(10, 60), max_age=max_age)
+    response = session.get(url, timeout=(10, 60))
+    response.raise_for_status()
+    return response.text
 
 def translate_text(text):
     """占位翻译函数，当SKIP_TRANSLATION为True时直接返回空字符串"""
@@ -21,62 +32,11 @@ def translate_text(text):
         # 如果将来需要实现翻译，可以在这里添加实际的翻译逻辑
         return "翻译功能已禁用"
 
-def fetch_papers_info(url):
+def fetch_papers_info(url, session=None, cache=None):
     """抓取论文标题和摘要"""
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        papers_data = []
-        # 查找论文块 - 根据页面结构调整选择器
-        paper_blocks = soup.select('div[class^="#"]')
-        
-        if not paper_blocks:
-            # 备选方案: 尝试找到所有论文条目
-            paper_blocks = soup.find_all('div', {'class': lambda x: x and (x.startswith('paper-') or 'paper' in x)})
-        
-        if not paper_blocks:
-            # 再次尝试通过结构推断
-            headers = soup.find_all(['h2', 'h3'], {'id': lambda x: x and ('paper-' in x or '#' in x)})
-            for header in headers:
-                paper_info = {}
-                paper_info['title'] = header.text.strip()
-                authors_section = header.find_next('p')
-                if authors_section and 'Authors' in authors_section.text:
-                    paper_info['authors'] = authors_section.text.replace('Authors:', '').strip()
-                abstract_section = authors_section.find_next('p') if authors_section else None
-                if abstract_section:
-                    paper_info['abstract'] = abstract_section.text.strip()
-                papers_data.append(paper_info)
-        
-        # 如果上述方法都失败，尝试直接解析页面结构
-        if not papers_data:
-            # 尝试识别页面中的论文条目
-            paper_entries = []
-            for element in soup.find_all(['h1', 'h2', 'h3']):
-                text = element.text.strip()
-                if re.search(r'#\d+', text) or 'paper' in text.lower():
-                    paper_entries.append(element)
-            
-            for entry in paper_entries:
-                paper_info = {}
-                title_text = entry.text.strip()
-                # 处理标题中可能的编号和特殊字符
-                paper_info['title'] = re.sub(r'^#\d+\s+', '', title_text)
-                
-                # 查找作者和摘要信息
-                next_elem = entry.find_next_sibling()
-                while next_elem and next_elem.name not in ['h1', 'h2', 'h3']:
-                    if 'Authors' in next_elem.text or 'authors' in next_elem.text.lower():
-                        paper_info['authors'] = next_elem.text.replace('Authors:', '').strip()
-                    elif 'abstract' not in paper_info and len(next_elem.text) > 100:
-                        # 假设较长的文本块是摘要
-                        paper_info['abstract'] = next_elem.text.strip()
-                    next_elem = next_elem.find_next_sibling()
-                
-                if 'title' in paper_info:
-                    papers_data.append(paper_info)
+        # 单遍解析页面，提取标题、作者和摘要
+        papers_data = parse_papers_html(get_page(session or make_session(), url, cache=cache))
         
         return papers_data
     
@@ -84,14 +44,13 @@ def fetch_papers_info(url):
         print(f"抓取页面时出错: {e}")
         return []
 
-def search_arxiv(title):
+def search_arxiv(title, session, cache=None):
     """在arXiv上搜索论文并返回链接"""
     try:
         search_url = f"https://arxiv.org/search/?query={quote(title)}&searchtype=title"
-        response = requests.get(search_url)
-        response.raise_for_status()
+        html = get_page(session, search_url, cache=cache, max_age=ARXIV_CACHE_MAX_AGE)
         
-        soup = BeautifulSoup(response.text, 'html.parser')
+        soup = BeautifulSoup(html, 'html.parser')
         results = soup.select('.list-title > a')
         
         if results:
@@ -106,7 +65,7 @@ def search_arxiv(title):
         print(f"在arXiv搜索时出错: {e}")
         return "搜索arXiv时出错"
 
-def process_paper(paper):
+def process_paper(paper, session, cache=None):
     """处理单个论文的所有步骤"""
     try:
         # 确保paper字典包含必要的键
@@ -118,7 +77,7 @@ def process_paper(paper):
             paper['authors'] = ""
             
         # 获取arXiv链接
-        arxiv_link = search_arxiv(paper['title'])
+        arxiv_link = search_arxiv(paper['title'], session, cache)
         paper['arxiv_link'] = arxiv_link
         
         # 添加空的翻译字段，稍后可以手动添加翻译
@@ -148,12 +107,15 @@ def main():
     ]
     
     all_papers = []
+    # 所有请求共用一个会话（连接池大小与线程数一致）和页面缓存
+    session = make_session(pool_size=MAX_WORKERS)
+    page_cache = PageCache(DEFAULT_CACHE_DIR) if USE_PAGE_CACHE else None
     
     # 抓取所有页面
     for url in urls:
         print(f"正在抓取 {url}")
         try:
-            papers = fetch_papers_info(url)
+            papers = fetch_papers_info(url, session=session, cache=page_cache)
             all_papers.extend(papers)
             print(f"从 {url} 抓取了 {len(papers)} 篇论文")
         except Exception as e:
@@ -169,11 +131,9 @@ def main():
     if len(all_papers) < 10:
         print("尝试使用备选抓取方法...")
         try:
-            from alternate_scraper import fetch_papers_with_selenium
-            selenium_papers = []
-            for url in urls:
-                papers = fetch_papers_with_selenium(url)
-                selenium_papers.extend(papers)
+            from alternate_scraper import fetch_all_with_selenium
+            # 所有页面共用一个浏览器，在多个标签页中并行加载
+            selenium_papers = [paper for papers in fetch_all_with_selenium(urls) for paper in papers]
             
             if len(selenium_papers) > len(all_papers):
                 all_papers = selenium_papers
@@ -181,19 +141,22 @@ def main():
         except Exception as e:
             print(f"备选抓取方法失败: {e}")
     
-    # 处理所有论文，带错误处理
-    processed_papers = []
-    for paper in tqdm(all_papers, desc="处理论文"):
+    # 用线程池并发处理所有论文（主要耗时在arXiv搜索的网络请求上），结果保持原顺序
+    def safe_process_paper(paper):
         try:
-            processed_paper = process_paper(paper)
-            processed_papers.append(processed_paper)
+            return process_paper(paper, session, page_cache)
         except Exception as e:
             print(f"处理论文 {paper.get('title', '未知标题')} 时出错: {e}")
             # 添加原始论文但标记为错误
             paper['arxiv_link'] = "处理出错"
             paper['title_zh'] = ""
             paper['abstract_zh'] = ""
-            processed_papers.append(paper)
+            return paper
+    
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        processed_papers = list(tqdm(executor.map(safe_process_paper, all_papers),
+                                     total=len(all_papers), desc="处理论文"))
+    session.close()
     
     # 保存到CSV
     try:
@@ -0,0 +1,92 @@
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+# 按批次记录内存使用：常驻内存（RSS）、Python分配器的对象内存（tracemalloc，可选）和各代垃圾回收计数。
+# 设置了内存上限时，超限后先做一次完整的垃圾回收并记录实际释放了多少内存，回收后仍超限则由调用方停止处理。
+# 用测量结果决定是否需要强制回收，而不是每处理一篇论文都调用gc.collect()。
+
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存（MB），不支持的平台返回None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux上单位为KB，macOS上为字节
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def current_rss_mb():
+    """当前进程的常驻内存（MB），没有/proc的平台返回None（峰值常驻内存只增不减，不能代替当前值）"""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class MemoryMonitor:
+    """每批处理结束时调用sample()，ceiling_mb为0时只记录不限制；trace为True时启用tracemalloc（有额外开销）"""
+
+    def __init__(self, ceiling_mb=0, trace=False, log=print):
+        self.ceiling_mb = ceiling_mb
+        self.trace = trace
+        self.log = log
+        self.samples = []
+        self.collections = 0  # 因超过上限触发的完整回收次数
+        self.freed_mb = 0.0
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if ceiling_mb and current_rss_mb() is None:
+            # 用峰值判断会在第一次超限后永远超限，调用方就再也不会继续处理
+            log(f"无法读取当前常驻内存（没有/proc），已停用 {ceiling_mb} MB 的内存上限检查，只记录峰值常驻内存")
+            self.ceiling_mb = 0
+
+    def sample(self, label):
+        """记录一次内存状态并写日志，返回回收后是否仍超过内存上限"""
+        rss = current_rss_mb()
+        record = {'label': label, 'rss_mb': rss, 'gc_counts': gc.get_count()}
+        message = f"内存 [{label}]: 常驻 {rss:.1f} MB" if rss is not None else f"内存 [{label}]: 常驻内存未知"
+        if self.trace:
+            traced, traced_peak = tracemalloc.get_traced_memory()
+            record.update(traced_mb=traced / 1024 / 1024, traced_peak_mb=traced_peak / 1024 / 1024)
+            # 每批单独统计分配峰值
+            tracemalloc.reset_peak()
+            message += f", Python分配 {record['traced_mb']:.1f} MB（本批峰值 {record['traced_peak_mb']:.1f} MB）"
+        message += f", 各代回收计数 {record['gc_counts']}"
+
+        over = bool(self.ceiling_mb) and rss is not None and rss > self.ceiling_mb
+        if over:
+            start = time.perf_counter()
+            collected = gc.collect()
+            after = current_rss_mb()
+            self.collections += 1
+            self.freed_mb += rss - after
+            record.update(gc_collected=collected, rss_after_gc_mb=after, gc_seconds=time.perf_counter() - start)
+            message += (f"；超过上限 {self.ceiling_mb} MB，完整回收 {collected} 个对象，"
+                        f"用时 {record['gc_seconds'] * 1000:.0f} 毫秒，常驻内存降至 {after:.1f} MB")
+            over = after > self.ceiling_mb
+        self.samples.append(record)
+        self.log(message)
+        return over
+
+    def summary(self):
+        """各批次内存统计的摘要"""
+        rss_values = [record['rss_mb'] for record in self.samples if record['rss_mb'] is not None]
+        lines = [f"内存统计: 共记录 {len(self.samples)} 批"]
+        if rss_values:
+            lines.append(f"  常驻内存: 首批 {rss_values[0]:.1f} MB, 最高 {max(rss_values):.1f} MB, 最后 {rss_values[-1]:.1f} MB")
+        peak = peak_rss_mb()
+        if peak is not None:
+            lines.append(f"  进程峰值常驻内存: {peak:.1f} MB")
+        if self.trace and self.samples:
+            lines.append(f"  Python分配: 最高 {max(record['traced_mb'] for record in self.samples):.1f} MB, "
+                         f"单批峰值最高 {max(record['traced_peak_mb'] for record in self.samples):.1f} MB")
+        if self.ceiling_mb:
+            lines.append(f"  超过上限 {self.ceiling_mb} MB 触发完整回收 {self.collections} 次，共释放 {self.freed_mb:.1f} MB")
+        return '\n'.join(lines)
@@ -0,0 +1,141 @@
+# 本地arXiv导出API替身服务器，用录制好的Atom结果回答查询，便于离线测试批量查找
+#
+# 录制：python mock_arxiv_server.py record --titles "Title A" "Title B" --out fixtures/arxiv/feed_1.xml
+# 启动：python mock_arxiv_server.py serve --feeds_dir fixtures/arxiv --port 8765
+# 使用：python step4_search_arxiv.py --backend api --arxiv_api_url http://127.0.0.1:8765/api/query
+#
+# 仓库中没有提交录制的Atom文件，启动前需要先录制（需要联网），否则所有查询都返回空结果。
+
+import argparse
+import glob
+import os
+import re
+import threading
+import requests
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from xml.sax.saxutils import escape
+
+from arxiv_api import ARXIV_API_URL, ATOM_NS, build_title_query
+from step2_clean_papers import normalize_title
+
+
+def load_entries(feeds_dir):
+    """读取目录下所有录制的Atom文件，返回 [(条目id, 标题, 条目XML文本)]"""
+    ET.register_namespace('', ATOM_NS.strip('{}'))
+    entries = []
+    seen = set()
+    for path in sorted(glob.glob(os.path.join(feeds_dir, '*.xml'))):
+        for entry in ET.parse(path).getroot().iter(ATOM_NS + 'entry'):
+            entry_id = entry.findtext(ATOM_NS + 'id') or ''
+            if entry_id in seen:
+                continue
+            seen.add(entry_id)
+            title = re.sub(r'\s+', ' ', entry.findtext(ATOM_NS + 'title') or '').strip()
+            entries.append((entry_id, title, ET.tostring(entry, encoding='unicode')))
+    return entries
+
+
+def render_feed(entries, total, start, page_size):
+    """生成与arXiv导出API格式一致的Atom文档"""
+    body = ''.join(xml for _, _, xml in entries)
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<feed xmlns="http://www.w3.org/2005/Atom" '
+        'xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">'
+        f'<title>{escape("ArXiv Query (mock)")}</title>'
+        f'<opensearch:totalResults>{total}</opensearch:totalResults>'
+        f'<opensearch:startIndex>{start}</opensearch:startIndex>'
+        f'<opensearch:itemsPerPage>{page_size}</opensearch:itemsPerPage>'
+        f'{body}</feed>'
+    )
+
+
+def make_handler(entries):
+    """创建请求处理类：按 ti:"..." 短语匹配标题，支持start/max_results分页"""
+    by_norm = {}
+    for entry in entries:
+        by_norm.setdefault(normalize_title(entry[1]), []).append(entry)
+
+    class MockArxivHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            query = params.get('search_query', [''])[0]
+            start = int(params.get('start', ['0'])[0])
+            page_size = int(params.get('max_results', ['10'])[0])
+
+            matched = []
+            for phrase in re.findall(r'ti:"([^"]*)"', query):
+                matched.extend(by_norm.get(normalize_title(phrase), []))
+            page = matched[start:start + page_size]
+
+            data = render_feed(page, len(matched), start, page_size).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/atom+xml; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MockArxivHandler
+
+
+def start_server(feeds_dir, host='127.0.0.1', port=0):
+    """在后台线程启动替身服务器，返回 (server, API地址)；port为0时自动选择空闲端口"""
+    server = ThreadingHTTPServer((host, port), make_handler(load_entries(feeds_dir)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/api/query"
+
+
+def record_feed(titles, out_file, api_url=ARXIV_API_URL, max_results=100):
+    """向真实的arXiv导出API发送一次批量标题查询，保存原始Atom结果"""
+    response = requests.get(
+        api_url,
+        params={'search_query': build_title_query(titles), 'start': 0, 'max_results': max_results},
+        timeout=60
+    )
+    response.raise_for_status()
+    os.makedirs(os.path.dirname(out_file) or '.', exist_ok=True)
+    with open(out_file, 'wb') as f:
+        f.write(response.content)
+    print(f"已录制 {len(titles)} 个标题的查询结果到 {out_file}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地arXiv导出API替身服务器')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help='用录制的Atom结果提供查询服务')
+    serve_parser.add_argument('--feeds_dir', type=str, default='fixtures/arxiv', help='录制的Atom文件目录')
+    serve_parser.add_argument('--host', type=str, default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8765)
+
+    record_parser = subparsers.add_parser('record', help='从真实的arXiv API录制查询结果')
+    record_parser.add_argument('--titles', nargs='+', required=True, help='要查询的论文标题')
+    record_parser.add_argument('--out', type=str, required=True, help='保存的Atom文件路径')
+
+    args = parser.parse_args()
+    if args.command == 'record':
+        record_feed(args.titles, args.out)
+        return
+
+    entries = load_entries(args.feeds_dir)
+    if not entries:
+        print(f"注意: {args.feeds_dir} 下没有录制的Atom文件，所有查询都将返回空结果，请先使用 record 命令录制")
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(entries))
+    print(f"arXiv替身服务器已启动: http://{args.host}:{args.port}/api/query（{len(entries)} 条录制记录）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# 本地DeepSeek chat-completions替身服务器，可配置延迟、错误率和429限流，便于离线测试和基准测试第3步
+#
+# 启动：python mock_deepseek_server.py --port 8766 --latency 0.8 --jitter 0.4 --error_rate 0.02 --rate_limit_rate 0.05
+# 使用：在第3步中把API_URL指向 http://127.0.0.1:8766/v1/chat/completions（bench_pipeline.py会自动完成）
+#
+# 单篇请求返回"概述：...\n相关性：..."格式的文本，批量请求（系统提示要求JSON数组）按输入中的[论文 N]编号返回JSON数组，
+# usage中的令牌数按字符数估计。
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHARS_PER_TOKEN = 4  # 与第3步estimate_tokens相同的粗略估计
+RELEVANCE_LEVELS = ('高', '中', '低')
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def paper_titles(user_text):
+    """从输入文本中取出论文标题，批量请求返回 [(编号, 标题)]，单篇请求返回 [(0, 标题)]"""
+    titles = re.findall(r'^论文标题: (.*)$', user_text, flags=re.M)
+    return list(enumerate(titles)) or [(0, '')]
+
+
+def completion_text(system_prompt, user_text):
+    """按请求类型生成确定性的回复：同一篇论文总是得到相同的相关性"""
+    papers = paper_titles(user_text)
+    levels = [RELEVANCE_LEVELS[sum(map(ord, title)) % len(RELEVANCE_LEVELS)] for _, title in papers]
+    if 'JSON数组' in system_prompt:
+        return json.dumps([
+            {'index': idx, 'overview': f'论文{title[:40]}提出了一种新方法。', 'relevance': f'{level}，模拟的相关性分析。'}
+            for (idx, title), level in zip(papers, levels)
+        ], ensure_ascii=False)
+    title = papers[0][1]
+    return f"概述：论文{title[:40]}提出了一种新方法。\n相关性：{levels[0]}，模拟的相关性分析。"
+
+
+class MockStats:
+    """服务端计数：收到的请求数和各类响应数"""
+
+    def __init__(self):
+        self.counts = {'requests': 0, 'ok': 0, 'rate_limited': 0, 'errors': 0}
+        self._lock = threading.Lock()
+
+    def add(self, name):
+        with self._lock:
+            self.counts['requests'] += 1
+            self.counts[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+def make_handler(latency=0.0, jitter=0.0, error_rate=0.0, rate_limit_rate=0.0, retry_after=1, seed=None,
+                 stats=None):
+    """创建请求处理类：先等待latency±jitter秒，再按概率返回429、500或正常结果"""
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+
+    class MockDeepSeekHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, body, headers=None):
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                payload = json.loads(self.rfile.read(length) or b'{}')
+            except json.JSONDecodeError:
+                self._send_json(400, {'error': {'message': 'invalid JSON body'}})
+                return
+            with rng_lock:
+                delay = max(0.0, latency + rng.uniform(-jitter, jitter))
+                roll = rng.random()
+            time.sleep(delay)
+
+            if roll < rate_limit_rate:
+                if stats is not None:
+                    stats.add('rate_limited')
+                self._send_json(429, {'error': {'message': 'Rate limit reached (mock)'}},
+                                {'Retry-After': str(retry_after)})
+                return
+            if roll < rate_limit_rate + error_rate:
+                if stats is not None:
+                    stats.add('errors')
+                self._send_json(500, {'error': {'message': 'Internal server error (mock)'}})
+                return
+
+            messages = payload.get('messages') or []
+            system_prompt = next((m.get('content', '') for m in messages if m.get('role') == 'system'), '')
+            user_text = next((m.get('content', '') for m in messages if m.get('role') == 'user'), '')
+            content = completion_text(system_prompt, user_text)
+            prompt_tokens = estimate_tokens(system_prompt) + estimate_tokens(user_text)
+            completion_tokens = estimate_tokens(content)
+            max_tokens = payload.get('max_tokens') or 0
+            if stats is not None:
+                stats.add('ok')
+            self._send_json(200, {
+                'id': f'mock-{time.time_ns()}',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': payload.get('model', 'deepseek-chat'),
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': content},
+                    'finish_reason': 'length' if max_tokens and completion_tokens > max_tokens else 'stop'
+                }],
+                'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                          'total_tokens': prompt_tokens + completion_tokens,
+                          'prompt_cache_hit_tokens': 0, 'prompt_cache_miss_tokens': prompt_tokens}
+            })
+
+        def log_message(self, format, *args):
+            pass
+
+    return MockDeepSeekHandler
+
+
+def start_server(host='127.0.0.1', port=0, **options):
+    """在后台线程启动替身服务器，返回 (server, API地址)；port为0时自动选择空闲端口
+
+    options传给make_handler，server.stats记录各类响应的次数。
+    """
+    stats = MockStats()
+    server = ThreadingHTTPServer((host, port), make_handler(stats=stats, **options))
+    server.daemon_threads = True
+    server.stats = stats
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/v1/chat/completions"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='本地DeepSeek chat-completions替身服务器')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--latency', type=float, default=0.5, help='每个请求的平均响应延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.2, help='延迟的随机波动范围（±秒）')
+    parser.add_argument('--error_rate', type=float, default=0.0, help='返回500错误的概率')
+    parser.add_argument('--rate_limit_rate', type=float, default=0.0, help='返回429限流的概率')
+    parser.add_argument('--retry_after', type=int, default=1, help='429响应中Retry-After头的秒数')
+    parser.add_argument('--seed', type=int, default=None, help='随机数种子，便于复现')
+    args = parser.parse_args(argv)
+
+    stats = MockStats()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(
+        args.latency, args.jitter, args.error_rate, args.rate_limit_rate, args.retry_after, args.seed, stats
+    ))
+    print(f"DeepSeek替身服务器已启动: http://{args.host}:{args.port}/v1/chat/completions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"请求统计: {stats.snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+# 增量式流水线编排：用一个命令依次运行 抓取 → 解析 → 清洗 → DeepSeek分析 → arXiv查找，
+# 取代分别运行step1~step4和main.py。
+#
+# 每个阶段对每个条目（页面或论文）计算输入指纹，和上次成功的结果一起记录在SQLite状态库中：
+#   fetch   - 页面URL，输出原始HTML的哈希（页面存档在data/page_cache中）
+#   parse   - 原始HTML哈希 + 解析器源码哈希
+#   clean   - 原始标题 + 清洗规则
+#   analyze - 模型、系统提示、输入文本、temperature、max_tokens（与响应缓存键相同）
+#   arxiv   - 查找方式 + 清洗后的标题
+# 再次运行时只重新计算指纹变化或上次失败的条目。例如修改step3中的SYSTEM_PROMPT只会重新分析，
+# 不会重新抓取页面或查找arXiv链接。
+#
+# 用法：
+#   python orchestrator.py --api_key YOUR_KEY
+#   python orchestrator.py --skip_analyze --backend offline
+#   python orchestrator.py --status
+
+import argparse
+import asyncio
+import hashlib
+import inspect
+import json
+import os
+import time
+
+import pandas as pd
+
+import step3_analyze_papers_with_deepseek as step3
+import papers_cool_parser
+from http_session import make_session, fetch_text, HostLimiter, DEFAULT_PER_HOST
+from page_cache import PageCache, DEFAULT_CACHE_DIR
+from pipeline_state import StateStore, print_status, DEFAULT_STATE_FILE
+from rate_limiter import AIMDRateController, TokenBucketLimiter
+from step1_fetch_papers import URLS, REQUEST_TIMEOUT
+from step2_clean_papers import clean_title, normalize_title, CLEAN_PATTERN
+from table_io import write_table
+
+OUTPUT_COLUMNS = ['title', 'clean_title', 'authors', 'abstract', 'overview', 'relevance', 'arxiv_link']
+FETCH_MAX_AGE_HOURS = 24  # 页面存档在此时间内直接使用，不访问网络
+ARXIV_FAILURE_PREFIXES = ('搜索arXiv时', '请求失败', '搜索时发生错误')
+
+
+def fingerprint(*parts):
+    """把若干输入序列化后计算哈希，作为条目的指纹"""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# 代码版本也是输入的一部分：修改解析器或清洗规则后对应阶段会重新计算
+PARSER_VERSION = fingerprint(inspect.getsource(papers_cool_parser))
+CLEAN_VERSION = fingerprint(CLEAN_PATTERN.pattern)
+
+
+class Orchestrator:
+    """按阶段顺序运行，每个阶段只处理需要重新计算的条目"""
+
+    def __init__(self, args, state, log=print):
+        self.args = args
+        self.state = state
+        self.log = log
+        self.counts = {}
+
+    def _count(self, stage, ran, total):
+        self.counts[stage] = (ran, total)
+        self.log(f"[{stage}] 重新计算 {ran} 个条目，复用 {total - ran} 个")
+
+    def fetch(self, urls):
+        """抓取页面，返回 {url: html}；存档未过期时不访问网络"""
+        cache = PageCache(self.args.cache_dir)
+        session = make_session(pool_size=max(DEFAULT_PER_HOST, len(urls)))
+        limiter = HostLimiter(self.args.per_host)
+        max_age = 0 if self.args.refetch else FETCH_MAX_AGE_HOURS * 3600
+        pages = {}
+        ran = 0
+        for url in urls:
+            try:
+                fresh = None if self.args.refetch else cache.fresh(url, max_age)
+                if fresh is None:
+                    ran += 1
+                    fresh = fetch_text(session, url, limiter=limiter, timeout=(10, REQUEST_TIMEOUT), cache=cache)
+                pages[url] = fresh
+                self.state.put('fetch', url, fingerprint(url), 'ok', {'html_hash': fingerprint(fresh)})
+            except Exception as e:
+                self.log(f"[fetch] 抓取 {url} 失败: {e}")
+                self.state.put('fetch', url, fingerprint(url), 'failed')
+                # 抓取失败时使用上次的存档，下游阶段仍然可以运行
+                archived = cache.load(url)
+                if archived is not None:
+                    pages[url] = archived
+        session.close()
+        self._count('fetch', ran, len(urls))
+        return pages
+
+    def parse(self, pages):
+        """解析页面，返回按页面顺序排列的原始论文列表"""
+        papers = []
+        ran = 0
+        for url, html in pages.items():
+            fp = fingerprint(fingerprint(html), PARSER_VERSION)
+            if self.state.needs_run('parse', url, fp):
+                ran += 1
+                parsed = papers_cool_parser.parse_papers_html(html)
+                self.state.put('parse', url, fp, 'ok', parsed)
+            else:
+                parsed = self.state.output('parse', url)
+            self.log(f"[parse] {url}: {len(parsed)} 篇论文")
+            papers.extend(parsed)
+        self._count('parse', ran, len(pages))
+        return papers
+
+    def clean(self, raw_papers):
+        """清洗标题并按归一化标题去重，返回 [(论文ID, 论文)]"""
+        papers = {}
+        ran = 0
+        for raw in raw_papers:
+            title = raw.get('title', '')
+            item = fingerprint(title)
+            fp = fingerprint(title, CLEAN_VERSION)
+            if self.state.needs_run('clean', item, fp):
+                ran += 1
+                cleaned = clean_title(title)
+                self.state.put('clean', item, fp, 'ok', cleaned)
+            else:
+                cleaned = self.state.output('clean', item)
+            key = normalize_title(cleaned)
+            if not key:
+                continue
+            paper_id = fingerprint(key)[:16]
+            if paper_id not in papers:
+                papers[paper_id] = {
+                    'title': title,
+                    'clean_title': cleaned,
+                    'authors': raw.get('authors', '') or '',
+                    'abstract': raw.get('abstract', '') or '',
+                }
+        self._count('clean', ran, len(raw_papers))
+        self.log(f"[clean] 去重后 {len(papers)} 篇论文")
+        return list(papers.items())
+
+    @staticmethod
+    def analyze_fp(paper):
+        """分析阶段的指纹：输入文本、提示和模型参数"""
+        input_text = step3.build_input_text(paper['clean_title'], paper['abstract'], paper['authors'])
+        return step3.make_cache_key(step3.MODEL_NAME, step3.SYSTEM_PROMPT, input_text,
+                                    step3.TEMPERATURE, step3.MAX_TOKENS)
+
+    def arxiv_fp(self, paper):
+        """arXiv查找阶段的指纹：查找方式和清洗后的标题"""
+        return fingerprint(self.args.backend, paper['clean_title'])
+
+    def analyze(self, papers):
+        """只分析输入或提示变化、以及上次失败的论文"""
+        pending = []
+        for paper_id, paper in papers:
+            fp = self.analyze_fp(paper)
+            if self.state.needs_run('analyze', paper_id, fp):
+                pending.append(dict(paper, id=paper_id, fingerprint=fp))
+        self._count('analyze', len(pending), len(papers))
+        if not pending:
+            return
+
+        api_key = self.args.api_key or os.environ.get('DEEPSEEK_API_KEY')
+        if not api_key:
+            raise ValueError("必须提供DeepSeek API密钥，可通过--api_key参数或DEEPSEEK_API_KEY环境变量，或使用--skip_analyze跳过分析")
+        cache = None if self.args.no_cache else step3.ResponseCache(self.args.deepseek_cache_file)
+        limiter = TokenBucketLimiter(rpm=self.args.rpm)
+
+        def on_result(batch, analyses):
+            for paper, analysis in zip(batch, analyses):
+                status = 'failed' if analysis.get('overview') == '解析失败' else 'ok'
+                self.state.put('analyze', paper['id'], paper['fingerprint'], status, analysis)
+
+        def on_failure(paper, error):
+            self.state.put('analyze', paper['id'], paper['fingerprint'], 'failed', {'error': str(error)})
+
+        try:
+            asyncio.run(step3.analyze_papers_async(
+                api_key, pending, concurrency=self.args.concurrency, limiter=limiter, cache=cache,
+                on_result=on_result, on_failure=on_failure
+            ))
+        finally:
+            if cache is not None:
+                cache.close()
+
+    def arxiv(self, papers):
+        """只查找标题变化或上次查找失败的论文"""
+        backend = self.args.backend
+        pending = [(paper_id, paper) for paper_id, paper in papers
+                   if self.state.needs_run('arxiv', paper_id, self.arxiv_fp(paper))]
+        self._count('arxiv', len(pending), len(papers))
+        if not pending:
+            return
+
+        def record(paper_id, paper, link):
+            failed = not isinstance(link, str) or link.startswith(ARXIV_FAILURE_PREFIXES)
+            self.state.put('arxiv', paper_id, self.arxiv_fp(paper), 'failed' if failed else 'ok', link)
+
+        titles = [paper['clean_title'] for _, paper in pending]
+        if backend == 'offline':
+            from arxiv_offline_index import OfflineArxivIndex
+            links = OfflineArxivIndex(self.args.index_dir).lookup_links(titles)
+            for paper_id, paper in pending:
+                record(paper_id, paper, links.get(paper['clean_title'], "未找到arXiv链接"))
+        elif backend == 'api':
+            from arxiv_api import search_arxiv_bulk
+            controller = AIMDRateController(initial_rate=1 / 3, min_rate=1 / 60, max_rate=1 / 3, log=self.log)
+            # 分批查询并逐批记录，中断后已完成的批次不会重复查询
+            for start in range(0, len(pending), self.args.chunk_size):
+                chunk = pending[start:start + self.args.chunk_size]
+                links = search_arxiv_bulk([paper['clean_title'] for _, paper in chunk], log=self.log,
+                                          controller=controller)
+                for paper_id, paper in chunk:
+                    record(paper_id, paper, links.get(paper['clean_title'], "搜索arXiv时出错"))
+        else:
+            from step4_search_arxiv import safe_search_arxiv, DELAY_MIN, CACHE_MAX_AGE_DAYS
+            controller = AIMDRateController(initial_rate=1 / DELAY_MIN, min_rate=1 / 60, max_rate=1.0, log=self.log)
+            cache = None if self.args.no_cache else PageCache(self.args.cache_dir)
+            for paper_id, paper in pending:
+                link = safe_search_arxiv(paper['clean_title'], controller, cache, CACHE_MAX_AGE_DAYS * 24 * 3600)
+                record(paper_id, paper, link)
+
+    def assemble(self, papers):
+        """按当前论文列表汇总各阶段的最新输出
+
+        只使用指纹与当前输入一致的输出：跳过某个阶段（--skip_analyze、--skip_arxiv）时，
+        输入或提示变化后留下的旧结果不写入汇总，对应字段留空。
+        """
+        rows = []
+        stale = {'analyze': 0, 'arxiv': 0}
+        for paper_id, paper in papers:
+            analysis = self.state.output('analyze', paper_id, self.analyze_fp(paper))
+            link = self.state.output('arxiv', paper_id, self.arxiv_fp(paper))
+            if analysis is None and self.state.output('analyze', paper_id) is not None:
+                stale['analyze'] += 1
+            if link is None and self.state.output('arxiv', paper_id) is not None:
+                stale['arxiv'] += 1
+            analysis = analysis or {}
+            row = dict(paper)
+            row['overview'] = analysis.get('overview', '')
+            row['relevance'] = analysis.get('relevance', '')
+            row['arxiv_link'] = link or ''
+            rows.append(row)
+        for stage, count in stale.items():
+            if count:
+                self.log(f"[{stage}] {count} 条结果与当前输入不一致（已过期），汇总中留空，重新运行该阶段即可更新")
+        return rows
+
+    def run(self, urls):
+        start = time.time()
+        pages = self.fetch(urls)
+        papers = self.clean(self.parse(pages))
+        if not self.args.skip_analyze:
+            self.analyze(papers)
+        if not self.args.skip_arxiv:
+            self.arxiv(papers)
+        rows = self.assemble(papers)
+        return rows, time.time() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='增量运行完整流水线，只重新计算输入变化或失败的条目')
+    parser.add_argument('--urls', type=str, nargs='+', default=URLS, help='要抓取的会议页面URL')
+    parser.add_argument('--api_key', type=str, help='DeepSeek API密钥')
+    parser.add_argument('--state_file', type=str, default=DEFAULT_STATE_FILE, help='状态库文件')
+    parser.add_argument('--output_file', type=str, default='data/papers_digest.csv',
+                        help='汇总结果文件，扩展名为.parquet或.arrow时输出列式格式')
+    parser.add_argument('--status', action='store_true', help='只显示各阶段的状态统计')
+    parser.add_argument('--refetch', action='store_true', help='忽略页面存档的有效期，重新验证所有页面')
+    parser.add_argument('--skip_analyze', action='store_true', help='跳过DeepSeek分析')
+    parser.add_argument('--skip_arxiv', action='store_true', help='跳过arXiv查找')
+    parser.add_argument('--backend', choices=['html', 'api', 'offline'], default='html', help='arXiv查找方式')
+    parser.add_argument('--index_dir', type=str, default='data/arxiv_index', help='offline方式使用的离线索引目录')
+    parser.add_argument('--chunk_size', type=int, default=200, help='api方式每批查找的论文数')
+    parser.add_argument('--concurrency', type=int, default=4, help='同时在途的DeepSeek请求数')
+    parser.add_argument('--rpm', type=int, default=60, help='DeepSeek每分钟最多请求数，0表示不限制')
+    parser.add_argument('--per_host', type=int, default=DEFAULT_PER_HOST, help='对同一主机的最大并发请求数')
+    parser.add_argument('--cache_dir', type=str, default=DEFAULT_CACHE_DIR, help='页面缓存目录')
+    parser.add_argument('--deepseek_cache_file', type=str, default='data/deepseek_cache.sqlite', help='DeepSeek响应缓存文件')
+    parser.add_argument('--no_cache', action='store_true', help='不使用arXiv搜索页缓存和DeepSeek响应缓存')
+    args = parser.parse_args(argv)
+
+    state = StateStore(args.state_file)
+    if args.status:
+        print_status(state)
+        state.close()
+        return
+
+    orchestrator = Orchestrator(args, state)
+    try:
+        rows, elapsed = orchestrator.run(args.urls)
+    except KeyboardInterrupt:
+        print("\n收到中断信号，已完成的条目已记录在状态库中，再次运行会从中断处继续")
+        return
+    finally:
+        state.close()
+
+    if rows:
+        write_table(pd.DataFrame(rows, columns=OUTPUT_COLUMNS), args.output_file)
+        print(f"共 {len(rows)} 篇论文，结果已保存到 {args.output_file}，用时 {elapsed:.1f} 秒")
+    else:
+        print("没有可输出的论文")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+try:
+    import zstandard
+except ImportError:  # 没有安装zstandard时退回gzip
+    zstandard = None
+
+# 网页响应的磁盘缓存，同时也是原始HTML存档。
+# 每个URL对应两个文件：压缩后的原始响应体(<key>.html.zst 或 <key>.html.gz)和元数据(<key>.json)，
+# 元数据中记录URL、ETag、Last-Modified、编码和抓取时间，再次请求时用If-None-Match/If-Modified-Since做条件请求，
+# 服务端返回304时直接使用存档内容。
+
+DEFAULT_CACHE_DIR = 'data/page_cache'
+CODEC_SUFFIX = {'zstd': '.html.zst', 'gzip': '.html.gz'}
+
+
+def url_key(url):
+    """URL对应的缓存文件名"""
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+def compress(data, codec):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def decompress(data, codec):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("存档使用zstd压缩，需要安装zstandard才能读取")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class PageCache:
+    """按URL存储压缩的网页响应，支持ETag/Last-Modified条件请求和离线读取"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, codec=None):
+        self.cache_dir = cache_dir
+        self.codec = codec or ('zstd' if zstandard is not None else 'gzip')
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.fresh_hits = 0  # 未过期，直接使用存档
+        self.revalidated = 0  # 服务端返回304
+        self.downloaded = 0  # 下载了新内容
+
+    def _path(self, url, suffix):
+        return os.path.join(self.cache_dir, url_key(url) + suffix)
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def meta(self, url):
+        """读取URL的元数据，没有存档时返回None"""
+        try:
+            with open(self._path(url, '.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, url, meta):
+        path = self._path(url, '.json')
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def load(self, url):
+        """离线读取存档的页面文本，没有存档时返回None"""
+        meta = self.meta(url)
+        if meta is None:
+            return None
+        try:
+            with open(self._path(url, CODEC_SUFFIX[meta['codec']]), 'rb') as f:
+                data = decompress(f.read(), meta['codec'])
+        except OSError:
+            return None
+        return data.decode(meta.get('encoding') or 'utf-8', errors='replace')
+
+    def fresh(self, url, max_age):
+        """存档在max_age秒内抓取过时直接返回其文本，否则返回None"""
+        if not max_age:
+            return None
+        meta = self.meta(url)
+        if meta is None or time.time() - meta.get('fetched_at', 0) > max_age:
+            return None
+        text = self.load(url)
+        if text is not None:
+            self._count('fresh_hits')
+        return text
+
+    def conditional_headers(self, url):
+        """根据存档的验证信息生成条件请求头"""
+        meta = self.meta(url)
+        headers = {}
+        if meta is not None:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def store_response(self, url, response):
+        """处理条件请求的响应并返回页面文本：304时使用存档，200时更新存档，其他状态返回None"""
+        if response.status_code == 304:
+            text = self.load(url)
+            if text is not None:
+                meta = self.meta(url)
+                meta['fetched_at'] = time.time()
+                self._write_meta(url, meta)
+                self._count('revalidated')
+            return text
+        if response.status_code != 200:
+            return None
+        encoding = response.encoding or response.apparent_encoding or 'utf-8'
+        path = self._path(url, CODEC_SUFFIX[self.codec])
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(compress(response.content, self.codec))
+        os.replace(tmp, path)
+        self._write_meta(url, {
+            'url': url,
+            'codec': self.codec,
+            'encoding': encoding,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': time.time(),
+            'size': len(response.content),
+        })
+        self._count('downloaded')
+        return response.text
+
+    def get(self, session, url, headers=None, timeout=None, max_age=0):
+        """带缓存的GET：未过期时不发请求，否则发条件请求；出错时抛出requests异常"""
+        text = self.fresh(url, max_age)
+        if text is not None:
+            return text
+        request_headers = dict(headers or {})
+        request_headers.update(self.conditional_headers(url))
+        response = session.get(url, headers=request_headers, timeout=timeout)
+        text = self.store_response(url, response)
+        if text is None:
+            if response.status_code == 304:
+                # 存档已被删除，重新完整下载
+                response = session.get(url, headers=headers, timeout=timeout)
+                text = self.store_response(url, response)
+            response.raise_for_status()
+        return text if text is not None else response.text
+
+    def urls(self):
+        """列出所有已存档的URL"""
+        result = []
+        for name in sorted(os.listdir(self.cache_dir)):
+            if name.endswith('.json'):
+                try:
+                    with open(os.path.join(self.cache_dir, name), 'r', encoding='utf-8') as f:
+                        result.append(json.load(f)['url'])
+                except (OSError, ValueError, KeyError):
+                    continue
+        return result
+
+    def stats(self):
+        return {'fresh_hits': self.fresh_hits, 'revalidated': self.revalidated, 'downloaded': self.downloaded}
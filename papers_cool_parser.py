@@ -0,0 +1,147 @@
+import re
+from html.parser import HTMLParser
+
+# 单遍事件驱动的会议页面解析器，供step1_fetch_papers.py和main.py共用。
+# 页面布局在遇到第一篇论文时确定一次：
+#   panel  - 每篇论文包在class含"paper"的div中（papers.cool的当前布局），div内第一个标题为论文标题
+#   header - 论文之间没有容器，以h1/h2/h3标题分隔，标题之后的段落是作者和摘要
+# 整个文档只扫描一遍，不构建DOM树。
+
+HEADER_TAGS = {'h1', 'h2', 'h3'}
+INDEX_PREFIX = re.compile(r'^#\d+\s+')
+INDEX_MARK = re.compile(r'#\d+')
+ABSTRACT_MIN_LENGTH = 100  # 没有class提示时，较长的段落视为摘要
+
+
+class PapersCoolParser(HTMLParser):
+    """逐个事件提取论文标题、作者和摘要，可以分块feed"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.layout = None
+        self.papers = []
+        self._current = None
+        self._div_depth = 0
+        self._panel_depth = None
+        # 正在收集文本的元素: [标签名, 同名嵌套层数, 文本片段, 属性]
+        self._capture = None
+
+    # 文本收集
+    def _start_capture(self, tag, attrs):
+        self._capture = [tag, 1, [], attrs]
+
+    def _finish_capture(self):
+        tag, _, chunks, attrs = self._capture
+        self._capture = None
+        text = ''.join(chunks).strip()
+        if tag in HEADER_TAGS:
+            self._on_header(text, attrs)
+        else:
+            self._on_paragraph(text, attrs)
+
+    # 论文记录
+    def _start_paper(self, title):
+        self._close_paper()
+        self._current = {'title': INDEX_PREFIX.sub('', title)}
+
+    def _close_paper(self):
+        if self._current is not None and self._current.get('title'):
+            self.papers.append(self._current)
+        self._current = None
+
+    def _has_content(self):
+        """header布局下是否已经识别出带作者或摘要的论文"""
+        papers = self.papers + ([self._current] if self._current else [])
+        return any('authors' in paper or 'abstract' in paper for paper in papers)
+
+    def _on_header(self, text, attrs):
+        if self.layout == 'panel':
+            if self._panel_depth is not None and self._current is not None and 'title' not in self._current:
+                self._current['title'] = INDEX_PREFIX.sub('', text)
+            return
+        header_id = attrs.get('id') or ''
+        if 'paper-' in header_id or '#' in header_id or INDEX_MARK.search(text) or 'paper' in text.lower():
+            self.layout = 'header'
+            self._start_paper(text)
+        else:
+            # 与原实现一致：任何标题都会结束上一篇论文的段落范围
+            self._close_paper()
+
+    def _on_paragraph(self, text, attrs):
+        paper = self._current
+        if paper is None or 'title' not in paper or not text:
+            return
+        css = attrs.get('class') or ''
+        if 'authors' in css or 'Authors' in text or 'authors' in text.lower():
+            if 'authors' not in paper:
+                paper['authors'] = text.replace('Authors:', '').strip()
+        elif 'abstract' not in paper and ('summary' in css or 'abstract' in css or len(text) > ABSTRACT_MIN_LENGTH):
+            paper['abstract'] = text
+
+    # HTMLParser事件
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'div':
+            self._div_depth += 1
+            css = attrs.get('class') or ''
+            if 'paper' in css:
+                if self.layout == 'header' and self._has_content():
+                    return
+                if self.layout == 'header':
+                    # 之前按标题识别的只是页面标题（没有作者和摘要），改用panel布局
+                    self._current = None
+                    self.papers = []
+                if self._capture is not None:
+                    self._finish_capture()
+                self.layout = 'panel'
+                # 嵌套的paper div说明外层只是列表容器，以最内层为准
+                self._close_paper()
+                self._current = {}
+                self._panel_depth = self._div_depth
+            return
+
+        if self._capture is not None:
+            if tag == self._capture[0]:
+                if tag == 'p':
+                    # p不能嵌套，新的p意味着上一个p隐式结束
+                    self._finish_capture()
+                else:
+                    self._capture[1] += 1
+                    return
+            elif tag in HEADER_TAGS or tag == 'p':
+                self._finish_capture()
+            else:
+                return
+        if tag in HEADER_TAGS or tag == 'p':
+            self._start_capture(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if self._capture is not None and tag == self._capture[0]:
+            self._capture[1] -= 1
+            if self._capture[1] == 0:
+                self._finish_capture()
+        if tag == 'div':
+            if self._panel_depth is not None and self._div_depth == self._panel_depth:
+                if self._capture is not None:
+                    self._finish_capture()
+                self._close_paper()
+                self._panel_depth = None
+            self._div_depth = max(0, self._div_depth - 1)
+
+    def handle_data(self, data):
+        if self._capture is not None:
+            self._capture[2].append(data)
+
+    def close(self):
+        super().close()
+        if self._capture is not None:
+            self._finish_capture()
+        self._close_paper()
+        return self.papers
+
+
+def parse_papers_html(html):
+    """从会议页面HTML中提取论文列表，每篇论文是包含title/authors/abstract的字典"""
+    parser = PapersCoolParser()
+    parser.feed(html)
+    return parser.close()
@@ -0,0 +1,345 @@
+# 流式流水线：抓取 → 解析 → 清洗去重 → DeepSeek分析 → arXiv查找，各阶段通过有界队列相连。
+# 每个阶段有自己的工作线程，一篇论文解析出来就立即进入下一阶段，不必等上一步写完整个文件；
+# 下游处理不过来时队列写满，上游自动阻塞（背压），内存占用受队列长度限制。
+# 总耗时接近最慢的那个阶段，而不是各阶段耗时之和。
+# 例外是清洗去重阶段：它等全部页面解析完（只有几个页面，通常几秒）再按dedup_papers的规则保留摘要最长的一条，
+# 与分步运行的结果一致，之后论文才进入分析阶段。
+#
+# 用法：
+#   python pipeline_runner.py --api_key YOUR_KEY --analyze_workers 4 --output_file data/pipeline_papers.csv
+#   python pipeline_runner.py --skip_analyze --backend offline --index_dir data/arxiv_index
+
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+
+import pandas as pd
+
+import step3_analyze_papers_with_deepseek as step3
+from dedup_papers import dedup_papers
+from http_session import make_session, fetch_text, HostLimiter, DEFAULT_PER_HOST
+from page_cache import PageCache, DEFAULT_CACHE_DIR
+from papers_cool_parser import parse_papers_html
+from rate_limiter import AIMDRateController
+from step1_fetch_papers import URLS, REQUEST_TIMEOUT
+from step2_clean_papers import clean_title
+from step4_search_arxiv import safe_search_arxiv, DELAY_MIN, CACHE_MAX_AGE_DAYS
+from table_io import TableWriter
+
+OUTPUT_COLUMNS = ['title', 'clean_title', 'authors', 'abstract', 'overview', 'relevance', 'arxiv_link']
+QUEUE_SIZE = 100  # 每个阶段输入队列的容量
+WRITE_BATCH = 50  # 结果每积累这么多篇写出一次
+
+_DONE = object()  # 队列结束标记
+
+
+class Stage:
+    """流水线中的一个阶段：若干工作线程从输入队列取出条目，处理后放入下一阶段的队列
+
+    func返回None表示丢弃该条目，返回列表表示拆分为多个条目，否则原样传给下一阶段。
+    on_finish在全部输入处理完后由最后退出的线程调用一次，返回的条目列表继续传给下一阶段（中断时不调用）。
+    """
+
+    def __init__(self, name, func, workers=1, queue_size=QUEUE_SIZE, on_finish=None):
+        self.name = name
+        self.func = func
+        self.on_finish = on_finish
+        self.workers = max(1, workers)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.next = None
+        self.processed = 0
+        self.emitted = 0
+        self.failed = 0
+        self.busy = 0.0  # 所有工作线程处理条目的总耗时
+        self.blocked = 0.0  # 因下游队列已满而等待的总耗时
+        self._running = self.workers
+        self.cancelled = threading.Event()  # 中断后不再处理新条目，只把队列排空
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _emit(self, item):
+        if self.next is None:
+            return
+        start = time.monotonic()
+        self.next.queue.put(item)
+        with self._lock:
+            self.blocked += time.monotonic() - start
+            self.emitted += 1
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            if item is _DONE:
+                break
+            if self.cancelled.is_set():
+                continue
+            start = time.monotonic()
+            try:
+                result = self.func(item)
+            except Exception as e:
+                print(f"[{self.name}] 处理出错: {e}")
+                result = None
+                with self._lock:
+                    self.failed += 1
+            with self._lock:
+                self.busy += time.monotonic() - start
+                self.processed += 1
+            if result is None:
+                continue
+            for out in (result if isinstance(result, list) else [result]):
+                self._emit(out)
+        # 最后一个退出的线程通知下游阶段结束
+        with self._lock:
+            self._running -= 1
+            last = self._running == 0
+        if last and self.on_finish is not None and not self.cancelled.is_set():
+            for out in self.on_finish():
+                self._emit(out)
+        if last and self.next is not None:
+            for _ in range(self.next.workers):
+                self.next.queue.put(_DONE)
+
+    def finish(self):
+        """通知本阶段不会再有新的输入"""
+        for _ in range(self.workers):
+            self.queue.put(_DONE)
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+
+class StreamingPipeline:
+    """把多个Stage串联起来运行"""
+
+    def __init__(self, stages, log=print):
+        self.stages = stages
+        self.log = log
+        for upstream, downstream in zip(stages, stages[1:]):
+            upstream.next = downstream
+
+    def run(self, items):
+        """运行流水线；被中断时先停止各阶段并等待所有线程退出，再抛出KeyboardInterrupt"""
+        start = time.monotonic()
+        for stage in self.stages:
+            stage.start()
+        finished = False
+        try:
+            # 第一个阶段的队列写满时这里会阻塞
+            for item in items:
+                self.stages[0].queue.put(item)
+            self.stages[0].finish()
+            finished = True
+            self.join()
+        except KeyboardInterrupt:
+            # 各阶段排空队列后依次退出，写出阶段把已到达的结果写完，调用方之后才能安全地flush
+            self.cancel()
+            if not finished:
+                self.stages[0].finish()
+            self.join()
+            raise
+        elapsed = time.monotonic() - start
+        self.report(elapsed)
+        return elapsed
+
+    def join(self):
+        for stage in self.stages:
+            stage.join()
+
+    def cancel(self):
+        """停止处理新条目：除最后一个（写出）阶段外的各阶段排空队列，已到达写出阶段的条目照常写出"""
+        for stage in self.stages[:-1]:
+            stage.cancelled.set()
+
+    def report(self, elapsed):
+        self.log(f"\n流水线总耗时 {elapsed:.1f} 秒，各阶段统计:")
+        self.log(f"{'阶段':<10}{'线程':>4}{'输入':>8}{'输出':>8}{'失败':>6}{'处理耗时(秒)':>14}{'下游阻塞(秒)':>14}")
+        for stage in self.stages:
+            self.log(f"{stage.name:<10}{stage.workers:>6}{stage.processed:>10}{stage.emitted:>10}{stage.failed:>8}"
+                     f"{stage.busy:>16.1f}{stage.blocked:>16.1f}")
+        serial = sum(stage.busy for stage in self.stages)
+        self.log(f"各阶段处理耗时之和 {serial:.1f} 秒，流水线实际耗时 {elapsed:.1f} 秒")
+
+
+def build_stages(args):
+    """按命令行参数创建各阶段的处理函数"""
+    session = make_session(pool_size=max(args.fetch_workers, DEFAULT_PER_HOST))
+    host_limiter = HostLimiter(args.per_host)
+    page_cache = None if args.no_cache else PageCache(args.cache_dir)
+    handles = []  # 运行结束时需要关闭的文件
+
+    # 页面在URL列表中的位置，抓取线程有多个时页面到达的顺序可能不同
+    page_order = {url: i for i, url in enumerate(args.urls)}
+
+    def fetch(url):
+        html = fetch_text(session, url, limiter=host_limiter, timeout=(10, REQUEST_TIMEOUT), cache=page_cache)
+        print(f"已下载 {url}")
+        return url, html
+
+    def parse(page):
+        url, html = page
+        papers = parse_papers_html(html)
+        # 记录论文在分步运行的输入文件中的位置，去重时摘要长度相同的保留先出现的
+        for i, paper in enumerate(papers):
+            paper['_order'] = (page_order.get(url, len(page_order)), i)
+        print(f"解析出 {len(papers)} 篇论文")
+        return papers
+
+    # 清洗阶段只有一个线程，不需要加锁
+    cleaned = []
+
+    def clean(paper):
+        paper['clean_title'] = clean_title(paper.get('title'))
+        cleaned.append(paper)
+        return None
+
+    def dedup():
+        """全部论文清洗完后按dedup_papers的规则去重（同一标题保留摘要最长的一条），返回保留的论文"""
+        if not cleaned:
+            return []
+        cleaned.sort(key=lambda paper: paper['_order'])
+        kept, removed = dedup_papers(pd.DataFrame(cleaned))
+        print(f"去重: {len(cleaned)} 篇论文中去掉 {len(removed)} 篇重复论文")
+        return [cleaned[i] for i in kept.index]
+
+    stages = [
+        Stage('fetch', fetch, args.fetch_workers, args.queue_size),
+        Stage('parse', parse, 1, args.queue_size),
+        Stage('clean', clean, 1, args.queue_size, on_finish=dedup),
+    ]
+
+    if not args.skip_analyze:
+        api_key = args.api_key or os.environ.get('DEEPSEEK_API_KEY')
+        if not api_key:
+            raise ValueError("必须提供DeepSeek API密钥，可通过--api_key参数或DEEPSEEK_API_KEY环境变量，或使用--skip_analyze跳过分析")
+        cache = None if args.no_cache else step3.ResponseCache(args.deepseek_cache_file)
+        dead_letter_file = args.dead_letter_file or os.path.splitext(args.output_file)[0] + '_failed.jsonl'
+        os.makedirs(os.path.dirname(dead_letter_file) or '.', exist_ok=True)
+        # 追加写入，上次运行记录的失败论文在重试前不会被覆盖；第3步读取时按论文键去重，后写的为准
+        dead_letter_handle = open(dead_letter_file, 'a', encoding='utf-8')
+        handles.append(dead_letter_handle)
+        dead_letter_lock = threading.Lock()
+
+        def record_failure(paper, error):
+            """与第3步相同格式的失败记录，分析线程共用一个文件"""
+            paper_info = {col: paper.get(col, '') for col in ('title', 'clean_title', 'authors', 'abstract')}
+            line = json.dumps({
+                'key': step3.paper_key(paper_info),
+                'paper': paper_info,
+                'error': str(error),
+                'failed_at': time.strftime('%Y-%m-%d %H:%M:%S')
+            }, ensure_ascii=False) + '\n'
+            with dead_letter_lock:
+                dead_letter_handle.write(line)
+                dead_letter_handle.flush()
+        # 固定速率：上下限相同的AIMD控制器就是线程安全的匀速节拍器
+        rpm_gate = AIMDRateController(initial_rate=args.rpm / 60, min_rate=args.rpm / 60,
+                                      max_rate=args.rpm / 60) if args.rpm > 0 else None
+
+        def analyze(paper):
+            if rpm_gate is not None:
+                rpm_gate.wait()
+            try:
+                analysis = step3.analyze_paper(api_key, paper['clean_title'], paper.get('abstract', ''),
+                                               paper.get('authors', ''), cache)
+            except step3.DeepSeekAPIError as e:
+                # 失败的论文不进入结果表，记录到失败文件，之后可用第3步的 --retry_failed 重试
+                print(f"分析失败: {e}")
+                record_failure(paper, e)
+                return None
+            paper.update(analysis)
+            return paper
+
+        stages.append(Stage('analyze', analyze, args.analyze_workers, args.queue_size))
+
+    if args.backend == 'offline':
+        from arxiv_offline_index import OfflineArxivIndex
+        index = OfflineArxivIndex(args.index_dir)
+
+        def lookup(paper):
+            paper['arxiv_link'] = index.lookup_links([paper['clean_title']]).get(paper['clean_title'], "未找到arXiv链接")
+            return paper
+    else:
+        controller = AIMDRateController(initial_rate=1 / DELAY_MIN, min_rate=1 / 60, max_rate=1.0)
+        arxiv_cache = page_cache
+        max_age = CACHE_MAX_AGE_DAYS * 24 * 3600
+
+        def lookup(paper):
+            paper['arxiv_link'] = safe_search_arxiv(paper['clean_title'], controller, arxiv_cache, max_age)
+            return paper
+
+    stages.append(Stage('arxiv', lookup, args.arxiv_workers, args.queue_size))
+
+    writer = TableWriter(args.output_file)
+    pending = []
+
+    def write(paper):
+        pending.append({col: paper.get(col, '') for col in OUTPUT_COLUMNS})
+        if len(pending) >= WRITE_BATCH:
+            flush()
+        return None
+
+    def flush():
+        if pending:
+            writer.write(pd.DataFrame(pending, columns=OUTPUT_COLUMNS))
+            pending.clear()
+
+    def close():
+        """写出剩余结果并关闭所有文件，只能在各阶段线程退出后调用"""
+        flush()
+        writer.close()
+        for handle in handles:
+            handle.close()
+
+    # 写出阶段只有一个线程，不需要加锁
+    stages.append(Stage('write', write, 1, args.queue_size))
+    return stages, close
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='流式运行完整流水线：抓取、清洗去重、DeepSeek分析、arXiv查找')
+    parser.add_argument('--urls', type=str, nargs='+', default=URLS, help='要抓取的会议页面URL')
+    parser.add_argument('--api_key', type=str, help='DeepSeek API密钥')
+    parser.add_argument('--skip_analyze', action='store_true', help='跳过DeepSeek分析')
+    parser.add_argument('--backend', choices=['html', 'offline'], default='html',
+                        help='arXiv查找方式: html逐篇抓取搜索页面, offline查询本地离线索引')
+    parser.add_argument('--index_dir', type=str, default='data/arxiv_index', help='offline方式使用的离线索引目录')
+    parser.add_argument('--output_file', type=str, default='data/pipeline_papers.csv',
+                        help='结果文件，扩展名为.parquet或.arrow时输出列式格式')
+    parser.add_argument('--fetch_workers', type=int, default=4, help='抓取页面的线程数')
+    parser.add_argument('--per_host', type=int, default=DEFAULT_PER_HOST, help='对同一主机的最大并发请求数')
+    parser.add_argument('--analyze_workers', type=int, default=4, help='DeepSeek分析的线程数')
+    parser.add_argument('--rpm', type=int, default=60, help='DeepSeek每分钟最多请求数，0表示不限制')
+    parser.add_argument('--arxiv_workers', type=int, default=2, help='arXiv查找的线程数（html方式共用一个自适应速率控制器）')
+    parser.add_argument('--queue_size', type=int, default=QUEUE_SIZE, help='每个阶段输入队列的容量')
+    parser.add_argument('--cache_dir', type=str, default=DEFAULT_CACHE_DIR, help='页面缓存目录')
+    parser.add_argument('--deepseek_cache_file', type=str, default='data/deepseek_cache.sqlite', help='DeepSeek响应缓存文件')
+    parser.add_argument('--no_cache', action='store_true', help='不使用页面缓存和DeepSeek响应缓存')
+    parser.add_argument('--dead_letter_file', type=str, default='',
+                        help='分析失败的论文记录文件（格式与第3步相同），默认为输出文件名加_failed.jsonl')
+    args = parser.parse_args(argv)
+
+    os.makedirs('data', exist_ok=True)
+    stages, close = build_stages(args)
+    pipeline = StreamingPipeline(stages)
+    try:
+        pipeline.run(args.urls)
+    except KeyboardInterrupt:
+        # run()在各阶段线程全部退出后才抛出中断，此时写出不会与写出线程冲突
+        print("\n收到中断信号，已停止各阶段，保存已完成的结果...")
+    finally:
+        close()
+    print(f"结果已保存到 {args.output_file}")
+
+
+if __name__ == "__main__":
+    main()
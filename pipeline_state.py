@@ -0,0 +1,91 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# orchestrator.py的增量运行状态库。只依赖标准库，deepdigest status可以不导入pandas等重量级依赖直接读取。
+
+STAGES = ['fetch', 'parse', 'clean', 'analyze', 'arxiv']
+DEFAULT_STATE_FILE = 'data/pipeline_state.sqlite'
+
+
+class StateStore:
+    """记录每个阶段每个条目的指纹、状态和输出的SQLite状态库"""
+
+    def __init__(self, path=DEFAULT_STATE_FILE):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS stage_state ('
+            ' stage TEXT NOT NULL,'
+            ' item TEXT NOT NULL,'
+            ' fingerprint TEXT NOT NULL,'
+            ' status TEXT NOT NULL,'
+            ' output TEXT,'
+            ' updated_at REAL NOT NULL,'
+            ' PRIMARY KEY (stage, item))'
+        )
+        self._conn.commit()
+
+    def get(self, stage, item):
+        """返回 (指纹, 状态, 输出)，没有记录时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT fingerprint, status, output FROM stage_state WHERE stage = ? AND item = ?', (stage, item)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2]) if row[2] else None
+
+    def needs_run(self, stage, item, fp):
+        """指纹变化、上次失败或没有记录时需要重新计算"""
+        record = self.get(stage, item)
+        return record is None or record[0] != fp or record[1] != 'ok'
+
+    def output(self, stage, item, fp=None):
+        """成功的输出；给出fp时只返回指纹一致的输出，过期的输出返回None"""
+        record = self.get(stage, item)
+        if record is None or record[1] != 'ok' or (fp is not None and record[0] != fp):
+            return None
+        return record[2]
+
+    def put(self, stage, item, fp, status, output=None):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO stage_state (stage, item, fingerprint, status, output, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (stage, item, fp, status, json.dumps(output, ensure_ascii=False) if output is not None else None,
+                 time.time())
+            )
+            self._conn.commit()
+
+    def summary(self):
+        """每个阶段各状态的条目数"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT stage, status, COUNT(*) FROM stage_state GROUP BY stage, status'
+            ).fetchall()
+        result = {}
+        for stage, status, count in rows:
+            result.setdefault(stage, {})[status] = count
+        return result
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def print_status(state):
+    summary = state.summary()
+    if not summary:
+        print("状态库为空，尚未运行过")
+        return
+    for stage in STAGES:
+        counts = summary.get(stage, {})
+        detail = ', '.join(f"{status} {count}" for status, count in sorted(counts.items())) or '无记录'
+        print(f"{stage:<8} {detail}")
@@ -0,0 +1,131 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+
+class TokenBucketLimiter:
+    """基于令牌桶的速率限制器，同时限制每分钟请求数(RPM)和每分钟令牌数(TPM)"""
+
+    def __init__(self, rpm=0, tpm=0):
+        # rpm/tpm 为0表示不限制
+        self.rpm = rpm
+        self.tpm = tpm
+        self._request_tokens = float(rpm)
+        self._llm_tokens = float(tpm)
+        self._last_refill = time.monotonic()
+        self._lock = None
+
+    def _refill(self):
+        """按经过的时间补充令牌，桶容量为一分钟的配额"""
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        if self.rpm > 0:
+            self._request_tokens = min(self.rpm, self._request_tokens + elapsed * self.rpm / 60.0)
+        if self.tpm > 0:
+            self._llm_tokens = min(self.tpm, self._llm_tokens + elapsed * self.tpm / 60.0)
+
+    def _wait_time(self, tokens):
+        """计算还需等待多少秒才能同时满足请求数和令牌数配额"""
+        wait = 0.0
+        if self.rpm > 0 and self._request_tokens < 1:
+            wait = max(wait, (1 - self._request_tokens) * 60.0 / self.rpm)
+        if self.tpm > 0 and self._llm_tokens < tokens:
+            wait = max(wait, (tokens - self._llm_tokens) * 60.0 / self.tpm)
+        return wait
+
+    async def acquire(self, tokens=0):
+        """等待直到可以发送一个消耗约tokens个令牌的请求"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # 单个请求的令牌数不能超过桶容量，否则永远无法满足
+        if self.tpm > 0:
+            tokens = min(tokens, self.tpm)
+        # 加锁保证等待中的请求按先后顺序获得配额
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = self._wait_time(tokens)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            if self.rpm > 0:
+                self._request_tokens -= 1
+            if self.tpm > 0:
+                self._llm_tokens -= tokens
+
+
+class AIMDRateController:
+    """加性增、乘性减(AIMD)的自适应请求速率控制器
+
+    响应正常时每次把速率提高increase（请求/秒），遇到429/503、请求出错或响应过慢时把速率乘以decrease_factor，
+    服务端给出Retry-After时在该时间内暂停发送。
+    """
+
+    def __init__(self, initial_rate=0.1, min_rate=1 / 60, max_rate=1.0, increase=0.02,
+                 decrease_factor=0.5, slow_threshold=10.0, log=print, log_interval=60):
+        self.rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.slow_threshold = slow_threshold
+        self.log = log
+        self.log_interval = log_interval
+        self._next_time = 0.0
+        self._hold_until = 0.0
+        self._lock = threading.Lock()
+        self._window = deque()  # 最近一段时间内完成的请求时间，用于计算实际速率
+        self._last_log = time.monotonic()
+
+    def wait(self):
+        """等待到下一个允许发送请求的时刻"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_time, self._hold_until)
+            self._next_time = slot + 1.0 / self.rate
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def on_response(self, status_code=None, latency=None, retry_after=None):
+        """根据一次请求的结果调整速率；status_code为None表示请求出错（超时、连接失败等）"""
+        with self._lock:
+            now = time.monotonic()
+            self._window.append(now)
+            while self._window and now - self._window[0] > self.log_interval:
+                self._window.popleft()
+
+            overloaded = status_code is None or status_code in (429, 503)
+            slow = latency is not None and latency > self.slow_threshold
+            if overloaded or slow:
+                old_rate = self.rate
+                self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+                reason = f"状态码 {status_code}" if status_code else "请求出错"
+                if slow and not overloaded:
+                    reason = f"响应耗时 {latency:.1f} 秒"
+                self.log(f"{reason}，请求速率从 {old_rate:.3f} 降到 {self.rate:.3f} 请求/秒")
+                # 下一个请求按新的速率重新排期
+                self._next_time = max(self._next_time, now + 1.0 / self.rate)
+            elif status_code is not None and status_code < 400:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+            if retry_after:
+                self._hold_until = max(self._hold_until, now + retry_after)
+                self.log(f"服务端要求等待 {retry_after:.1f} 秒后再请求")
+
+            if now - self._last_log >= self.log_interval:
+                self._last_log = now
+                self.log(f"当前目标速率 {self.rate:.3f} 请求/秒，最近实际速率 {self._effective_rate_locked(now):.3f} 请求/秒")
+
+    def _effective_rate_locked(self, now):
+        """计算实际速率，调用方需持有锁"""
+        if len(self._window) < 2:
+            return 0.0
+        return len(self._window) / max(now - self._window[0], 1e-6)
+
+    def effective_rate(self):
+        """最近log_interval秒内实际完成的请求速率"""
+        with self._lock:
+            return self._effective_rate_locked(time.monotonic())
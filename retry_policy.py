@@ -0,0 +1,83 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# 这些状态码表示服务端暂时不可用，值得重试
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value):
+    """解析Retry-After响应头，支持秒数和HTTP日期两种格式，返回需要等待的秒数"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class RetryPolicy:
+    """带随机抖动的指数退避重试策略"""
+
+    def __init__(self, max_retries=5, base_delay=1.0, max_delay=60.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt, retry_after=None):
+        """第attempt次（从0开始）失败后应等待的秒数，服务端给出Retry-After时至少等待该时长"""
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        # 抖动避免并发请求在同一时刻集中重试
+        delay = random.uniform(delay / 2, delay)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求被直接拒绝"""
+
+
+class CircuitBreaker:
+    """连续失败达到阈值后熔断一段时间，之后放行一个试探请求"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._half_open_probe = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """发送请求前调用，熔断期间抛出CircuitOpenError"""
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError(f"连续失败 {self.failures} 次，熔断中")
+            # 熔断时间已过，只放行一个试探请求
+            if self._half_open_probe:
+                raise CircuitOpenError("熔断器半开，等待试探请求结果")
+            self._half_open_probe = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._half_open_probe = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            # 阈值为0表示不熔断
+            if self.failure_threshold > 0 and (self._half_open_probe or self.failures >= self.failure_threshold):
+                if self.opened_at is None or self._half_open_probe:
+                    print(f"连续失败 {self.failures} 次，熔断 {self.reset_timeout:.0f} 秒")
+                self.opened_at = time.monotonic()
+                self._half_open_probe = False
@@ -1,68 +1,49 @@
-import requests
-from bs4 import BeautifulSoup
+import argparse
 import pandas as pd
-import re
 import time
-from tqdm import tqdm
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 import os
+from urllib.parse import urlparse, parse_qs
+from papers_cool_parser import parse_papers_html
+from http_session import make_session, fetch_text, HostLimiter, DEFAULT_PER_HOST
+from page_cache import PageCache, DEFAULT_CACHE_DIR
+from table_io import write_table
 
-def fetch_papers_info(url):
+# 要抓取的URL列表
+URLS = [
+    "https://papers.cool/venue/NeurIPS.2023?group=Spotlight&show=392",
+    "https://papers.cool/venue/NeurIPS.2023?group=Oral&show=75",
+    "https://papers.cool/venue/NeurIPS.2024?group=Spotlight&show=327",
+    "https://papers.cool/venue/NeurIPS.2024?group=Oral&show=61"
+]
+FETCH_WORKERS = 8  # 同时下载的页面数
+REQUEST_TIMEOUT = 60  # 读取超时（秒）
+
+def venue_info(url):
+    """从页面URL中提取会议和分组，如 NeurIPS.2023 和 Oral，供第3步按优先级排序"""
+    parsed = urlparse(url)
+    venue = parsed.path.rstrip('/').split('/')[-1]
+    group = parse_qs(parsed.query).get('group', [''])[0]
+    return {'venue': venue, 'group': group}
+
+def fetch_page(session, url, limiter=None, timeout=REQUEST_TIMEOUT, cache=None):
+    """在I/O线程中下载页面，只返回HTML文本，解析交给解析进程"""
+    try:
+        start = time.time()
+        html = fetch_text(session, url, limiter=limiter, timeout=(10, timeout), cache=cache)
+        print(f"已下载 {url} ({len(html) / 1024:.0f} KB, {time.time() - start:.1f} 秒)")
+        return html
+    except Exception as e:
+        print(f"抓取页面 {url} 时出错: {e}")
+        return None
+
+def fetch_papers_info(url, session=None, cache=None):
     """抓取论文标题和摘要"""
     try:
         print(f"正在抓取 {url}")
-        response = requests.get(url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        papers_data = []
-        # 查找论文块 - 根据页面结构调整选择器
-        paper_blocks = soup.select('div[class^="#"]')
-        
-        if not paper_blocks:
-            # 备选方案: 尝试找到所有论文条目
-            paper_blocks = soup.find_all('div', {'class': lambda x: x and (x.startswith('paper-') or 'paper' in x)})
-        
-        if not paper_blocks:
-            # 再次尝试通过结构推断
-            headers = soup.find_all(['h2', 'h3'], {'id': lambda x: x and ('paper-' in x or '#' in x)})
-            for header in headers:
-                paper_info = {}
-                paper_info['title'] = header.text.strip()
-                authors_section = header.find_next('p')
-                if authors_section and 'Authors' in authors_section.text:
-                    paper_info['authors'] = authors_section.text.replace('Authors:', '').strip()
-                abstract_section = authors_section.find_next('p') if authors_section else None
-                if abstract_section:
-                    paper_info['abstract'] = abstract_section.text.strip()
-                papers_data.append(paper_info)
-        
-        # 如果上述方法都失败，尝试直接解析页面结构
-        if not papers_data:
-            # 尝试识别页面中的论文条目
-            paper_entries = []
-            for element in soup.find_all(['h1', 'h2', 'h3']):
-                text = element.text.strip()
-                if re.search(r'#\d+', text) or 'paper' in text.lower():
-                    paper_entries.append(element)
-            
-            for entry in paper_entries:
-                paper_info = {}
-                title_text = entry.text.strip()
-                # 处理标题中可能的编号和特殊字符
-                paper_info['title'] = re.sub(r'^#\d+\s+', '', title_text)
-                
-                # 查找作者和摘要信息
-                next_elem = entry.find_next_sibling()
-                while next_elem and next_elem.name not in ['h1', 'h2', 'h3']:
-                    if 'Authors' in next_elem.text or 'authors' in next_elem.text.lower():
-                        paper_info['authors'] = next_elem.text.replace('Authors:', '').strip()
-                    elif 'abstract' not in paper_info and len(next_elem.text) > 100:
-                        # 假设较长的文本块是摘要
-                        paper_info['abstract'] = next_elem.text.strip()
-                    next_elem = next_elem.find_next_sibling()
-                
-                if 'title' in paper_info:
-                    papers_data.append(paper_info)
+        html = fetch_text(session or make_session(), url, timeout=(10, REQUEST_TIMEOUT), cache=cache)
+        # 单遍解析页面，提取标题、作者和摘要
+        papers_data = parse_papers_html(html)
         
         print(f"抓取到 {len(papers_data)} 篇论文")
         return papers_data
@@ -71,64 +52,127 @@ def fetch_papers_info(url):
         print(f"抓取页面时出错: {e}")
         return []
 
-def try_alternative_method(url):
-    """如果主方法失败，尝试使用Selenium"""
+def fetch_all_venues(urls, workers=FETCH_WORKERS, per_host=DEFAULT_PER_HOST, timeout=REQUEST_TIMEOUT, parse_workers=None, cache=None):
+    """并发下载所有会议页面，并在独立的进程池中解析，返回与urls顺序一致的论文列表"""
+    session = make_session(pool_size=max(workers, per_host))
+    limiter = HostLimiter(per_host)
+    results = [[] for _ in urls]
+    parse_futures = {}
+    # parse_workers为0时在主线程解析（仍然不占用下载线程）
+    parse_pool = ProcessPoolExecutor(max_workers=parse_workers) if parse_workers != 0 else None
     try:
-        from alternate_scraper import fetch_papers_with_selenium
-        print("尝试使用Selenium抓取...")
-        return fetch_papers_with_selenium(url)
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(urls)))) as io_pool:
+            futures = {io_pool.submit(fetch_page, session, url, limiter, timeout, cache): i for i, url in enumerate(urls)}
+            # 哪个页面先下载完就先解析，不等待其他页面
+            for future in as_completed(futures):
+                i = futures[future]
+                html = future.result()
+                if html is None:
+                    continue
+                if parse_pool is None:
+                    results[i] = parse_papers_html(html)
+                    print(f"从 {urls[i]} 解析出 {len(results[i])} 篇论文")
+                else:
+                    parse_futures[parse_pool.submit(parse_papers_html, html)] = i
+        for future in as_completed(parse_futures):
+            i = parse_futures[future]
+            try:
+                results[i] = future.result()
+                print(f"从 {urls[i]} 解析出 {len(results[i])} 篇论文")
+            except Exception as e:
+                print(f"解析页面 {urls[i]} 时出错: {e}")
+    finally:
+        if parse_pool is not None:
+            parse_pool.shutdown()
+        session.close()
+    return results
+
+def reparse_archived(urls, cache):
+    """不访问网络，从页面存档重新解析所有会议页面"""
+    results = []
+    for url in urls:
+        html = cache.load(url)
+        if html is None:
+            print(f"没有 {url} 的存档，跳过")
+            results.append([])
+            continue
+        papers = parse_papers_html(html)
+        print(f"从存档的 {url} 解析出 {len(papers)} 篇论文")
+        results.append(papers)
+    return results
+
+def try_alternative_method(urls, tabs=4):
+    """如果主方法失败，尝试使用Selenium；所有页面共用一个浏览器，在多个标签页中并行加载"""
+    try:
+        from alternate_scraper import fetch_all_with_selenium
+        print(f"尝试使用Selenium抓取 {len(urls)} 个页面...")
+        return fetch_all_with_selenium(urls, tabs=tabs)
     except Exception as e:
         print(f"备选抓取方法失败: {e}")
-        return []
+        return [[] for _ in urls]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='从papers.cool抓取会议论文')
+    parser.add_argument('--urls', type=str, nargs='+', default=URLS, help='要抓取的会议页面URL')
+    parser.add_argument('--workers', type=int, default=FETCH_WORKERS, help='同时下载的页面数')
+    parser.add_argument('--per_host', type=int, default=DEFAULT_PER_HOST, help='对同一主机的最大并发请求数')
+    parser.add_argument('--timeout', type=float, default=REQUEST_TIMEOUT, help='单个页面的读取超时（秒）')
+    parser.add_argument('--parse_workers', type=int, default=None, help='解析进程数，默认为CPU核数，0表示在主线程解析')
+    parser.add_argument('--cache_dir', type=str, default=DEFAULT_CACHE_DIR, help='页面缓存和原始HTML存档目录')
+    parser.add_argument('--no_cache', action='store_true', help='不使用页面缓存，每次完整下载')
+    parser.add_argument('--reparse', action='store_true', help='不访问网络，从页面存档重新解析并生成data/all_papers.csv')
+    parser.add_argument('--browser_tabs', type=int, default=4, help='Selenium备选抓取时同一浏览器中并行加载的标签页数')
+    parser.add_argument('--format', choices=['csv', 'parquet', 'arrow'], default='csv', help='输出文件格式，parquet和arrow需要安装pyarrow')
+    args = parser.parse_args(argv)
 
-def main():
     # 创建数据目录
     if not os.path.exists('data'):
         os.makedirs('data')
         
-    # 要抓取的URL列表
-    urls = [
-        "https://papers.cool/venue/NeurIPS.2023?group=Spotlight&show=392",
-        "https://papers.cool/venue/NeurIPS.2023?group=Oral&show=75",
-        "https://papers.cool/venue/NeurIPS.2024?group=Spotlight&show=327",
-        "https://papers.cool/venue/NeurIPS.2024?group=Oral&show=61"
-    ]
+    urls = args.urls
+    cache = None if args.no_cache and not args.reparse else PageCache(args.cache_dir)
+    start = time.time()
+    if args.reparse:
+        results = reparse_archived(urls, cache)
+        print(f"从存档解析 {len(urls)} 个页面用时 {time.time() - start:.1f} 秒")
+    else:
+        results = fetch_all_venues(urls, workers=args.workers, per_host=args.per_host,
+                                   timeout=args.timeout, parse_workers=args.parse_workers, cache=cache)
+        print(f"下载并解析 {len(urls)} 个页面用时 {time.time() - start:.1f} 秒")
+        if cache is not None:
+            stats = cache.stats()
+            print(f"页面缓存: {stats['revalidated']} 个未变化(304), {stats['downloaded']} 个重新下载")
     
-    # 抓取所有页面，每个链接保存为独立的CSV文件
-    for i, url in enumerate(urls):
+    # 如果抓取失败，尝试备选方法（重新解析模式不访问网络）
+    retry = [i for i, papers in enumerate(results) if len(papers) < 10]
+    if retry and not args.reparse:
+        alternatives = try_alternative_method([urls[i] for i in retry], args.browser_tabs)
+        for i, alternative_papers in zip(retry, alternatives):
+            if len(alternative_papers) > len(results[i]):
+                results[i] = alternative_papers
+                print(f"使用备选方法从 {urls[i]} 抓取到 {len(alternative_papers)} 篇论文")
+    
+    # 每个链接保存为独立的CSV文件
+    all_papers = []
+    for i, (url, papers) in enumerate(zip(urls, results)):
         # 生成文件名
-        filename = f"data/neurips_papers_{i+1}.csv"
-        
-        # 抓取论文
-        papers = fetch_papers_info(url)
-        
-        # 如果抓取失败，尝试备选方法
-        if len(papers) < 10:
-            alternative_papers = try_alternative_method(url)
-            if len(alternative_papers) > len(papers):
-                papers = alternative_papers
-                print(f"使用备选方法抓取到 {len(papers)} 篇论文")
+        filename = f"data/neurips_papers_{i+1}.{args.format}"
         
         # 保存到CSV
         if papers:
-            df = pd.DataFrame(papers)
-            df.to_csv(filename, index=False, encoding='utf-8-sig')
+            info = venue_info(url)
+            papers = [dict(paper, **info) for paper in papers]
+            write_table(pd.DataFrame(papers), filename)
             print(f"保存 {len(papers)} 篇论文到 {filename}")
+            all_papers.extend(papers)
         else:
             print(f"未能从 {url} 抓取到论文")
     
-    # 合并所有数据
-    all_files = [f for f in os.listdir('data') if f.startswith('neurips_papers_') and f.endswith('.csv')]
-    all_papers = []
-    
-    for file in all_files:
-        df = pd.read_csv(os.path.join('data', file))
-        all_papers.append(df)
-    
+    # 直接用内存中的结果合并，不再重新读取刚写出的文件
     if all_papers:
-        combined_df = pd.concat(all_papers, ignore_index=True)
-        combined_df.to_csv('data/all_papers.csv', index=False, encoding='utf-8-sig')
+        combined_df = pd.DataFrame(all_papers)
+        write_table(combined_df, f'data/all_papers.{args.format}')
         print(f"成功合并所有数据，共 {len(combined_df)} 篇论文")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
\ No newline at end of file
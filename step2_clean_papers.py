@@ -1,94 +1,192 @@
+import argparse
+import glob
 import pandas as pd
 import re
 import os
+import time
+import unicodedata
+from table_io import TableWriter, iter_table, table_format
+
+# 预编译的清洗规则，逐行函数和向量化版本共用：
+# 方括号内的内容（如[PDF20]、[Copy]、[Kimi26]、[REL]）连同两侧空白、以及换行和连续空白，一次替换为单个空格
+CLEAN_PATTERN = re.compile(r'(?:\s*\[[^\]]*\]\s*|\s)+')
+CHUNK_SIZE = 50000  # 每次读入和写出的行数
+
+# 标题归一化规则，去重、arXiv匹配、离线索引和向量存储共用，同一标题在各阶段得到相同的键：
+# 统一Unicode形式（NFKC）、casefold，标点和下划线替换为空格，连续空白折叠为一个空格
+PUNCTUATION_PATTERN = re.compile(r'[^\w\s]|_')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+NORMALIZE_VERSION = 2  # 归一化规则改变时加1，离线索引据此判断是否需要重建
 
 def clean_title(title):
     """清洗论文标题，移除[PDF]等标记"""
     if not isinstance(title, str):
         return ""
     
-    # 替换换行符为空格
-    title = title.replace('\n', ' ')
-    
-    # 移除方括号内的内容，如[PDF20]、[Copy]、[Kimi26]、[REL]等
-    cleaned_title = re.sub(r'\s*\[[^\]]*\]\s*', ' ', title)
-    
-    # 移除多余空格
-    cleaned_title = re.sub(r'\s+', ' ', cleaned_title).strip()
-    
-    return cleaned_title
+    # 移除方括号内的内容，换行符和多余空格合并为一个空格
+    return CLEAN_PATTERN.sub(' ', title).strip()
 
-def main():
-    # 检查数据目录
-    if not os.path.exists('data'):
-        print("错误: 未找到数据目录。请先运行fetch_papers.py")
-        return
-        
-    # 读取所有论文
-    # input_file = 'data/all_papers.csv'
-    input_file = 'data/neurips_papers_1.csv'
-    if not os.path.exists(input_file):
-        print(f"错误: 未找到文件 {input_file}")
+def clean_titles(titles):
+    """向量化清洗一列标题，结果与逐行调用clean_title相同"""
+    if not (pd.api.types.is_object_dtype(titles) or pd.api.types.is_string_dtype(titles)):
+        return pd.Series('', index=titles.index, dtype=object)
+    # 非字符串的值经过str方法后为NaN，最后统一填成空字符串
+    return titles.str.replace(CLEAN_PATTERN, ' ', regex=True).str.strip().fillna('')
+
+def normalize_title(title):
+    """归一化单个标题，结果与normalize_titles相同"""
+    if not isinstance(title, str):
+        return ''
+    title = unicodedata.normalize('NFKC', title).casefold()
+    return WHITESPACE_PATTERN.sub(' ', PUNCTUATION_PATTERN.sub(' ', title)).strip()
+
+def normalize_titles(titles):
+    """向量化归一化一列标题，结果与逐行调用normalize_title相同"""
+    return (
+        titles.fillna('').astype(str)
+        .str.normalize('NFKC')
+        .str.casefold()
+        .str.replace(PUNCTUATION_PATTERN, ' ', regex=True)
+        .str.replace(WHITESPACE_PATTERN, ' ', regex=True)
+        .str.strip()
+    )
+
+def expand_inputs(patterns, output_file):
+    """展开输入文件的glob模式，去掉重复文件和输出文件本身"""
+    files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) or ([pattern] if os.path.exists(pattern) else [])
+        if not matches:
+            print(f"警告: 没有匹配 {pattern} 的文件")
+        for path in matches:
+            if os.path.abspath(path) == os.path.abspath(output_file):
+                print(f"跳过输出文件 {path}")
+            elif path not in files:
+                files.append(path)
+    return files
+
+def default_output(files):
+    """单个输入文件时输出到同名、同格式的_cleaned文件，多个文件时合并到data/cleaned_papers.csv"""
+    if len(files) == 1:
+        stem, suffix = os.path.splitext(files[0])
+        return stem + '_cleaned' + (suffix if table_format(files[0]) != 'csv' else '.csv')
+    return 'data/cleaned_papers.csv'
+
+def iter_chunks(input_file, chunk_size):
+    """分块读取输入文件，CSV文件处理潜在的解析错误"""
+    if table_format(input_file) != 'csv':
+        yield from iter_table(input_file, chunk_size=chunk_size)
         return
-        
-    # 读取数据，处理潜在的解析错误
+    done = 0
     try:
-        df = pd.read_csv(input_file, on_bad_lines='skip')
-        print(f"读取了 {len(df)} 篇论文")
+        for df in pd.read_csv(input_file, on_bad_lines='skip', chunksize=chunk_size, dtype=str):
+            done += len(df)
+            yield df
     except Exception as e:
         print(f"读取CSV文件时出错: {e}")
-        try:
-            # 尝试另一种方式读取
-            df = pd.read_csv(input_file, engine='python')
-            print(f"使用Python引擎读取了 {len(df)} 篇论文")
-        except Exception as e:
-            print(f"使用Python引擎读取失败: {e}")
-            return
-    
-    # 显示一些原始数据样例
+        # 尝试另一种方式读取，跳过已经交出的行
+        print(f"尝试使用Python引擎从第 {done + 1} 篇论文继续读取...")
+        for df in pd.read_csv(input_file, engine='python', on_bad_lines='skip', chunksize=chunk_size, dtype=str):
+            if done >= len(df):
+                done -= len(df)
+                continue
+            yield df.iloc[done:]
+            done = 0
+
+def find_title_column(df):
+    """检查并处理列名，返回标题列名，找不到时返回None"""
+    if 'title' in df.columns:
+        return 'title'
+    print("错误: 未找到标题列。现有列:", df.columns.tolist())
+    # 尝试找到可能的标题列
+    possible_title_cols = [col for col in df.columns if 'title' in col.lower() and col != 'clean_title']
+    if possible_title_cols:
+        print(f"使用 {possible_title_cols[0]} 作为标题列")
+        return possible_title_cols[0]
+    return None
+
+def show_samples(df):
+    """显示原始数据和清洗前后的标题样例"""
     print("\n原始数据样例:")
     for i, row in df.head(3).iterrows():
-        title = row.get('title', 'N/A')
-        print(f"{i+1}. 标题: {title}")
+        print(f"{i+1}. 标题: {row.get('title', 'N/A')}")
         print(f"   作者: {row.get('authors', 'N/A')}")
         print(f"   摘要: {str(row.get('abstract', 'N/A'))[:100]}...\n")
     
-    # 检查并处理列名
-    if 'title' not in df.columns:
-        print("错误: 未找到标题列。现有列:", df.columns.tolist())
-        # 尝试找到可能的标题列
-        possible_title_cols = [col for col in df.columns if 'title' in col.lower()]
-        if possible_title_cols:
-            print(f"使用 {possible_title_cols[0]} 作为标题列")
-            df.rename(columns={possible_title_cols[0]: 'title'}, inplace=True)
-        else:
-            return
-    
-    # 清洗标题
-    print("开始清洗标题...")
-    df['clean_title'] = df['title'].apply(clean_title)
-    
-    # 显示清洗后的几个标题样例
     print("\n清洗前后的标题样例:")
     for i, (original, cleaned) in enumerate(zip(df['title'].head(5), df['clean_title'].head(5))):
         print(f"{i+1}. 原标题: {original}")
         print(f"   清洗后: {cleaned}")
         print("-" * 50)
+
+def clean_files(files, output_file, chunk_size=CHUNK_SIZE, show_sample=True):
+    """逐块清洗所有输入文件并追加写入output_file，内存占用只取决于chunk_size，返回统计信息"""
+    stats = {'total': 0, 'empty_before': 0, 'empty_after': 0}
+    with TableWriter(output_file) as out:
+        for input_file in files:
+            print(f"清洗 {input_file}")
+            rows_before = stats['total']
+            title_column = None
+            try:
+                for df in iter_chunks(input_file, chunk_size):
+                    if title_column is None:
+                        title_column = find_title_column(df)
+                        if title_column is None:
+                            break
+                    if title_column != 'title':
+                        df = df.rename(columns={title_column: 'title'})
+                    
+                    df['clean_title'] = clean_titles(df['title'])
+                    
+                    stats['total'] += len(df)
+                    stats['empty_before'] += int(df['title'].isna().sum() + (df['title'] == '').sum())
+                    stats['empty_after'] += int((df['clean_title'] == '').sum())
+                    
+                    if out.columns is None and show_sample:
+                        show_samples(df)
+                    # 后续的块和文件按第一个块的列输出
+                    out.write(df)
+            except Exception as e:
+                print(f"清洗 {input_file} 失败: {e}")
+            print(f"  {input_file}: {stats['total'] - rows_before} 篇论文")
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='清洗论文标题')
+    parser.add_argument('--input', type=str, nargs='+', default=['data/neurips_papers_1.csv'],
+                        help='输入CSV文件，可以是多个文件或glob模式，如"data/neurips_papers_*.csv"')
+    parser.add_argument('--output_file', type=str, default='',
+                        help='输出文件，默认单个输入时为<输入>_cleaned.csv，多个输入时为data/cleaned_papers.csv；扩展名为.parquet或.arrow时输出列式格式')
+    parser.add_argument('--chunk_size', type=int, default=CHUNK_SIZE,
+                        help='每次读入和写出的行数')
+    args = parser.parse_args(argv)
+    
+    # 检查数据目录
+    if not os.path.exists('data'):
+        print("错误: 未找到数据目录。请先运行step1_fetch_papers.py")
+        return
+    
+    files = expand_inputs(args.input, args.output_file or '')
+    if not files:
+        print(f"错误: 未找到文件 {' '.join(args.input)}")
+        return
+    output_file = args.output_file or default_output(files)
+    
+    # 清洗标题
+    print("开始清洗标题...")
+    start = time.time()
+    stats = clean_files(files, output_file, args.chunk_size)
+    elapsed = time.time() - start
     
     # 显示处理统计信息
     print("\n处理统计:")
-    total = len(df)
-    empty_before = df['title'].isna().sum() + (df['title'] == '').sum()
-    empty_after = df['clean_title'].isna().sum() + (df['clean_title'] == '').sum()
-    print(f"总论文数: {total}")
-    print(f"清洗前空标题数: {empty_before}")
-    print(f"清洗后空标题数: {empty_after}")
+    print(f"输入文件数: {len(files)}")
+    print(f"总论文数: {stats['total']}")
+    print(f"清洗前空标题数: {stats['empty_before']}")
+    print(f"清洗后空标题数: {stats['empty_after']}")
+    print(f"用时 {elapsed:.1f} 秒")
     
-    # 保存清洗后的数据
-    # output_file = 'data/cleaned_papers.csv'
-    output_file = 'data/neurips_papers_1_cleaned.csv'
-    df.to_csv(output_file, index=False, encoding='utf-8-sig')
     print(f"\n清洗后的数据已保存到 {output_file}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -4,29 +4,100 @@ import json
 import time
 import os
 import argparse
+import asyncio
+import hashlib
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
+from rate_limiter import TokenBucketLimiter
+from deepseek_cache import ResponseCache, make_cache_key
+from retry_policy import RETRYABLE_STATUS, CircuitBreaker, CircuitOpenError, RetryPolicy, parse_retry_after
+from table_io import read_table, write_table_atomic
+from api_metrics import ApiMetrics
+from budget_scheduler import Budget, order_by_priority, PRICE_INPUT_PER_M, PRICE_OUTPUT_PER_M, PRICE_CACHED_INPUT_PER_M
+from embedding_prefilter import DEFAULT_KEYWORDS
+from work_queue import WorkQueue, LeaseKeeper, worker_name, LEASE_SECONDS
 
-def call_deepseek_api(api_key, input_text, max_tokens=2048):
-    """调用DeepSeek API进行文本分析"""
+API_URL = "https://api.deepseek.com/v1/chat/completions"  # 请根据实际API端点调整
+MODEL_NAME = "deepseek-chat"  # 或其他适用的DeepSeek模型
+TEMPERATURE = 0.1  # 低温度使输出更确定性
+MAX_TOKENS = 2048
+
+# 请求的(连接, 读取)超时秒数、重试策略和熔断器，可在命令行中调整
+REQUEST_TIMEOUT = (10, 120)
+RETRY_POLICY = RetryPolicy()
+CIRCUIT_BREAKER = CircuitBreaker()
+# 调用指标（延迟、令牌用量、重试、错误分类），main中按命令行参数替换为写出追踪文件的实例
+METRICS = ApiMetrics()
+
+# 批量模式下每篇论文预留的补全令牌数，以及DeepSeek单次输出的上限
+BATCH_TOKENS_PER_PAPER = 300
+MAX_OUTPUT_TOKENS = 8192
+
+# 每次回答只有两句话，按此估计补全消耗的令牌数，用于TPM限速
+COMPLETION_TOKEN_ESTIMATE = 200
+QUEUE_NAME = 'analyze'
+QUEUE_POLL_SECONDS = 10  # 剩余任务都被其他工作进程持有时的等待间隔
+
+SYSTEM_PROMPT = """你是一个学术论文分析助手。你需要完成两个任务：
+                1. 用一句话概述论文的主要内容和贡献
+                2. 用一句话分析论文与以下研究方向的相关性：替换成你的方向
+                   (关键词：替换成你的关键词)
+                
+                请按以下格式输出：
+                概述：[一句话论文概述]
+                相关性：[一句话相关性分析，包含相关性程度（高/中/低）和具体原因]
+                """
+
+class DeepSeekAPIError(Exception):
+    """DeepSeek API调用在重试后仍然失败"""
+    
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+class BudgetExhaustedError(DeepSeekAPIError):
+    """预算用尽，请求没有发出，论文应记为预算跳过而不是失败"""
+    
+    def __init__(self, reason):
+        super().__init__(reason, retryable=False)
+
+def classify_error(error):
+    """把请求异常归类为指标中的错误分类"""
+    if isinstance(error, requests.exceptions.Timeout):
+        return 'timeout'
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return 'connection'
+    if isinstance(error, requests.exceptions.RequestException):
+        return 'request_error'
+    return 'bad_response'
+
+def call_deepseek_api(api_key, input_text, max_tokens=None, cache=None, system_prompt=SYSTEM_PROMPT, budget=None):
+    """调用DeepSeek API进行文本分析，提供cache时优先从缓存读取；max_tokens默认为MAX_TOKENS
+    
+    提供budget时每次HTTP请求（包括重试）发出前预留预算，预算用尽时抛出BudgetExhaustedError。
+    """
+    if max_tokens is None:
+        max_tokens = MAX_TOKENS
+    cache_key = None
+    if cache is not None:
+        cache_key = make_cache_key(MODEL_NAME, system_prompt, input_text, TEMPERATURE, max_tokens)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            METRICS.observe_cache_hit()
+            return cached
+    
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json"
     }
     
     payload = {
-        "model": "deepseek-chat",  # 或其他适用的DeepSeek模型
+        "model": MODEL_NAME,
         "messages": [
             {
                 "role": "system", 
-                "content": """你是一个学术论文分析助手。你需要完成两个任务：
-                1. 用一句话概述论文的主要内容和贡献
-                2. 用一句话分析论文与以下研究方向的相关性：替换成你的方向
-                   (关键词：替换成你的关键词)
-                
-                请按以下格式输出：
-                概述：[一句话论文概述]
-                相关性：[一句话相关性分析，包含相关性程度（高/中/低）和具体原因]
-                """
+                "content": system_prompt
             },
             {
                 "role": "user",
@@ -34,32 +105,117 @@ def call_deepseek_api(api_key, input_text, max_tokens=2048):
             }
         ],
         "max_tokens": max_tokens,
-        "temperature": 0.1  # 低温度使输出更确定性
+        "temperature": TEMPERATURE
     }
     
-    try:
-        response = requests.post(
-            "https://api.deepseek.com/v1/chat/completions",  # 请根据实际API端点调整
-            headers=headers,
-            json=payload
-        )
-        response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"]
-    except Exception as e:
-        print(f"API调用出错: {e}")
-        return f"分析失败: {str(e)}"
+    last_error = None
+    for attempt in range(RETRY_POLICY.max_retries + 1):
+        # 按最坏情况（补全用满max_tokens）预留，响应后按实际usage结算
+        reservation = None
+        if budget is not None:
+            reservation = budget.reserve(estimate_tokens(system_prompt) + estimate_tokens(input_text), max_tokens)
+            if reservation is None:
+                raise BudgetExhaustedError(budget.exhausted)
+        
+        # 熔断期间直接失败，不再向API发送请求
+        try:
+            CIRCUIT_BREAKER.before_call()
+        except CircuitOpenError as e:
+            METRICS.observe_rejected('circuit_open', attempt=attempt)
+            if reservation is not None:
+                budget.release(reservation)
+            raise DeepSeekAPIError(str(e)) from e
+        
+        retry_after = None
+        status = None
+        start = time.monotonic()
+        try:
+            response = requests.post(
+                API_URL,
+                headers=headers,
+                json=payload,
+                timeout=REQUEST_TIMEOUT
+            )
+            status = response.status_code
+            if response.status_code in RETRYABLE_STATUS:
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                raise DeepSeekAPIError(f"HTTP {response.status_code}")
+            if response.status_code >= 400:
+                # 其他4xx错误（如密钥无效、请求格式错误）重试也不会成功
+                CIRCUIT_BREAKER.record_success()
+                METRICS.observe_request(time.monotonic() - start, f"http_{status}", status, max_tokens=max_tokens, attempt=attempt)
+                raise DeepSeekAPIError(f"HTTP {response.status_code}: {response.text[:200]}", retryable=False)
+            body = response.json()
+            choice = body["choices"][0]
+            content = choice["message"]["content"]
+        except DeepSeekAPIError as e:
+            # HTTP错误响应不计费，退还预留
+            if reservation is not None:
+                budget.release(reservation)
+            if not e.retryable:
+                raise
+            last_error = e
+            METRICS.observe_request(time.monotonic() - start, f"http_{status}", status, max_tokens=max_tokens, attempt=attempt)
+        except (requests.exceptions.RequestException, ValueError, KeyError, IndexError) as e:
+            last_error = e
+            # 超时或响应无法解析时请求可能已经计费，保留预留的估计值
+            if reservation is not None:
+                budget.settle(reservation)
+            METRICS.observe_request(time.monotonic() - start, classify_error(e), status, max_tokens=max_tokens, attempt=attempt)
+        else:
+            METRICS.observe_request(time.monotonic() - start, 'ok', status, body.get("usage"),
+                                    choice.get("finish_reason"), max_tokens, attempt)
+            # 响应中没有usage时保留预留的估计值
+            if reservation is not None:
+                budget.settle(reservation, body.get("usage"))
+            CIRCUIT_BREAKER.record_success()
+            # 只缓存成功的响应
+            if cache is not None:
+                cache.set(cache_key, content)
+            return content
+        
+        CIRCUIT_BREAKER.record_failure()
+        if attempt < RETRY_POLICY.max_retries:
+            delay = RETRY_POLICY.backoff(attempt, retry_after)
+            print(f"API调用出错: {last_error}，{delay:.1f}秒后进行第{attempt + 1}次重试")
+            METRICS.observe_retry()
+            time.sleep(delay)
+    
+    raise DeepSeekAPIError(f"重试{RETRY_POLICY.max_retries}次后仍然失败: {last_error}")
 
-def analyze_paper(api_key, title, abstract, authors=None):
-    """分析单篇论文，生成概述和相关性评估"""
-    # 构建输入文本
+BATCH_SYSTEM_PROMPT = """你是一个学术论文分析助手。用户会给出多篇带编号的论文，对每一篇论文你需要完成两个任务：
+                1. 用一句话概述论文的主要内容和贡献
+                2. 用一句话分析论文与以下研究方向的相关性：替换成你的方向
+                   (关键词：替换成你的关键词)
+                
+                请只输出一个JSON数组，每篇论文对应一个元素，不要输出其他内容：
+                [{"index": 论文编号, "overview": "一句话论文概述", "relevance": "一句话相关性分析，包含相关性程度（高/中/低）和具体原因"}]
+                """
+
+def build_input_text(title, abstract, authors=None):
+    """构建单篇论文的输入文本"""
     input_text = f"论文标题: {title}\n\n"
     if authors:
         input_text += f"作者: {authors}\n\n"
     input_text += f"摘要: {abstract}\n\n"
     input_text += "请分析这篇论文的主要内容和它与音频预训练模型、数据筛选相关研究的相关性。"
+    return input_text
+
+def estimate_tokens(text):
+    """粗略估计文本的令牌数（中英文混合，约每2个字符1个令牌）"""
+    return len(text) // 2 + 1
+
+def estimate_request_tokens(input_text, system_prompt=SYSTEM_PROMPT, paper_count=1):
+    """估计一次API请求消耗的总令牌数（系统提示 + 输入 + 预计补全）"""
+    return estimate_tokens(system_prompt) + estimate_tokens(input_text) + COMPLETION_TOKEN_ESTIMATE * paper_count
+
+def analyze_paper(api_key, title, abstract, authors=None, cache=None, budget=None):
+    """分析单篇论文，生成概述和相关性评估"""
+    # 构建输入文本
+    input_text = build_input_text(title, abstract, authors)
     
     # 调用API
-    result = call_deepseek_api(api_key, input_text)
+    result = call_deepseek_api(api_key, input_text, cache=cache, budget=budget)
     
     # 解析结果
     try:
@@ -97,17 +253,361 @@ def analyze_paper(api_key, title, abstract, authors=None):
             "relevance": "解析失败"
         }
 
-def main():
+def build_batch_input_text(papers):
+    """把多篇论文打包成一个带编号的输入文本，编号从0开始"""
+    parts = []
+    for idx, paper in enumerate(papers):
+        text = f"[论文 {idx}]\n论文标题: {paper['clean_title']}\n"
+        if paper['authors']:
+            text += f"作者: {paper['authors']}\n"
+        text += f"摘要: {paper['abstract']}\n"
+        parts.append(text)
+    parts.append(f"请分析以上{len(papers)}篇论文的主要内容和它们与音频预训练模型、数据筛选相关研究的相关性。")
+    return "\n".join(parts)
+
+def batch_max_tokens(paper_count):
+    """批量请求的max_tokens，随论文数增长但不超过输出上限"""
+    return min(MAX_OUTPUT_TOKENS, BATCH_TOKENS_PER_PAPER * paper_count + 256)
+
+def parse_batch_result(result, paper_count):
+    """解析批量请求返回的JSON数组，返回 {编号: 分析结果}，只保留校验通过的条目"""
+    text = result.strip()
+    # 去掉模型可能附带的```json代码块标记
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        text = text.rsplit("```", 1)[0]
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        items = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return {}
+    
+    parsed = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        idx = item.get("index")
+        overview = item.get("overview")
+        relevance = item.get("relevance")
+        if isinstance(idx, str) and idx.strip().isdigit():
+            idx = int(idx)
+        if not isinstance(idx, int) or isinstance(idx, bool) or not 0 <= idx < paper_count:
+            continue
+        if not isinstance(overview, str) or not overview.strip():
+            continue
+        if not isinstance(relevance, str) or not relevance.strip():
+            continue
+        parsed[idx] = {"overview": overview.strip(), "relevance": relevance.strip()}
+    return parsed
+
+def analyze_batch(api_key, papers, cache=None, budget=None):
+    """一次请求分析多篇论文，校验失败的论文单独重新分析，返回与输入顺序一致的结果列表
+    
+    API调用最终失败的论文在结果列表中对应的是DeepSeekAPIError对象（预算用尽时为BudgetExhaustedError）。
+    """
+    input_text = build_batch_input_text(papers)
+    try:
+        result = call_deepseek_api(
+            api_key, input_text, max_tokens=batch_max_tokens(len(papers)),
+            cache=cache, system_prompt=BATCH_SYSTEM_PROMPT, budget=budget
+        )
+    except DeepSeekAPIError as e:
+        print(f"批量分析失败: {e}")
+        return [e] * len(papers)
+    parsed = parse_batch_result(result, len(papers))
+    
+    analyses = []
+    for idx, paper in enumerate(papers):
+        if idx in parsed:
+            analysis = parsed[idx]
+            print(f"paper:{paper['clean_title']},overview:{analysis['overview']},relevance:{analysis['relevance']}")
+        else:
+            print(f"批量结果中论文 {idx} 缺失或格式不正确，单独重新分析: {str(paper['clean_title'])[:50]}...")
+            try:
+                analysis = analyze_paper(api_key, paper['clean_title'], paper['abstract'], paper['authors'], cache, budget)
+            except DeepSeekAPIError as e:
+                print(f"论文分析失败: {e}")
+                analysis = e
+        analyses.append(analysis)
+    return analyses
+
+async def analyze_papers_async(api_key, papers, concurrency=1, limiter=None, cache=None, batch_size=1,
+                               on_result=None, on_failure=None, budget=None, on_skip=None):
+    """并发分析论文，最多同时有concurrency个请求在途，返回与输入顺序一致的结果列表
+    
+    batch_size大于1时，每个请求打包batch_size篇论文。
+    每完成一批论文都会调用 on_result(论文列表, 分析结果列表)，用于增量保存；
+    重试后仍然失败的论文调用 on_failure(论文, 错误)，在结果列表中对应None。
+    提供budget时请求按论文顺序发出，每次HTTP请求（包括重试和批量解析失败后的单篇重新分析）都预留预算，
+    预算用尽后剩余论文调用 on_skip(论文, 原因)，在结果列表中对应None。
+    """
+    batch_size = max(1, batch_size)
+    batches = [papers[i:i + batch_size] for i in range(0, len(papers), batch_size)]
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    loop = asyncio.get_running_loop()
+    progress = tqdm(total=len(papers), desc="分析论文")
+    
+    async def analyze_one(executor, batch_idx, batch):
+        async with semaphore:
+            if len(batch) == 1:
+                input_text = build_input_text(batch[0]['clean_title'], batch[0]['abstract'], batch[0]['authors'])
+                system_prompt, max_tokens = SYSTEM_PROMPT, MAX_TOKENS
+            else:
+                input_text = build_batch_input_text(batch)
+                system_prompt, max_tokens = BATCH_SYSTEM_PROMPT, batch_max_tokens(len(batch))
+            # 缓存命中的请求不会发出，无需占用限速配额
+            cached = cache is not None and cache.contains(
+                make_cache_key(MODEL_NAME, system_prompt, input_text, TEMPERATURE, max_tokens)
+            )
+            # 缓存命中的论文不花钱，不受预算限制；预算在call_deepseek_api中每次发出请求前预留
+            allowed = budget is None or cached or budget.exhausted is None
+            if limiter is not None and not cached and allowed:
+                await limiter.acquire(estimate_request_tokens(input_text, system_prompt, len(batch)))
+            if not allowed:
+                for paper in batch:
+                    if on_skip is not None:
+                        on_skip(paper, budget.exhausted)
+                progress.update(len(batch))
+                return [None] * len(batch)
+            first = batch_idx * batch_size
+            span = f"{first+1}" if len(batch) == 1 else f"{first+1}-{first+len(batch)}"
+            print(f"\n处理论文 {span}/{len(papers)}: {str(batch[0]['clean_title'])[:50]}...")
+            # requests是阻塞调用，放到线程池中执行
+            if len(batch) == 1:
+                try:
+                    analyses = [await loop.run_in_executor(
+                        executor, analyze_paper,
+                        api_key, batch[0]['clean_title'], batch[0]['abstract'], batch[0]['authors'], cache, budget
+                    )]
+                except DeepSeekAPIError as e:
+                    print(f"论文分析失败: {e}")
+                    analyses = [e]
+            else:
+                analyses = await loop.run_in_executor(executor, analyze_batch, api_key, batch, cache, budget)
+            
+            succeeded = [(paper, analysis) for paper, analysis in zip(batch, analyses)
+                         if not isinstance(analysis, DeepSeekAPIError)]
+            if on_result is not None and succeeded:
+                on_result([paper for paper, _ in succeeded], [analysis for _, analysis in succeeded])
+            for paper, analysis in zip(batch, analyses):
+                if isinstance(analysis, BudgetExhaustedError):
+                    # 重试或单篇重新分析时预算用尽，按预算跳过处理，之后可用--resume继续
+                    if on_skip is not None:
+                        on_skip(paper, str(analysis))
+                elif isinstance(analysis, DeepSeekAPIError) and on_failure is not None:
+                    on_failure(paper, analysis)
+            progress.update(len(batch))
+            return [None if isinstance(analysis, DeepSeekAPIError) else analysis for analysis in analyses]
+    
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            batch_results = await asyncio.gather(
+                *(analyze_one(executor, i, batch) for i, batch in enumerate(batches))
+            )
+    finally:
+        progress.close()
+    return [analysis for analyses in batch_results for analysis in analyses]
+
+def paper_key(paper):
+    """论文在日志中的唯一键，由原始标题和摘要决定"""
+    payload = json.dumps([str(paper['title']), str(paper['abstract'])], ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def paper_columns(paper):
+    """结果文件中的论文信息列"""
+    return {col: paper[col] for col in ('title', 'clean_title', 'authors', 'abstract')}
+
+def load_journal(journal_file):
+    """读取分析日志，返回 {论文键: 结果行}，忽略崩溃时写了一半的最后一行"""
+    records = {}
+    if not os.path.exists(journal_file):
+        return records
+    with open(journal_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"跳过日志中不完整的记录: {line[:50]}...")
+                continue
+            records[record['key']] = record['row']
+    return records
+
+def load_dead_letters(dead_letter_file):
+    """读取失败论文文件，返回 {论文键: 论文信息}"""
+    papers = {}
+    if not os.path.exists(dead_letter_file):
+        return papers
+    with open(dead_letter_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            papers[record['key']] = record['paper']
+    return papers
+
+def commit_dead_letters(tmp_file, dead_letter_file, replace):
+    """把本次运行的失败记录写入失败论文文件：replace时替换原文件，否则追加（读取时按论文键去重，后写的为准）"""
+    if replace:
+        os.replace(tmp_file, dead_letter_file)
+        return
+    with open(tmp_file, 'r', encoding='utf-8') as src, open(dead_letter_file, 'a', encoding='utf-8') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(tmp_file)
+
+def result_row(paper, analysis):
+    """结果文件中的一行：论文信息加分析结果"""
+    return dict(paper_columns(paper), overview=analysis['overview'], relevance=analysis['relevance'])
+
+async def analyze_from_queue(work_queue, worker, api_key, papers, priorities, concurrency=1, limiter=None,
+                             cache=None, batch_size=1, budget=None, on_skip=None):
+    """队列模式：论文放入共享工作队列，循环认领一批并发分析，直到队列清空或预算用尽
+
+    可以在多个进程或多台机器上同时运行，每篇论文只会被一个工作进程分析，返回队列中全部已完成的 {论文键: 结果行}。
+    """
+    added = await asyncio.to_thread(work_queue.enqueue, QUEUE_NAME, [
+        (paper_key(paper), paper, priorities.get(paper_key(paper), 0)) for paper in papers
+    ])
+    print(f"入队 {added} 篇新论文，工作进程 {worker} 开始处理，队列状态: {work_queue.counts(QUEUE_NAME)}")
+    # 每次认领够所有并发请求用两轮的论文，认领太多会让其他工作进程无事可做
+    claim_size = max(1, concurrency) * max(1, batch_size) * 2
+    processed = 0
+    
+    def completed(batch, analyses):
+        nonlocal processed
+        for paper, analysis in zip(batch, analyses):
+            if work_queue.complete(QUEUE_NAME, worker, paper_key(paper), result_row(paper, analysis)):
+                processed += 1
+            else:
+                print(f"租约已被其他工作进程接手，丢弃结果: {str(paper['clean_title'])[:50]}...")
+    
+    def failed(paper, error):
+        # 未达到最大尝试次数时放回队列，稍后由任意工作进程重试
+        work_queue.fail(QUEUE_NAME, worker, paper_key(paper), error)
+    
+    def skipped(paper, reason):
+        # 预算用尽，放弃租约，留给其他工作进程或下次运行
+        work_queue.release(QUEUE_NAME, worker, [paper_key(paper)])
+        if on_skip is not None:
+            on_skip(paper, reason)
+    
+    with LeaseKeeper(work_queue, QUEUE_NAME, worker) as keeper:
+        while budget is None or budget.exhausted is None:
+            tasks = await asyncio.to_thread(work_queue.claim, QUEUE_NAME, worker, claim_size)
+            if not tasks:
+                remaining = work_queue.unfinished(QUEUE_NAME)
+                if not remaining:
+                    break
+                print(f"还有 {remaining} 篇论文正由其他工作进程分析，{QUEUE_POLL_SECONDS}秒后再检查")
+                await asyncio.sleep(QUEUE_POLL_SECONDS)
+                continue
+            keys = [key for key, _ in tasks]
+            keeper.hold(keys)
+            try:
+                await analyze_papers_async(api_key, [paper for _, paper in tasks], concurrency, limiter, cache,
+                                           batch_size, completed, failed, budget, skipped)
+            except BaseException:
+                # 中断时放弃未完成的租约，其他工作进程可以立即接手
+                work_queue.release(QUEUE_NAME, worker, keys)
+                raise
+            finally:
+                keeper.drop(keys)
+            print(f"本进程已完成 {processed} 篇，队列状态: {work_queue.counts(QUEUE_NAME)}")
+    return work_queue.results(QUEUE_NAME)
+
+def main(argv=None):
+    global REQUEST_TIMEOUT, RETRY_POLICY, CIRCUIT_BREAKER, MAX_TOKENS, METRICS
     parser = argparse.ArgumentParser(description='使用DeepSeek分析论文数据')
     parser.add_argument('--api_key', type=str, help='DeepSeek API密钥')
     parser.add_argument('--input_file', type=str, default='data/cleaned/neurips_papers_1_cleaned.csv', 
-                       help='输入CSV文件路径')
+                       help='输入文件路径（CSV、Parquet或Arrow，按扩展名识别）')
     parser.add_argument('--output_file', type=str, default='data/papers_1_analyzed.csv',
-                       help='输出CSV文件路径')
+                       help='输出文件路径，扩展名为.parquet或.arrow时输出列式格式')
     parser.add_argument('--sample', type=int, default=0,
                        help='只处理指定数量的论文样本，0表示处理全部')
+    parser.add_argument('--concurrency', type=int, default=1,
+                       help='同时在途的API请求数')
+    parser.add_argument('--rpm', type=int, default=60,
+                       help='每分钟最多发送的请求数，0表示不限制')
+    parser.add_argument('--tpm', type=int, default=0,
+                       help='每分钟最多消耗的令牌数（估计值），0表示不限制')
+    parser.add_argument('--batch_size', type=int, default=1,
+                       help='每个请求打包分析的论文数，大于1时启用批量模式')
+    parser.add_argument('--journal_file', type=str, default='',
+                       help='逐篇追加写入分析结果的日志文件，默认为输出文件名加_journal.jsonl')
+    parser.add_argument('--resume', action='store_true',
+                       help='从日志继续上次中断的分析，跳过已完成的论文')
+    parser.add_argument('--cache_file', type=str, default='data/deepseek_cache.sqlite',
+                       help='DeepSeek响应缓存文件路径')
+    parser.add_argument('--no_cache', action='store_true',
+                       help='不使用响应缓存')
+    parser.add_argument('--cache_max_mb', type=float, default=0,
+                       help='缓存最大容量(MB)，超出后淘汰最久未访问的条目，0表示不限制')
+    parser.add_argument('--cache_max_age_days', type=float, default=0,
+                       help='缓存条目的最长保留天数，0表示不过期')
+    parser.add_argument('--timeout', type=float, default=120,
+                       help='单次API请求的读取超时秒数')
+    parser.add_argument('--max_retries', type=int, default=5,
+                       help='API请求失败（超时、429、5xx）后的最大重试次数')
+    parser.add_argument('--circuit_threshold', type=int, default=5,
+                       help='连续失败多少次后熔断，0表示不熔断')
+    parser.add_argument('--circuit_reset', type=float, default=60,
+                       help='熔断持续的秒数')
+    parser.add_argument('--dead_letter_file', type=str, default='',
+                       help='重试后仍然失败的论文记录文件，默认为输出文件名加_failed.jsonl')
+    parser.add_argument('--retry_failed', '--retry-failed', action='store_true',
+                       help='只重新分析失败论文记录文件中的论文')
+    parser.add_argument('--prefilter_top_k', type=int, default=0,
+                       help='本地向量预筛选：只分析与研究方向最相似的K篇论文，0表示不按数量筛选')
+    parser.add_argument('--prefilter_threshold', type=float, default=None,
+                       help='本地向量预筛选：只分析与研究方向余弦相似度不低于该值的论文')
+    parser.add_argument('--prefilter_model', type=str, default='sentence-transformers/all-MiniLM-L6-v2',
+                       help='预筛选使用的句向量模型')
+    parser.add_argument('--keywords', type=str, nargs='+', default=None,
+                       help='预筛选使用的研究方向关键词，默认使用embedding_prefilter.DEFAULT_KEYWORDS')
+    parser.add_argument('--embedding_cache_file', type=str, default='data/embedding_cache.sqlite',
+                       help='论文向量缓存文件')
+    parser.add_argument('--prioritize', action='store_true',
+                       help='按优先级（关键词命中、预筛选相似度、Oral/Spotlight分组）从高到低分析；设置了预算时自动启用')
+    parser.add_argument('--token_budget', type=int, default=0,
+                       help='本次运行最多消耗的令牌数（估计值），0表示不限制')
+    parser.add_argument('--cost_budget', type=float, default=0,
+                       help='本次运行的费用上限（美元，按估计令牌数和单价计算），0表示不限制')
+    parser.add_argument('--time_budget', type=float, default=0,
+                       help='本次运行的时间上限（分钟），到时后不再发出新请求，0表示不限制')
+    parser.add_argument('--price_input', type=float, default=PRICE_INPUT_PER_M,
+                       help='输入令牌单价（美元/百万令牌）')
+    parser.add_argument('--price_output', type=float, default=PRICE_OUTPUT_PER_M,
+                       help='输出令牌单价（美元/百万令牌）')
+    parser.add_argument('--max_tokens', type=int, default=MAX_TOKENS,
+                       help='单篇分析的最大补全令牌数，可参考运行结束时打印的补全令牌分布调整')
+    parser.add_argument('--trace_file', type=str, default='',
+                       help='逐次记录API请求延迟和令牌用量的JSONL文件，默认为输出文件名加_api_trace.jsonl')
+    parser.add_argument('--metrics_file', type=str, default='data/deepseek_metrics.prom',
+                       help='Prometheus textfile格式的指标文件，为空时不写出')
+    parser.add_argument('--queue_file', type=str, default='',
+                       help='共享工作队列文件，设置后以队列模式运行，可同时启动多个进程或在多台机器上运行')
+    parser.add_argument('--worker_id', type=str, default='',
+                       help='队列模式下的工作进程标识，默认为主机名:进程号')
+    parser.add_argument('--lease_seconds', type=float, default=LEASE_SECONDS,
+                       help='队列模式下认领任务的租约秒数，进程崩溃后超过该时间任务会被其他进程接手')
+    parser.add_argument('--queue_journal_mode', choices=['wal', 'delete'], default='wal',
+                       help='队列库的日志模式：同一台机器用wal，多台机器通过NFS等共享时用delete')
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    
+    MAX_TOKENS = args.max_tokens
+    REQUEST_TIMEOUT = (10, args.timeout)
+    RETRY_POLICY = RetryPolicy(max_retries=args.max_retries)
+    CIRCUIT_BREAKER = CircuitBreaker(failure_threshold=args.circuit_threshold, reset_timeout=args.circuit_reset)
     
     # 如果未通过命令行提供API密钥，则尝试从环境变量获取
     api_key = args.api_key or os.environ.get('DEEPSEEK_API_KEY')
@@ -117,52 +617,219 @@ def main():
     # 确保输出目录存在
     os.makedirs(os.path.dirname(args.output_file), exist_ok=True)
     
+    budget = Budget(max_tokens=args.token_budget, max_cost=args.cost_budget, max_seconds=args.time_budget * 60,
+                    price_input=args.price_input, price_output=args.price_output, price_cached=PRICE_CACHED_INPUT_PER_M)
+    prioritize = args.prioritize or budget.enabled
+    
     # 读取CSV文件
     try:
-        df = pd.read_csv(args.input_file)
+        # 只读取分析需要的列
+        df = read_table(args.input_file, columns=['title', 'clean_title', 'authors', 'abstract', 'group'])
         print(f"成功读取{len(df)}篇论文数据")
         
-        # 如果指定了样本数量，则只处理部分数据
-        if args.sample > 0:
+        # 如果指定了样本数量，则只处理部分数据（按优先级调度时改为取优先级最高的论文）
+        if args.sample > 0 and not prioritize:
             df = df.sample(min(args.sample, len(df)))
             print(f"随机抽样{len(df)}篇论文进行分析")
     except Exception as e:
         print(f"读取CSV文件失败: {e}")
         return
     
-    # 分析论文
-    results = []
-    for i, row in tqdm(df.iterrows(), total=len(df), desc="分析论文"):
+    # 整理待分析的论文
+    papers = []
+    for _, row in df.iterrows():
         title = row.get('title', '')
-        clean_title = row.get('clean_title', title)  # 优先使用清洗后的标题
-        abstract = row.get('abstract', '')
-        authors = row.get('authors', '')
-        
-        print(f"\n处理论文 {i+1}/{len(df)}: {clean_title[:50]}...")
-        
-        # 调用API分析
-        analysis = analyze_paper(api_key, clean_title, abstract, authors)
-        
-        # 添加到结果
-        result_row = {
+        papers.append({
             'title': title,
-            'clean_title': clean_title,
-            'authors': authors,
-            'abstract': abstract,
-            'overview': analysis['overview'],
-            'relevance': analysis['relevance']
-        }
-        results.append(result_row)
+            'clean_title': row.get('clean_title', title),  # 优先使用清洗后的标题
+            'authors': row.get('authors', ''),
+            'abstract': row.get('abstract', ''),
+            'group': row['group'] if isinstance(row.get('group'), str) else ''  # 会议分组，用于优先级调度
+        })
+    
+    keywords = args.keywords or DEFAULT_KEYWORDS
+    
+    # 读取已有的分析日志，断点续跑时跳过已完成的论文
+    journal_file = args.journal_file or os.path.splitext(args.output_file)[0] + '_journal.jsonl'
+    dead_letter_file = args.dead_letter_file or os.path.splitext(args.output_file)[0] + '_failed.jsonl'
+    trace_file = args.trace_file or os.path.splitext(args.output_file)[0] + '_api_trace.jsonl'
+    METRICS = ApiMetrics(trace_file, args.metrics_file or None)
+    work_queue = None
+    if args.queue_file:
+        # 队列模式：完成情况记录在共享队列中，不使用日志文件和失败记录文件
+        work_queue = WorkQueue(args.queue_file, lease_seconds=args.lease_seconds,
+                               journal_mode=args.queue_journal_mode)
+        if args.retry_failed:
+            print(f"队列中 {work_queue.retry_failed(QUEUE_NAME)} 篇失败的论文重新放回队列")
+        journal = {}
+        pending = papers
+    elif args.retry_failed:
+        # 只处理上次失败的论文，已完成的结果保留在日志中
+        journal = load_journal(journal_file)
+        failed = load_dead_letters(dead_letter_file)
+        pending = [paper for key, paper in failed.items() if key not in journal]
+        print(f"从 {dead_letter_file} 读取到 {len(pending)} 篇失败的论文，重新分析")
+        journal_mode = 'a'
+    elif args.resume:
+        journal = load_journal(journal_file)
+        pending = [paper for paper in papers if paper_key(paper) not in journal]
+        print(f"从日志 {journal_file} 恢复: 已完成 {len(papers) - len(pending)} 篇, 剩余 {len(pending)} 篇")
+        journal_mode = 'a'
+    else:
+        journal = {}
+        pending = papers
+        journal_mode = 'w'
+    
+    # 可选的本地向量预筛选：明显无关的论文不调用API
+    prefiltered = {}
+    prefilter_scores = None
+    if (args.prefilter_top_k or args.prefilter_threshold is not None) and papers:
+        from embedding_prefilter import prefilter_papers
+        # 对全部论文打分选出保留的论文，再与待分析的论文取交集：续跑或重试时保留的论文与第一次运行相同，
+        # 不会从剩余的论文中重新选前K篇
+        kept, skipped, kept_scores = prefilter_papers(
+            papers, keywords=keywords, top_k=args.prefilter_top_k,
+            threshold=args.prefilter_threshold, model_name=args.prefilter_model,
+            cache_file=args.embedding_cache_file
+        )
+        prefiltered = {paper_key(paper): score for paper, score in skipped}
+        kept_scores = {paper_key(paper): score for paper, score in zip(kept, kept_scores)}
+        pending = [paper for paper in pending if paper_key(paper) not in prefiltered]
+        prefilter_scores = [kept_scores.get(paper_key(paper)) for paper in pending]
+    
+    # 按优先级调度：关键词命中、预筛选相似度和会议分组高的论文先分析
+    priorities = {}
+    if prioritize and pending:
+        pending, ordered = order_by_priority(pending, keywords, prefilter_scores)
+        if args.sample > 0:
+            pending, ordered = pending[:args.sample], ordered[:args.sample]
+            print(f"按优先级选取{len(pending)}篇论文进行分析")
+        priorities = {paper_key(paper): priority for paper, priority in zip(pending, ordered)}
+        print(f"按优先级调度 {len(pending)} 篇论文，优先级最高: {str(pending[0]['clean_title'])[:50]}...")
+    
+    # 已分析过的论文直接从缓存读取，不再重复付费
+    cache = None
+    if not args.no_cache:
+        cache = ResponseCache(
+            args.cache_file,
+            max_bytes=int(args.cache_max_mb * 1024 * 1024),
+            max_age_days=args.cache_max_age_days
+        )
+    
+    # 并发分析论文，由令牌桶控制请求速率，代替固定的等待时间
+    limiter = TokenBucketLimiter(rpm=args.rpm, tpm=args.tpm)
+    print(f"并发数: {args.concurrency}, 每批论文数: {args.batch_size}, "
+          f"RPM限制: {args.rpm or '无'}, TPM限制: {args.tpm or '无'}")
+    if budget.enabled:
+        print(f"预算: 令牌 {args.token_budget or '不限'}, 费用 {f'${args.cost_budget:.2f}' if args.cost_budget else '不限'}, "
+              f"时间 {f'{args.time_budget}分钟' if args.time_budget else '不限'}")
+    failed_count = 0
+    budget_skipped = {}
+    skipped_file = os.path.splitext(args.output_file)[0] + '_skipped.jsonl'
+    
+    def record_skip(paper, reason):
+        """预算用尽后未分析的论文，记录原因和优先级，之后可用--resume继续"""
+        key = paper_key(paper)
+        budget_skipped[key] = dict(paper, reason=reason, priority=priorities.get(key))
+    
+    def report_run():
+        """打印本次运行的API指标、预算和缓存统计"""
+        METRICS.close()
+        print(f"\n{METRICS.summary(args.price_input, args.price_output, PRICE_CACHED_INPUT_PER_M)}")
+        if budget.enabled:
+            print(f"\n{budget.summary()}")
+        if cache is not None:
+            stats = cache.stats()
+            print(f"\n缓存统计: 命中 {stats['hits']} 次, 未命中 {stats['misses']} 次, "
+                  f"命中率 {stats['hit_rate']:.1%}, 共 {stats['entries']} 条 ({stats['bytes'] / 1024 / 1024:.2f} MB)")
+            cache.close()
+    
+    if work_queue is not None:
+        worker = args.worker_id or worker_name()
+        try:
+            journal = asyncio.run(analyze_from_queue(
+                work_queue, worker, api_key, pending, priorities, args.concurrency, limiter, cache,
+                args.batch_size, budget if budget.enabled else None, record_skip
+            ))
+            failures = work_queue.failures(QUEUE_NAME)
+            failed_count = len(failures)
+        except KeyboardInterrupt:
+            print(f"\n分析被中断，已完成的结果保存在队列 {args.queue_file} 中，重新启动工作进程即可继续")
+            return
+        finally:
+            report_run()
+            work_queue.close()
+        if failed_count:
+            print(f"\n有 {failed_count} 篇论文多次重试后仍然失败，可使用 --queue_file {args.queue_file} --retry_failed 重新放回队列")
+            for _, paper, error in failures[:10]:
+                print(f"  {str(paper['clean_title'])[:50]}...: {error}")
+    else:
+        # 失败论文先写入临时文件，正常结束后替换失败论文文件，只保留本次运行仍然失败的论文；
+        # 续跑或重试时被中断，原文件中可能还有没来得及重试的论文，本次的记录改为追加到原文件
+        dead_letter_tmp = dead_letter_file + '.tmp'
+        completed = False
+        with open(journal_file, journal_mode, encoding='utf-8') as journal_handle, \
+                open(dead_letter_tmp, 'w', encoding='utf-8') as dead_letter_handle:
+            def record_failure(paper, error):
+                """重试后仍然失败的论文写入失败记录，不混入分析结果"""
+                nonlocal failed_count
+                failed_count += 1
+                dead_letter_handle.write(json.dumps({
+                    'key': paper_key(paper),
+                    'paper': paper,
+                    'error': str(error),
+                    'failed_at': time.strftime('%Y-%m-%d %H:%M:%S')
+                }, ensure_ascii=False) + '\n')
+                dead_letter_handle.flush()
+            
+            def record_results(batch, analyses):
+                """每完成一批论文立即追加到日志，中断后不会丢失已完成的结果"""
+                for paper, analysis in zip(batch, analyses):
+                    row = result_row(paper, analysis)
+                    key = paper_key(paper)
+                    journal[key] = row
+                    journal_handle.write(json.dumps({'key': key, 'row': row}, ensure_ascii=False) + '\n')
+                journal_handle.flush()
+            
+            try:
+                asyncio.run(analyze_papers_async(
+                    api_key, pending, args.concurrency, limiter, cache, args.batch_size,
+                    record_results, record_failure, budget if budget.enabled else None, record_skip
+                ))
+                completed = True
+            except KeyboardInterrupt:
+                print(f"\n分析被中断，已完成的结果保存在 {journal_file}，可使用 --resume 继续")
+                return
+            finally:
+                report_run()
+                dead_letter_handle.close()
+                commit_dead_letters(dead_letter_tmp, dead_letter_file, replace=completed or journal_mode == 'w')
         
-        # 避免API限制
-        if i < len(df) - 1:
-            delay = 1  # 根据API限制调整延迟时间
-            print(f"等待{delay}秒...")
-            time.sleep(delay)
+        if failed_count:
+            print(f"\n有 {failed_count} 篇论文分析失败，已记录到 {dead_letter_file}，可使用 --retry_failed 单独重试")
+    if budget_skipped:
+        with open(skipped_file, 'w', encoding='utf-8') as f:
+            for key, paper in budget_skipped.items():
+                f.write(json.dumps({'key': key, 'paper': paper}, ensure_ascii=False) + '\n')
+        print(f"预算用尽，{len(budget_skipped)} 篇论文未分析，已记录到 {skipped_file}，增加预算后可使用 --resume 继续")
+    elif os.path.exists(skipped_file):
+        # 本次没有因预算跳过的论文，删除上次运行留下的记录
+        os.remove(skipped_file)
+    
+    # 按输入顺序从日志生成最终结果，预筛选排除的论文标注相似度，不写入日志
+    results = []
+    for paper in papers:
+        key = paper_key(paper)
+        if key in journal:
+            results.append(journal[key])
+        elif key in prefiltered:
+            results.append(dict(paper_columns(paper), overview='', relevance=f"未分析（预筛选相似度 {prefiltered[key]:.3f}）"))
+        elif key in budget_skipped:
+            results.append(dict(paper_columns(paper), overview='', relevance=f"未分析（{budget_skipped[key]['reason']}）"))
     
-    # 保存结果
+    # 保存结果，队列模式下多个工作进程可能同时导出
     result_df = pd.DataFrame(results)
-    result_df.to_csv(args.output_file, index=False, encoding='utf-8-sig')
+    write_table_atomic(result_df, args.output_file)
     print(f"\n分析完成! 结果已保存到 {args.output_file}")
     
     # 输出高相关性论文摘要
@@ -8,15 +8,67 @@ from tqdm import tqdm
 import os
 import sys
 import traceback
-import gc  # 添加垃圾回收模块
+import argparse
+import hashlib
+import re
+from arxiv_api import ARXIV_API_URL, API_BATCH_SIZE, API_DELAY, search_arxiv_bulk
+from rate_limiter import AIMDRateController
+from retry_policy import parse_retry_after
+from page_cache import PageCache, DEFAULT_CACHE_DIR
+from table_io import TableWriter, count_rows, iter_table, write_table_atomic
+from work_queue import WorkQueue, LeaseKeeper, worker_name, LEASE_SECONDS
+from memory_monitor import MemoryMonitor
 
 # 减少全局变量的使用
-CHUNK_SIZE = 5  # 每批只处理5篇论文，减小内存压力
-DELAY_MIN = 10  # 增加延迟时间到10-15秒
-DELAY_MAX = 15
+CHUNK_SIZE = 20  # 每批论文数，每批结束时保存一次中间结果并记录内存
+MERGE_CHUNK_SIZE = 5000  # 合并中间结果时每次读取的行数
+ARXIV_LINK_PATTERN = re.compile(r'https://arxiv.org/abs/\d+\.\d+')
+CHUNK_FILE_PATTERN = re.compile(r'papers_with_arxiv_chunk_(\d+)\.csv')
+DELAY_MIN = 10  # html方式的初始请求间隔，之后由自适应速率控制器调整
+CACHE_MAX_AGE_DAYS = 7  # 缓存的搜索结果页在此天数内直接使用，不再请求arXiv
+INPUT_COLUMNS = ['title', 'clean_title', 'authors', 'abstract']  # 只读取输出需要的列
+ARXIV_FAILURE_PREFIXES = ('搜索arXiv时', '请求失败', '搜索时发生错误')  # 查找出错（而不是没有结果）的返回值
+ARXIV_SEARCH_URL = "https://arxiv.org/search/"
+QUEUE_NAME = 'arxiv'
+QUEUE_POLL_SECONDS = 10  # 剩余任务都被其他工作进程持有时的等待间隔
 
-def search_arxiv(title, retry_count=2, base_delay=10):
-    """在arXiv上搜索论文并返回链接，包含重试机制"""
+def extract_arxiv_link(html_text):
+    """从arXiv搜索结果页中提取第一篇论文的链接"""
+    # 直接用字符串搜索查找arxiv链接
+    if "No results found" in html_text or "没有找到结果" in html_text:
+        return "未找到arXiv链接"
+    
+    # 简单地查找第一个arxiv链接，找到即停止扫描
+    match = ARXIV_LINK_PATTERN.search(html_text)
+    if match:
+        return match.group(0)
+    
+    # 如果没有找到直接链接，再尝试更复杂的解析
+    try:
+        soup = BeautifulSoup(html_text, 'html.parser')
+        
+        # 查找结果
+        results = soup.select('.list-title > a')
+        
+        if results:
+            paper_link = results[0]['href']
+            if not paper_link.startswith('http'):
+                paper_link = 'https://arxiv.org' + paper_link
+            return paper_link
+    except Exception as parser_error:
+        print(f"解析HTML时出错: {parser_error}")
+    
+    # 如果上面的方法都失败，返回未找到
+    return "未找到arXiv链接"
+
+def search_arxiv(title, retry_count=2, base_delay=10, controller=None, cache=None, cache_max_age=0,
+                 base_url=ARXIV_SEARCH_URL):
+    """在arXiv上搜索论文并返回链接，包含重试机制
+    
+    提供controller（AIMDRateController）时由它决定每次请求的发送时间，不再使用固定的base_delay。
+    提供cache（PageCache）时，cache_max_age秒内抓取过的搜索页直接使用存档，否则发送条件请求。
+    base_url可指向本地替身服务器（见bench_pipeline.py）。
+    """
     if not title or len(title.strip()) == 0:
         return "标题为空"
     
@@ -24,78 +76,61 @@ def search_arxiv(title, retry_count=2, base_delay=10):
         try:
             # 简化搜索查询，只使用标题的前60个字符减轻内存负担
             search_query = title[:60].strip()
-            search_url = f"https://arxiv.org/search/?query={quote(search_query)}&searchtype=title"
+            search_url = f"{base_url}?query={quote(search_query)}&searchtype=title"
+            
+            # 缓存未过期时不发请求，也不占用速率配额
+            html_text = cache.fresh(search_url, cache_max_age) if cache is not None else None
+            if html_text is not None:
+                return extract_arxiv_link(html_text)
             
             # 简化请求头
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
             }
+            if cache is not None:
+                headers.update(cache.conditional_headers(search_url))
             
             # 设置较短的超时，防止长时间等待
-            response = requests.get(search_url, headers=headers, timeout=20)
+            if controller is not None:
+                controller.wait()
+            request_start = time.monotonic()
+            try:
+                response = requests.get(search_url, headers=headers, timeout=20)
+            except requests.exceptions.RequestException:
+                if controller is not None:
+                    controller.on_response(None, time.monotonic() - request_start)
+                raise
+            if controller is not None:
+                controller.on_response(
+                    response.status_code, time.monotonic() - request_start,
+                    parse_retry_after(response.headers.get('Retry-After'))
+                )
             
-            # 检查响应状态
-            if response.status_code != 200:
+            # 检查响应状态（304表示存档的搜索页仍然有效）
+            if response.status_code not in (200, 304):
                 print(f"请求返回状态码: {response.status_code}")
                 if attempt < retry_count - 1:
-                    delay = base_delay + random.uniform(1, 5)
-                    print(f"等待 {delay:.2f} 秒后重试...")
-                    time.sleep(delay)
+                    if controller is None:
+                        delay = base_delay + random.uniform(1, 5)
+                        print(f"等待 {delay:.2f} 秒后重试...")
+                        time.sleep(delay)
                     continue
                 else:
                     return f"请求失败，状态码: {response.status_code}"
             
-            # 使用较轻量的解析方法
-            # 使用string方法而不是创建完整的BeautifulSoup对象
-            html_text = response.text
-            
-            # 直接用字符串搜索查找arxiv链接
-            if "No results found" in html_text or "没有找到结果" in html_text:
-                return "未找到arXiv链接"
-            
-            # 简单地查找第一个arxiv链接
-            import re
-            arxiv_pattern = r'https://arxiv.org/abs/\d+\.\d+'
-            matches = re.findall(arxiv_pattern, html_text)
-            
-            if matches:
-                # 获取结果并立即清理
-                result = matches[0]
-                del html_text, matches
-                gc.collect()  # 强制垃圾回收
-                return result
-            
-            # 如果没有找到直接链接，再尝试更复杂的解析
-            try:
-                soup = BeautifulSoup(html_text, 'html.parser')
-                
-                # 查找结果
-                results = soup.select('.list-title > a')
-                
-                if results:
-                    paper_link = results[0]['href']
-                    if not paper_link.startswith('http'):
-                        paper_link = 'https://arxiv.org' + paper_link
-                    
-                    # 清理资源
-                    del soup, results, html_text
-                    gc.collect()
-                    return paper_link
-                
-                # 清理不再需要的资源
-                del soup
-            except Exception as parser_error:
-                print(f"解析HTML时出错: {parser_error}")
-            
-            # 如果上面的方法都失败，返回未找到
-            return "未找到arXiv链接"
+            html_text = cache.store_response(search_url, response) if cache is not None else None
+            if html_text is None:
+                html_text = response.text
+            return extract_arxiv_link(html_text)
                 
         except requests.exceptions.RequestException as e:
             print(f"请求错误: {e}")
             if attempt < retry_count - 1:
-                delay = base_delay + random.uniform(3, 8)
-                print(f"等待 {delay:.2f} 秒后重试...")
-                time.sleep(delay)
+                # 使用速率控制器时，重试的等待由控制器在下次请求前完成
+                if controller is None:
+                    delay = base_delay + random.uniform(3, 8)
+                    print(f"等待 {delay:.2f} 秒后重试...")
+                    time.sleep(delay)
             else:
                 return f"搜索arXiv时网络错误"
         except Exception as e:
@@ -106,19 +141,137 @@ def search_arxiv(title, retry_count=2, base_delay=10):
                 time.sleep(delay)
             else:
                 return f"搜索arXiv时出错"
-        
-        # 每次尝试后进行垃圾回收
-        gc.collect()
 
-def safe_search_arxiv(title):
+def safe_search_arxiv(title, controller=None, cache=None, cache_max_age=0):
     """安全包装搜索函数，确保任何异常都被捕获"""
     try:
-        return search_arxiv(title)
+        return search_arxiv(title, controller=controller, cache=cache, cache_max_age=cache_max_age)
     except Exception as e:
         print(f"搜索过程中发生未预期错误: {e}")
         return "搜索时发生错误"
 
-def main():
+def input_source(path):
+    """输入文件的标识，文件内容变化后会重新入队"""
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}:{stat.st_size}:{int(stat.st_mtime)}"
+
+def task_key(title):
+    """队列中论文的键，与分块模式下按原始标题判断是否处理过一致"""
+    return hashlib.sha1(str(title).encode('utf-8')).hexdigest()
+
+def run_queue_worker(work_queue, worker, input_file, chunk_size, lookup_links, output_file, log, monitor=None):
+    """队列模式：从共享工作队列认领论文查找arXiv链接，队列清空后导出全部结果
+
+    可以在多个进程或多台机器上同时运行，每篇论文只会被一个工作进程处理。
+    提供monitor（MemoryMonitor）时每批记录内存，超过内存上限后停止认领，剩余论文留给其他工作进程。
+    """
+    source = input_source(input_file)
+    if not work_queue.has_source(QUEUE_NAME, source):
+        added = 0
+        for df_chunk in iter_table(input_file, columns=INPUT_COLUMNS, chunk_size=5000):
+            added += work_queue.enqueue(QUEUE_NAME, [
+                (task_key(row['title']), {col: row.get(col) for col in INPUT_COLUMNS}, 0)
+                for row in df_chunk.to_dict('records')
+            ])
+        work_queue.mark_source(QUEUE_NAME, source)
+        log(f"{input_file} 入队 {added} 篇新论文")
+    log(f"工作进程 {worker} 开始处理，队列状态: {work_queue.counts(QUEUE_NAME)}")
+    
+    processed = 0
+    with LeaseKeeper(work_queue, QUEUE_NAME, worker) as keeper:
+        while True:
+            tasks = work_queue.claim(QUEUE_NAME, worker, chunk_size)
+            if not tasks:
+                remaining = work_queue.unfinished(QUEUE_NAME)
+                if not remaining:
+                    break
+                log(f"还有 {remaining} 篇论文正由其他工作进程处理，{QUEUE_POLL_SECONDS}秒后再检查")
+                time.sleep(QUEUE_POLL_SECONDS)
+                continue
+            keys = [key for key, _ in tasks]
+            keeper.hold(keys)
+            try:
+                titles = [paper['clean_title'] for _, paper in tasks if isinstance(paper.get('clean_title'), str)]
+                try:
+                    links = lookup_links(titles) if titles else {}
+                except Exception as e:
+                    log(f"查找出错: {e}")
+                    links = {}
+                for key, paper in tasks:
+                    clean_title = paper.get('clean_title')
+                    if not isinstance(clean_title, str):
+                        link = "标题为空"
+                    else:
+                        link = links.get(clean_title, "搜索时发生错误")
+                    if link.startswith(ARXIV_FAILURE_PREFIXES):
+                        # 放回队列，稍后由任意工作进程重试
+                        work_queue.fail(QUEUE_NAME, worker, key, link)
+                    elif work_queue.complete(QUEUE_NAME, worker, key, dict(paper, arxiv_link=link)):
+                        processed += 1
+                    else:
+                        log(f"租约已被其他工作进程接手，丢弃结果: {str(clean_title)[:50]}...")
+            except BaseException:
+                # 中断或出错时放弃未完成的租约（已完成的不受影响），其他工作进程可以立即接手
+                work_queue.release(QUEUE_NAME, worker, keys)
+                raise
+            finally:
+                keeper.drop(keys)
+            log(f"本进程已完成 {processed} 篇，队列状态: {work_queue.counts(QUEUE_NAME)}")
+            if monitor is not None and monitor.sample(f"本进程已完成 {processed} 篇"):
+                log(f"回收后常驻内存仍超过上限 {monitor.ceiling_mb} MB，停止认领，剩余论文由其他工作进程或下次运行处理")
+                return
+    
+    results = list(work_queue.results(QUEUE_NAME).values())
+    failures = work_queue.failures(QUEUE_NAME)
+    results += [dict(paper, arxiv_link=error) for _, paper, error in failures]
+    if results:
+        write_table_atomic(pd.DataFrame(results, columns=INPUT_COLUMNS + ['arxiv_link']), output_file)
+        log(f"队列已清空，{len(results)} 篇论文的结果已保存到 {output_file}（{len(failures)} 篇多次重试后仍失败）")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='在arXiv上搜索论文链接')
+    parser.add_argument('--input_file', type=str, default='data/cleaned_papers.csv',
+                       help='输入文件路径（CSV、Parquet或Arrow，按扩展名识别）')
+    parser.add_argument('--output_file', type=str, default='data/papers_with_arxiv.csv',
+                       help='合并后的结果文件，扩展名为.parquet或.arrow时输出列式格式')
+    parser.add_argument('--backend', choices=['html', 'api', 'offline'], default='html',
+                       help='查找方式: html逐篇抓取搜索页面, api通过arXiv导出API批量查询, offline查询本地离线索引')
+    parser.add_argument('--chunk_size', type=int, default=CHUNK_SIZE,
+                       help='每批处理的论文数，api方式下建议调大以减少请求次数')
+    parser.add_argument('--arxiv_api_url', type=str, default=ARXIV_API_URL,
+                       help='arXiv导出API地址，可指向本地替身服务器')
+    parser.add_argument('--api_batch_size', type=int, default=API_BATCH_SIZE,
+                       help='api方式下每个请求合并查询的标题数')
+    parser.add_argument('--index_dir', type=str, default='data/arxiv_index',
+                       help='offline方式使用的离线索引目录，由arxiv_offline_index.py构建')
+    parser.add_argument('--initial_rate', type=float, default=None,
+                       help='初始请求速率（请求/秒），默认html方式为1/DELAY_MIN，api方式为1/3')
+    parser.add_argument('--max_rate', type=float, default=None,
+                       help='请求速率上限（请求/秒），默认html方式为1，api方式为1/3')
+    parser.add_argument('--min_rate', type=float, default=1 / 60,
+                       help='请求速率下限（请求/秒）')
+    parser.add_argument('--slow_threshold', type=float, default=10.0,
+                       help='响应超过该秒数视为服务端过载并降低速率')
+    parser.add_argument('--cache_dir', type=str, default=DEFAULT_CACHE_DIR,
+                       help='html方式下arXiv搜索页的缓存和存档目录')
+    parser.add_argument('--cache_max_age_days', type=float, default=CACHE_MAX_AGE_DAYS,
+                       help='缓存的搜索页在此天数内直接使用，超过后发送条件请求验证，0表示总是验证')
+    parser.add_argument('--no_cache', action='store_true',
+                       help='不使用搜索页缓存')
+    parser.add_argument('--queue_file', type=str, default='',
+                       help='共享工作队列文件，设置后以队列模式运行，可同时启动多个进程或在多台机器上运行')
+    parser.add_argument('--worker_id', type=str, default='',
+                       help='队列模式下的工作进程标识，默认为主机名:进程号')
+    parser.add_argument('--lease_seconds', type=float, default=LEASE_SECONDS,
+                       help='队列模式下认领任务的租约秒数，进程崩溃后超过该时间任务会被其他进程接手')
+    parser.add_argument('--queue_journal_mode', choices=['wal', 'delete'], default='wal',
+                       help='队列库的日志模式：同一台机器用wal，多台机器通过NFS等共享时用delete')
+    parser.add_argument('--memory_ceiling_mb', type=float, default=0,
+                       help='常驻内存上限(MB)：超过后先做一次完整的垃圾回收，仍超限则保存进度并停止，0表示不限制')
+    parser.add_argument('--trace_memory', action='store_true',
+                       help='用tracemalloc统计每批的Python对象分配（会降低速度）')
+    args = parser.parse_args(argv)
+    
     # 检查数据目录
     if not os.path.exists('data'):
         os.makedirs('data')
@@ -137,24 +290,71 @@ def main():
     
     try:
         # 读取清洗后的论文
-        input_file = 'data/cleaned_papers.csv'
+        input_file = args.input_file
         if not os.path.exists(input_file):
             log_message(f"错误: 未找到文件 {input_file}")
             log_handle.close()
             return
         
-        # 使用更节省内存的方式读取CSV
         # 使用迭代器而不是一次性加载整个DataFrame
         log_message("开始读取数据文件...")
         
-        # 首先确定文件中有多少行
-        with open(input_file, 'r', encoding='utf-8') as f:
-            row_count = sum(1 for _ in f) - 1  # 减去标题行
+        # 按记录统计论文数（CSV中的多行摘要不会被多算，列式格式直接读取元数据）
+        row_count = count_rows(input_file)
         
         log_message(f"文件中包含 {row_count} 篇论文")
         
+        # 自适应速率控制：响应正常时逐步提速，遇到429/503或响应过慢时成倍降速
+        if args.backend == 'api':
+            initial_rate = args.initial_rate or 1 / API_DELAY
+            max_rate = args.max_rate or 1 / API_DELAY
+        else:
+            initial_rate = args.initial_rate or 1 / DELAY_MIN
+            max_rate = args.max_rate or 1.0
+        controller = AIMDRateController(
+            initial_rate=initial_rate, min_rate=min(args.min_rate, initial_rate), max_rate=max(max_rate, initial_rate),
+            slow_threshold=args.slow_threshold, log=log_message
+        )
+        
+        page_cache = None
+        if args.backend == 'html' and not args.no_cache:
+            page_cache = PageCache(args.cache_dir)
+        cache_max_age = args.cache_max_age_days * 24 * 3600
+        
+        offline_index = None
+        if args.backend == 'offline':
+            # 按需导入，其他查找方式不需要numpy索引
+            from arxiv_offline_index import OfflineArxivIndex
+            offline_index = OfflineArxivIndex(args.index_dir)
+            if not len(offline_index):
+                log_message(f"错误: 离线索引 {args.index_dir} 为空，请先运行 arxiv_offline_index.py build")
+                return
+            log_message(f"加载离线索引 {args.index_dir}，共 {len(offline_index)} 条记录")
+        
+        monitor = MemoryMonitor(args.memory_ceiling_mb, args.trace_memory, log=log_message)
+        
+        if args.queue_file:
+            def lookup_links(titles):
+                """按查找方式批量查找一组标题的链接"""
+                if args.backend == 'api':
+                    return search_arxiv_bulk(titles, api_url=args.arxiv_api_url, batch_size=args.api_batch_size,
+                                             log=log_message, controller=controller)
+                if args.backend == 'offline':
+                    return offline_index.lookup_links(titles)
+                return {title: safe_search_arxiv(title, controller, page_cache, cache_max_age) for title in titles}
+            
+            work_queue = WorkQueue(args.queue_file, lease_seconds=args.lease_seconds,
+                                   journal_mode=args.queue_journal_mode)
+            try:
+                run_queue_worker(work_queue, args.worker_id or worker_name(), input_file, args.chunk_size,
+                                 lookup_links, args.output_file, log_message, monitor)
+            finally:
+                work_queue.close()
+                log_message(monitor.summary())
+            return
+        
         # 检查是否有已完成的中间结果
-        chunk_files = [f for f in os.listdir('data') if f.startswith('papers_with_arxiv_chunk_') and f.endswith('.csv')]
+        chunk_files = list_chunk_files('data')
         processed_titles = set()
         
         if chunk_files:
@@ -172,14 +372,27 @@ def main():
             log_message(f"已处理 {len(processed_titles)} 篇论文")
         
         # 使用分块读取CSV文件
-        chunk_id = len(chunk_files) + 1
+        chunk_id = int(CHUNK_FILE_PATTERN.fullmatch(chunk_files[-1]).group(1)) + 1 if chunk_files else 1
         total_processed = 0
         
-        for df_chunk in pd.read_csv(input_file, chunksize=CHUNK_SIZE):
+        for df_chunk in iter_table(input_file, columns=INPUT_COLUMNS, chunk_size=args.chunk_size):
             chunk_results = []
             
             log_message(f"处理第 {chunk_id} 批论文 (共 {len(df_chunk)} 篇)")
             
+            # api和offline方式下整批标题一次查询
+            bulk_links = {}
+            if args.backend != 'html':
+                pending_titles = [row['clean_title'] for _, row in df_chunk.iterrows()
+                                  if row['title'] not in processed_titles and isinstance(row['clean_title'], str)]
+                if pending_titles and args.backend == 'api':
+                    bulk_links = search_arxiv_bulk(
+                        pending_titles, api_url=args.arxiv_api_url,
+                        batch_size=args.api_batch_size, log=log_message, controller=controller
+                    )
+                elif pending_titles:
+                    bulk_links = offline_index.lookup_links(pending_titles)
+            
             for _, row in df_chunk.iterrows():
                 title = row['title']
                 
@@ -196,7 +409,10 @@ def main():
                     log_message(f"使用清洗后的标题: {clean_title[:50]}...")
                     
                     # 搜索arXiv
-                    arxiv_link = safe_search_arxiv(clean_title)
+                    if args.backend != 'html':
+                        arxiv_link = bulk_links.get(clean_title, "标题为空")
+                    else:
+                        arxiv_link = safe_search_arxiv(clean_title, controller, page_cache, cache_max_age)
                     log_message(f"找到链接: {arxiv_link}")
                     
                     # 添加到结果
@@ -212,35 +428,35 @@ def main():
                     processed_titles.add(title)
                     total_processed += 1
                     
-                    # 强制垃圾回收
-                    gc.collect()
-                    
                 except Exception as e:
                     log_message(f"处理论文时出错: {str(e)}")
                     traceback.print_exc(file=log_handle)
                 
-                # 每篇论文之间等待较长时间
-                delay = random.uniform(DELAY_MIN, DELAY_MAX)
-                log_message(f"等待 {delay:.2f} 秒...")
-                time.sleep(delay)
             
-            # 保存这一批的中间结果
+            # 保存这一批的中间结果（先写临时文件，中断时不会留下半个批次文件）
             if chunk_results:
                 temp_file = f'data/papers_with_arxiv_chunk_{chunk_id}.csv'
-                pd.DataFrame(chunk_results).to_csv(temp_file, index=False, encoding='utf-8-sig')
+                write_table_atomic(pd.DataFrame(chunk_results), temp_file)
                 log_message(f"保存中间结果到 {temp_file}")
             
-            # 清理这一批的内存
-            del chunk_results, df_chunk
-            gc.collect()
-            
+            over_ceiling = monitor.sample(f"第 {chunk_id} 批")
             chunk_id += 1
             
             log_message(f"已处理总数: {total_processed}/{row_count}")
-        
-        # 合并所有结果
-        log_message("处理完成，开始合并所有结果...")
-        merge_all_chunks('data')
+            if page_cache is not None:
+                stats = page_cache.stats()
+                log_message(f"搜索页缓存: 直接使用 {stats['fresh_hits']}, 验证未变化 {stats['revalidated']}, 新下载 {stats['downloaded']}")
+            if args.backend != 'offline':
+                log_message(f"当前请求速率: 目标 {controller.rate:.3f} 请求/秒, 实际 {controller.effective_rate():.3f} 请求/秒")
+            if over_ceiling:
+                log_message(f"回收后常驻内存仍超过上限 {args.memory_ceiling_mb} MB，已保存的批次不会丢失，"
+                            f"停止处理；重新运行会从第 {chunk_id} 批继续")
+                break
+        else:
+            # 合并所有结果
+            log_message("处理完成，开始合并所有结果...")
+            merge_all_chunks('data', args.output_file)
+        log_message(monitor.summary())
         
     except Exception as e:
         log_message(f"执行过程中发生错误: {e}")
@@ -250,9 +466,18 @@ def main():
         log_message(f"=== 完成执行 {time.strftime('%Y-%m-%d %H:%M:%S')} ===")
         log_handle.close()
 
-def merge_all_chunks(data_dir):
-    """合并所有分块结果文件"""
-    chunk_files = [f for f in os.listdir(data_dir) if f.startswith('papers_with_arxiv_chunk_') and f.endswith('.csv')]
+def list_chunk_files(data_dir):
+    """按批次编号排序的分块结果文件名，忽略写了一半的临时文件"""
+    numbered = []
+    for name in os.listdir(data_dir):
+        match = CHUNK_FILE_PATTERN.fullmatch(name)
+        if match:
+            numbered.append((int(match.group(1)), name))
+    return [name for _, name in sorted(numbered)]
+
+def merge_all_chunks(data_dir, output_file=None):
+    """按批次顺序流式合并所有分块结果文件，内存中每次只有一块数据"""
+    chunk_files = list_chunk_files(data_dir)
     
     if not chunk_files:
         print("没有找到任何分块结果文件")
@@ -260,33 +485,31 @@ def merge_all_chunks(data_dir):
     
     print(f"开始合并 {len(chunk_files)} 个分块结果文件...")
     
-    # 逐个读取并合并文件，以减少内存使用
-    all_data = []
-    for file in chunk_files:
-        file_path = os.path.join(data_dir, file)
-        try:
-            df = pd.read_csv(file_path)
-            all_data.append(df)
-            print(f"读取文件 {file}，包含 {len(df)} 行数据")
-        except Exception as e:
-            print(f"读取文件 {file} 时出错: {e}")
+    output_file = output_file or os.path.join(data_dir, 'papers_with_arxiv.csv')
+    root, ext = os.path.splitext(output_file)
+    tmp_file = f"{root}.{os.getpid()}.tmp{ext}"
+    total_count = found_count = 0
+    with TableWriter(tmp_file) as writer:
+        for file in chunk_files:
+            try:
+                for df in iter_table(os.path.join(data_dir, file), chunk_size=MERGE_CHUNK_SIZE):
+                    writer.write(df)
+                    total_count += len(df)
+                    # 统计找到了多少arXiv链接
+                    found_count += sum(1 for link in df['arxiv_link'].astype(str)
+                                       if link != "未找到arXiv链接" and not link.startswith("搜索arXiv时"))
+            except Exception as e:
+                print(f"读取文件 {file} 时出错: {e}")
     
-    if all_data:
-        # 合并所有数据框
-        combined_df = pd.concat(all_data, ignore_index=True)
-        output_file = os.path.join(data_dir, 'papers_with_arxiv.csv')
-        combined_df.to_csv(output_file, index=False, encoding='utf-8-sig')
-        
-        # 统计找到了多少arXiv链接
-        found_count = sum(1 for link in combined_df['arxiv_link'] if link != "未找到arXiv链接" and not link.startswith("搜索arXiv时"))
-        
-        print(f"合并完成! 在 {len(combined_df)} 篇论文中找到了 {found_count} 个arXiv链接")
+    if total_count:
+        os.replace(tmp_file, output_file)
+        print(f"合并完成! 在 {total_count} 篇论文中找到了 {found_count} 个arXiv链接")
         print(f"结果已保存到 {output_file}")
     else:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
         print("没有有效的数据可以合并")
 
 # 如果作为脚本直接运行
 if __name__ == "__main__":
-    # 设置垃圾回收阈值
-    gc.set_threshold(100, 5, 5)  # 更积极的垃圾回收
     main()
\ No newline at end of file
@@ -0,0 +1,202 @@
+import os
+import pandas as pd
+
+# 各步骤之间交换论文表的读写接口。格式由文件扩展名决定：
+#   .csv               - utf-8-sig编码的CSV（默认，兼容原有流程）
+#   .parquet           - Parquet列式存储，按列读取，行数从元数据获得
+#   .arrow / .feather  - Arrow IPC文件，内存映射读取，列数据零拷贝
+# Parquet和Arrow需要安装pyarrow，只在使用这两种格式时才导入。
+
+# 声明的列类型：流水线中的论文字段都是字符串，其他未声明的列也按字符串存储
+PAPER_SCHEMA = {
+    'title': 'string',
+    'authors': 'string',
+    'abstract': 'string',
+    'clean_title': 'string',
+    'overview': 'string',
+    'relevance': 'string',
+    'arxiv_link': 'string',
+    'venue': 'string',
+    'group': 'string',  # 会议分组，如Oral、Spotlight
+    'kept_index': 'int64',  # dedup_papers.py的重复记录中指向保留行的索引
+}
+ARROW_SUFFIXES = ('.arrow', '.feather', '.ipc')
+CHUNK_SIZE = 50000
+
+
+def table_format(path):
+    """根据扩展名判断文件格式：csv、parquet或arrow"""
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix == '.parquet':
+        return 'parquet'
+    if suffix in ARROW_SUFFIXES:
+        return 'arrow'
+    return 'csv'
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("读写Parquet/Arrow文件需要安装pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+def arrow_schema(columns):
+    """按PAPER_SCHEMA为给定的列生成Arrow schema"""
+    pa = _pyarrow()
+    types = {'string': pa.string(), 'int64': pa.int64()}
+    return pa.schema([(col, types[PAPER_SCHEMA.get(col, 'string')]) for col in columns])
+
+
+def to_arrow(df, schema=None):
+    """把DataFrame转换为符合schema的Arrow表，缺失值保存为null"""
+    pa = _pyarrow()
+    schema = schema or arrow_schema(df.columns)
+    arrays = []
+    for field in schema:
+        column = df[field.name] if field.name in df.columns else pd.Series(None, index=df.index, dtype=object)
+        try:
+            arrays.append(pa.array(column, type=field.type, from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # 混有非字符串的值（如数字）时逐个转为字符串，NaN保持为null
+            values = [None if pd.isna(v) else v if isinstance(v, str) else str(v) for v in column]
+            arrays.append(pa.array(values, type=field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def _csv_columns(path, columns):
+    """CSV只读取存在的列，避免usecols包含不存在的列时报错"""
+    if columns is None:
+        return None
+    header = pd.read_csv(path, nrows=0).columns
+    return [col for col in columns if col in header]
+
+
+def open_arrow(path):
+    """以内存映射方式打开Arrow IPC文件，读出的列直接引用映射的内存"""
+    pa = _pyarrow()
+    return pa.ipc.open_file(pa.memory_map(path, 'r'))
+
+
+def read_arrow(path, columns=None):
+    """读取Arrow表（不转换为pandas），只取需要的列"""
+    pa = _pyarrow()
+    if table_format(path) == 'parquet':
+        if columns is not None:
+            names = pa.parquet.read_schema(path).names
+            columns = [col for col in columns if col in names]
+        return pa.parquet.read_table(path, columns=columns, memory_map=True)
+    if table_format(path) == 'arrow':
+        table = open_arrow(path).read_all()
+        if columns is not None:
+            table = table.select([col for col in columns if col in table.column_names])
+        return table
+    return pa.Table.from_pandas(read_table(path, columns), preserve_index=False)
+
+
+def read_table(path, columns=None):
+    """读取整个表为DataFrame，columns不为None时只读取其中存在的列"""
+    if table_format(path) == 'csv':
+        return pd.read_csv(path, usecols=_csv_columns(path, columns))
+    return read_arrow(path, columns).to_pandas()
+
+
+def iter_table(path, columns=None, chunk_size=CHUNK_SIZE):
+    """分块读取表，每块是最多chunk_size行的DataFrame"""
+    fmt = table_format(path)
+    if fmt == 'csv':
+        yield from pd.read_csv(path, usecols=_csv_columns(path, columns), chunksize=chunk_size)
+    elif fmt == 'parquet':
+        pa = _pyarrow()
+        parquet_file = pa.parquet.ParquetFile(path, memory_map=True)
+        if columns is not None:
+            columns = [col for col in columns if col in parquet_file.schema_arrow.names]
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+    else:
+        table = read_arrow(path, columns)
+        for start in range(0, table.num_rows, chunk_size):
+            # slice不复制数据，只有转换为pandas时才物化这一块
+            yield table.slice(start, chunk_size).to_pandas()
+
+
+def count_rows(path):
+    """统计表的行数；CSV按解析出的记录计数，多行摘要不会被多算"""
+    fmt = table_format(path)
+    if fmt == 'parquet':
+        return _pyarrow().parquet.ParquetFile(path).metadata.num_rows
+    if fmt == 'arrow':
+        reader = open_arrow(path)
+        return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    first_column = pd.read_csv(path, nrows=0).columns[:1].tolist()
+    return sum(len(chunk) for chunk in pd.read_csv(path, usecols=first_column, chunksize=CHUNK_SIZE))
+
+
+class TableWriter:
+    """逐块追加写出表，列和类型由第一块决定"""
+
+    def __init__(self, path):
+        self.path = path
+        self.format = table_format(path)
+        self.columns = None
+        self._file = None
+        self._writer = None
+        self._schema = None
+        output_dir = os.path.dirname(path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, df):
+        if self.columns is None:
+            self.columns = df.columns.tolist()
+            self._open()
+            if self.format == 'csv':
+                df.to_csv(self._file, index=False)
+                return
+        # 后续的块按第一块的列输出
+        df = df.reindex(columns=self.columns)
+        if self.format == 'csv':
+            df.to_csv(self._file, index=False, header=False)
+        else:
+            self._writer.write_table(to_arrow(df, self._schema))
+
+    def _open(self):
+        if self.format == 'csv':
+            # 只打开一次输出文件，BOM只在文件开头写一次
+            self._file = open(self.path, 'w', encoding='utf-8-sig', newline='')
+            return
+        pa = _pyarrow()
+        self._schema = arrow_schema(self.columns)
+        if self.format == 'parquet':
+            self._writer = pa.parquet.ParquetWriter(self.path, self._schema, compression='zstd')
+        else:
+            self._writer = pa.ipc.new_file(self.path, self._schema)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        if self._writer is not None:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_table(df, path):
+    """按扩展名对应的格式写出整个表"""
+    with TableWriter(path) as writer:
+        writer.write(df)
+
+
+def write_table_atomic(df, path):
+    """先写临时文件再替换，多个工作进程同时导出时不会写出半个文件"""
+    root, ext = os.path.splitext(path)
+    tmp_path = f"{root}.{os.getpid()}.tmp{ext}"
+    write_table(df, tmp_path)
+    os.replace(tmp_path, path)
@@ -0,0 +1,263 @@
+import contextlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+# 多进程、多机共享的SQLite工作队列，供第3步（DeepSeek分析）和第4步（arXiv查找）分片并行。
+#
+# 每个任务（一篇论文）有状态 pending → leased → done/failed。工作进程在一个写事务中认领若干任务并获得
+# 租约（lease_seconds秒），处理期间由后台线程定期续租（心跳）；进程崩溃后租约过期，任务自动重新可认领。
+# 只有持有租约的进程才能提交结果，租约被他人接手后迟到的结果会被丢弃，不会重复写入。
+# 断点续跑只需再次启动工作进程，已完成的任务记录在库中，不需要重新扫描中间结果文件。
+#
+# 同一台机器上的多个进程使用WAL模式；多台机器通过NFS等网络文件系统共享时，WAL依赖的共享内存不可用，
+# 应使用journal_mode='delete'（回滚日志 + 文件锁）。
+
+DEFAULT_QUEUE_FILE = 'data/work_queue.sqlite'
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+BUSY_TIMEOUT_MS = 60000  # 其他进程持有写锁时的最长等待时间
+
+
+def worker_name():
+    """默认的工作进程标识：主机名:进程号"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """SQLite工作队列，同一个库中可以有多个队列（如analyze、arxiv）"""
+
+    def __init__(self, path=DEFAULT_QUEUE_FILE, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS,
+                 journal_mode='wal'):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # 自动提交模式，事务由BEGIN IMMEDIATE显式控制
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                     timeout=BUSY_TIMEOUT_MS / 1000)
+        self._conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+        self._conn.execute(f'PRAGMA journal_mode={journal_mode}')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        with self._transaction():
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS tasks ('
+                ' seq INTEGER PRIMARY KEY AUTOINCREMENT,'
+                ' queue TEXT NOT NULL,'
+                ' key TEXT NOT NULL,'
+                ' payload TEXT NOT NULL,'
+                ' priority REAL NOT NULL DEFAULT 0,'
+                ' status TEXT NOT NULL DEFAULT \'pending\','
+                ' owner TEXT,'
+                ' lease_until REAL,'
+                ' attempts INTEGER NOT NULL DEFAULT 0,'
+                ' result TEXT,'
+                ' error TEXT,'
+                ' updated_at REAL NOT NULL,'
+                ' UNIQUE (queue, key))'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS tasks_claim ON tasks (queue, status, priority DESC, seq)')
+            # 记录已经入队过的输入文件，工作进程启动时不必重复读取整个输入
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS sources ('
+                ' queue TEXT NOT NULL,'
+                ' source TEXT NOT NULL,'
+                ' enqueued_at REAL NOT NULL,'
+                ' PRIMARY KEY (queue, source))'
+            )
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """BEGIN IMMEDIATE事务：开始时即获取写锁，多个进程的认领不会交错"""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+
+    def enqueue(self, queue, items):
+        """批量入队 [(键, 数据, 优先级)]，已存在的键保持不变，返回新增的任务数"""
+        now = time.time()
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                'INSERT OR IGNORE INTO tasks (queue, key, payload, priority, updated_at) VALUES (?, ?, ?, ?, ?)',
+                [(queue, key, json.dumps(payload, ensure_ascii=False, default=str), priority, now)
+                 for key, payload, priority in items]
+            )
+            return conn.total_changes - before
+
+    def has_source(self, queue, source):
+        """输入source（如文件路径+大小+修改时间）是否已经完整入队"""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT 1 FROM sources WHERE queue = ? AND source = ?', (queue, source)
+            ).fetchone() is not None
+
+    def mark_source(self, queue, source):
+        with self._transaction() as conn:
+            conn.execute('INSERT OR REPLACE INTO sources (queue, source, enqueued_at) VALUES (?, ?, ?)',
+                         (queue, source, time.time()))
+
+    def claim(self, queue, worker, limit=1):
+        """认领最多limit个待处理或租约已过期的任务，按优先级从高到低，返回 [(键, 数据)]"""
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                'SELECT seq, key, payload FROM tasks WHERE queue = ? AND attempts < ? AND '
+                ' (status = \'pending\' OR (status = \'leased\' AND lease_until < ?)) '
+                'ORDER BY priority DESC, seq LIMIT ?',
+                (queue, self.max_attempts, now, limit)
+            ).fetchall()
+            conn.executemany(
+                'UPDATE tasks SET status = \'leased\', owner = ?, lease_until = ?, attempts = attempts + 1,'
+                ' updated_at = ? WHERE seq = ?',
+                [(worker, now + self.lease_seconds, now, seq) for seq, _, _ in rows]
+            )
+        return [(key, json.loads(payload)) for _, key, payload in rows]
+
+    def heartbeat(self, queue, worker, keys):
+        """为仍由worker持有的任务续租，返回续租成功的任务数"""
+        if not keys:
+            return 0
+        now = time.time()
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                'UPDATE tasks SET lease_until = ?, updated_at = ? '
+                'WHERE queue = ? AND key = ? AND owner = ? AND status = \'leased\'',
+                [(now + self.lease_seconds, now, queue, key, worker) for key in keys]
+            )
+            return conn.total_changes - before
+
+    def complete(self, queue, worker, key, result):
+        """提交结果；租约已被其他进程接手时返回False，结果被丢弃"""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                'UPDATE tasks SET status = \'done\', result = ?, error = NULL, lease_until = NULL, updated_at = ? '
+                'WHERE queue = ? AND key = ? AND owner = ? AND status = \'leased\'',
+                (json.dumps(result, ensure_ascii=False, default=str), time.time(), queue, key, worker)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, queue, worker, key, error):
+        """记录失败：未达到最大尝试次数时放回队列，否则标记为failed"""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                'UPDATE tasks SET status = CASE WHEN attempts < ? THEN \'pending\' ELSE \'failed\' END,'
+                ' error = ?, owner = NULL, lease_until = NULL, updated_at = ? '
+                'WHERE queue = ? AND key = ? AND owner = ? AND status = \'leased\'',
+                (self.max_attempts, str(error), time.time(), queue, key, worker)
+            )
+            return cursor.rowcount == 1
+
+    def release(self, queue, worker, keys):
+        """放弃租约（如预算用尽），任务回到待处理状态，不计入尝试次数"""
+        with self._transaction() as conn:
+            conn.executemany(
+                'UPDATE tasks SET status = \'pending\', owner = NULL, lease_until = NULL,'
+                ' attempts = MAX(attempts - 1, 0), updated_at = ? '
+                'WHERE queue = ? AND key = ? AND owner = ? AND status = \'leased\'',
+                [(time.time(), queue, key, worker) for key in keys]
+            )
+
+    def retry_failed(self, queue):
+        """把失败的任务重新放回队列，返回任务数"""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                'UPDATE tasks SET status = \'pending\', attempts = 0, owner = NULL, lease_until = NULL, updated_at = ? '
+                'WHERE queue = ? AND (status = \'failed\' OR (status = \'leased\' AND attempts >= ? AND lease_until < ?))',
+                (time.time(), queue, self.max_attempts, time.time())
+            )
+            return cursor.rowcount
+
+    def counts(self, queue):
+        """各状态的任务数，租约已过期的任务计入expired"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT CASE WHEN status = \'leased\' AND lease_until < ? THEN \'expired\' ELSE status END, COUNT(*) '
+                'FROM tasks WHERE queue = ? GROUP BY 1', (time.time(), queue)
+            ).fetchall()
+        return dict(rows)
+
+    def unfinished(self, queue):
+        """还需要处理的任务数：待处理、处理中，以及尚有尝试次数的过期任务"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT COUNT(*) FROM tasks WHERE queue = ? AND status IN (\'pending\', \'leased\') AND attempts < ?',
+                (queue, self.max_attempts)
+            ).fetchone()
+            leased = self._conn.execute(
+                'SELECT COUNT(*) FROM tasks WHERE queue = ? AND status = \'leased\' AND attempts >= ? AND lease_until >= ?',
+                (queue, self.max_attempts, time.time())
+            ).fetchone()
+        return row[0] + leased[0]
+
+    def results(self, queue):
+        """已完成任务的 {键: 结果}，按入队顺序"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT key, result FROM tasks WHERE queue = ? AND status = \'done\' ORDER BY seq', (queue,)
+            ).fetchall()
+        return {key: json.loads(result) for key, result in rows}
+
+    def failures(self, queue):
+        """失败任务的 [(键, 数据, 错误)]"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT key, payload, error FROM tasks WHERE queue = ? AND status != \'done\' AND attempts >= ? '
+                'AND (status = \'failed\' OR lease_until < ?) ORDER BY seq',
+                (queue, self.max_attempts, time.time())
+            ).fetchall()
+        return [(key, json.loads(payload), error) for key, payload, error in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class LeaseKeeper:
+    """后台心跳线程：定期为当前持有的任务续租，用法 with LeaseKeeper(...) as keeper: keeper.hold(keys)"""
+
+    def __init__(self, work_queue, queue, worker, interval=None):
+        self.work_queue = work_queue
+        self.queue = queue
+        self.worker = worker
+        self.interval = interval or max(1.0, work_queue.lease_seconds / 3)
+        self._keys = set()
+        self._keys_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='lease-heartbeat', daemon=True)
+
+    def hold(self, keys):
+        with self._keys_lock:
+            self._keys.update(keys)
+
+    def drop(self, keys):
+        with self._keys_lock:
+            self._keys.difference_update(keys)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._keys_lock:
+                keys = list(self._keys)
+            try:
+                self.work_queue.heartbeat(self.queue, self.worker, keys)
+            except sqlite3.Error as e:
+                print(f"续租失败: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()